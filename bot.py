@@ -1,8 +1,13 @@
 import asyncio
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import orjson
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.enums import ParseMode
 from aiogram.filters import Command, StateFilter
 from aiogram.types import Message
@@ -10,10 +15,19 @@ from aiogram.fsm.context import FSMContext
 
 import config
 from database import db
-from marzban_api import marzban_api
+from marzban_api import marzban_api, close_http_client
 from handlers.sudo_handlers import sudo_router
-from handlers.admin_handlers import admin_router
+from handlers.admin_handlers import admin_router, get_admin_keyboard
 from scheduler import init_scheduler
+from utils.authcache import get_user_role, is_authorized_cached
+from utils.notify import wait_notifications
+from utils.ratelimit import BotApiRateLimiter, CallbackThrottleMiddleware
+from utils.tasks import wait_background_tasks
+
+try:
+    import uvloop  # optional, faster event loop
+except ImportError:
+    uvloop = None
 
 
 # Configure logging
@@ -26,16 +40,99 @@ logging.basicConfig(
     ]
 )
 
+# While the bot runs, records are queued and a listener thread does the file/stdout I/O
+_log_listener: Optional[QueueListener] = None
+
+
+def start_log_listener():
+    """Move the root log handlers behind a queue served by a listener thread."""
+    global _log_listener
+    if _log_listener is not None:
+        return
+    root = logging.getLogger()
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _log_listener = QueueListener(log_queue, *root.handlers)
+    root.handlers = [QueueHandler(log_queue)]
+    _log_listener.start()
+
+
+def stop_log_listener():
+    """Flush queued records, stop the listener thread and write records directly again."""
+    global _log_listener
+    if _log_listener is None:
+        return
+    _log_listener.stop()
+    logging.getLogger().handlers = list(_log_listener.handlers)
+    _log_listener = None
+
 logger = logging.getLogger(__name__)
 
 
+def _orjson_dumps(obj) -> str:
+    """JSON encoder for the Bot API session, backed by orjson."""
+    return orjson.dumps(obj).decode()
+
+
+# Static help texts, built once at import
+SUDO_HELP_TEXT = (
+    "🤖 دستورات سودو ادمین:\n\n"
+    "📝 مدیریت ادمین‌ها:\n"
+    "• /add_admin - افزودن ادمین جدید\n"
+    "• افزودن ادمین قبلی - اضافه کردن ادمین‌های موجود در سرور مرزبان\n"
+    "• /show_admins یا /list_admins - نمایش لیست ادمین‌ها\n"
+    "• /remove_admin - غیرفعالسازی پنل\n"
+    "• /edit_panel - ویرایش محدودیت‌های پنل\n"
+    "• /admin_status - وضعیت تفصیلی ادمین‌ها\n"
+    "• /activate_admin - فعالسازی ادمین غیرفعال\n\n"
+    "📋 یا از دکمه‌های شیشه‌ای استفاده کنید:"
+)
+ADMIN_HELP_TEXT = (
+    "🤖 دستورات ادمین معمولی:\n\n"
+    "📊 گزارش‌گیری:\n"
+    "• /گزارش_من - گزارش لحظه‌ای شما\n"
+    "• /کاربران_من - لیست کاربران شما\n\n"
+    "📋 یا از دکمه‌های شیشه‌ای استفاده کنید:"
+)
+SUDO_COMMANDS_TEXT = (
+    "🔐 شما سودو ادمین هستید.\n\n"
+    "📋 دستورات موجود:\n"
+    "• /start - منوی اصلی\n"
+    "• /add_admin - افزودن ادمین جدید\n"
+    "• افزودن ادمین قبلی - اضافه کردن ادمین‌های موجود در سرور\n"
+    "• /show_admins - نمایش لیست ادمین‌ها\n"
+    "• /remove_admin - غیرفعالسازی پنل\n"
+    "• /edit_panel - ویرایش محدودیت‌های پنل\n"
+    "• /admin_status - وضعیت ادمین‌ها\n"
+    "• /activate_admin - فعالسازی ادمین غیرفعال\n\n"
+    "برای دسترسی به منوی اصلی /start را بزنید."
+)
+ADMIN_COMMANDS_TEXT = (
+    "👋 شما ادمین معمولی هستید.\n\n"
+    "📋 دستورات موجود:\n"
+    "• /start - منوی اصلی\n"
+    "• /گزارش_من - گزارش استفاده\n"
+    "• /کاربران_من - لیست کاربران\n"
+    "• /اطلاعات_من - اطلاعات حساب\n\n"
+    "برای دسترسی به منوی اصلی /start را بزنید."
+)
+
+
 class MarzbanAdminBot:
     def __init__(self):
         self.bot = Bot(
             token=config.BOT_TOKEN,
+            session=AiohttpSession(
+                limit=config.BOT_CONNECTION_LIMIT,
+                json_loads=orjson.loads,
+                json_dumps=_orjson_dumps
+            ),
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
+        # Keep all outgoing calls under Telegram's bot-wide rate limit
+        self.bot.session.middleware(BotApiRateLimiter())
         self.dp = Dispatcher()
+        # Drop double-taps on inline buttons before they reach any handler
+        self.dp.callback_query.middleware(CallbackThrottleMiddleware())
         self.scheduler = None
 
     async def setup(self):
@@ -114,39 +211,20 @@ class MarzbanAdminBot:
             return  # Don't interfere with FSM flow
         
         # Check if user is authorized
-        if user_id not in config.SUDO_ADMINS and not await db.is_admin_authorized(user_id):
+        role = await get_user_role(user_id)
+        if role is None:
             await message.answer(config.MESSAGES["unauthorized"])
             logger.warning(f"Unauthorized help request from user {user_id}")
             return
         
         # Different help messages for sudo and regular admins
-        if user_id in config.SUDO_ADMINS:
+        if role == "sudo":
             logger.info(f"Providing sudo admin help to user {user_id}")
-            help_text = (
-                "🤖 دستورات سودو ادمین:\n\n"
-                "📝 مدیریت ادمین‌ها:\n"
-                "• /add_admin - افزودن ادمین جدید\n"
-                "• افزودن ادمین قبلی - اضافه کردن ادمین‌های موجود در سرور مرزبان\n"
-                "• /show_admins یا /list_admins - نمایش لیست ادمین‌ها\n"
-                "• /remove_admin - غیرفعالسازی پنل\n"
-                "• /edit_panel - ویرایش محدودیت‌های پنل\n"
-                "• /admin_status - وضعیت تفصیلی ادمین‌ها\n"
-                "• /activate_admin - فعالسازی ادمین غیرفعال\n\n"
-                "📋 یا از دکمه‌های شیشه‌ای استفاده کنید:"
-            )
             from handlers.sudo_handlers import get_sudo_keyboard
-            await message.answer(help_text, reply_markup=get_sudo_keyboard())
+            await message.answer(SUDO_HELP_TEXT, reply_markup=get_sudo_keyboard())
         else:
             logger.info(f"Providing regular admin help to user {user_id}")
-            help_text = (
-                "🤖 دستورات ادمین معمولی:\n\n"
-                "📊 گزارش‌گیری:\n"
-                "• /گزارش_من - گزارش لحظه‌ای شما\n"
-                "• /کاربران_من - لیست کاربران شما\n\n"
-                "📋 یا از دکمه‌های شیشه‌ای استفاده کنید:"
-            )
-            from handlers.admin_handlers import get_admin_keyboard
-            await message.answer(help_text, reply_markup=get_admin_keyboard())
+            await message.answer(ADMIN_HELP_TEXT, reply_markup=get_admin_keyboard())
         
         logger.info(f"Help message sent to user {user_id}")
 
@@ -164,7 +242,7 @@ class MarzbanAdminBot:
             return  # Don't interfere with FSM flow
         
         # This will only be reached if user is not sudo and not authorized admin
-        if user_id not in config.SUDO_ADMINS and not await db.is_admin_authorized(user_id):
+        if not await is_authorized_cached(user_id):
             await message.answer(config.MESSAGES["unauthorized"])
             logger.warning(f"Unauthorized access attempt from user {user_id}, message: {message.text}")
 
@@ -181,37 +259,19 @@ class MarzbanAdminBot:
             logger.error(f"CRITICAL: General handler called for user {user_id} in state {current_state} with message: {message.text} - StateFilter(None) not working properly!")
             return  # Don't interfere with FSM flow
         
+        role = await get_user_role(user_id)
+        
         # Check if user is sudo admin
-        if user_id in config.SUDO_ADMINS:
+        if role == "sudo":
             logger.info(f"Providing sudo admin help to user {user_id}")
-            await message.answer(
-                "🔐 شما سودو ادمین هستید.\n\n"
-                "📋 دستورات موجود:\n"
-                "• /start - منوی اصلی\n"
-                "• /add_admin - افزودن ادمین جدید\n"
-                "• افزودن ادمین قبلی - اضافه کردن ادمین‌های موجود در سرور\n"
-                "• /show_admins - نمایش لیست ادمین‌ها\n"
-                "• /remove_admin - غیرفعالسازی پنل\n"
-                "• /edit_panel - ویرایش محدودیت‌های پنل\n"
-                "• /admin_status - وضعیت ادمین‌ها\n"
-                "• /activate_admin - فعالسازی ادمین غیرفعال\n\n"
-                "برای دسترسی به منوی اصلی /start را بزنید."
-            )
+            await message.answer(SUDO_COMMANDS_TEXT)
             logger.info(f"Sudo admin help message sent to user {user_id}")
             return
         
         # Check if user is authorized admin
-        if await db.is_admin_authorized(user_id):
+        if role == "admin":
             logger.info(f"Providing regular admin help to user {user_id}")
-            await message.answer(
-                "👋 شما ادمین معمولی هستید.\n\n"
-                "📋 دستورات موجود:\n"
-                "• /start - منوی اصلی\n"
-                "• /گزارش_من - گزارش استفاده\n"
-                "• /کاربران_من - لیست کاربران\n"
-                "• /اطلاعات_من - اطلاعات حساب\n\n"
-                "برای دسترسی به منوی اصلی /start را بزنید."
-            )
+            await message.answer(ADMIN_COMMANDS_TEXT)
             logger.info(f"Regular admin help message sent to user {user_id}")
             return
         
@@ -244,8 +304,12 @@ class MarzbanAdminBot:
             if self.scheduler:
                 await self.scheduler.stop()
             
+            await wait_background_tasks()
+            await wait_notifications()
             await db.close()
+            await close_http_client()
             await self.bot.session.close()
+            stop_log_listener()
             
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
@@ -259,11 +323,13 @@ class MarzbanAdminBot:
             f"🔗 آدرس مرزبان: {config.MARZBAN_URL}"
         )
         
-        for sudo_id in config.SUDO_ADMINS:
-            try:
-                await self.bot.send_message(sudo_id, startup_message)
-            except Exception as e:
-                logger.warning(f"Failed to send startup message to sudo {sudo_id}: {e}")
+        results = await asyncio.gather(
+            *(self.bot.send_message(sudo_id, startup_message) for sudo_id in config.SUDO_ADMINS),
+            return_exceptions=True
+        )
+        for sudo_id, result in zip(config.SUDO_ADMINS, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to send startup message to sudo {sudo_id}: {result}")
 
 
 async def main():
@@ -278,6 +344,8 @@ async def main():
             logger.error("No SUDO_ADMINS configured!")
             return
         
+        start_log_listener()
+        
         # Create and setup bot
         bot = MarzbanAdminBot()
         await bot.setup()
@@ -293,9 +361,15 @@ async def main():
     except Exception as e:
         logger.error(f"Critical error: {e}")
         raise
+    finally:
+        # No-op when cleanup already stopped it; covers failures before polling started
+        stop_log_listener()
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        uvloop.install()
+    
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
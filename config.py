@@ -1,8 +1,9 @@
 import os
-from typing import List
+from typing import FrozenSet
 
 # Bot Configuration
 BOT_TOKEN = os.getenv("BOT_TOKEN", "YOUR_BOT_TOKEN")
+BOT_CONNECTION_LIMIT = int(os.getenv("BOT_CONNECTION_LIMIT", "100"))  # pooled connections to the Bot API
 
 # Marzban Configuration
 MARZBAN_URL = os.getenv("MARZBAN_URL", "https://your-marzban-panel.com")
@@ -10,20 +11,50 @@ MARZBAN_USERNAME = os.getenv("MARZBAN_USERNAME", "admin")
 MARZBAN_PASSWORD = os.getenv("MARZBAN_PASSWORD", "admin_password")
 
 # Sudo Admins (User IDs)
-SUDO_ADMINS: List[int] = [
+SUDO_ADMINS: FrozenSet[int] = frozenset(
     int(x) for x in os.getenv("SUDO_ADMINS", "123456789").split(",") if x.strip()
-]
+)  # frozenset: checked on every update
 
 # Database Configuration
 DATABASE_PATH = os.getenv("DATABASE_PATH", "bot_database.db")
+DB_ERROR_LOG_PATH = os.getenv("DB_ERROR_LOG_PATH", "database_errors.log")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+DB_ERROR_QUEUE_SIZE = int(os.getenv("DB_ERROR_QUEUE_SIZE", "1024"))
+DB_LOG_BATCH_SIZE = int(os.getenv("DB_LOG_BATCH_SIZE", "100"))  # queued log rows written per transaction
 
 # Monitoring Configuration
 MONITORING_INTERVAL = int(os.getenv("MONITORING_INTERVAL", "600"))  # 10 minutes in seconds
 WARNING_THRESHOLD = float(os.getenv("WARNING_THRESHOLD", "0.8"))  # 80% threshold
 
+# Cache Configuration
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))  # seconds
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", "60"))  # seconds
+PANEL_STATS_CACHE_TTL = int(os.getenv("PANEL_STATS_CACHE_TTL", "15"))  # seconds
+ADMIN_API_CACHE_TTL = int(os.getenv("ADMIN_API_CACHE_TTL", "1800"))  # seconds
+MARZBAN_COALESCE_TTL = int(os.getenv("MARZBAN_COALESCE_TTL", "5"))  # seconds
+
+# Rate Limiting Configuration
+RATE_LIMIT_CALLS = int(os.getenv("RATE_LIMIT_CALLS", "5"))
+RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "10"))  # seconds
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "25"))  # notification sender workers
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+TELEGRAM_RATE_LIMIT = float(os.getenv("TELEGRAM_RATE_LIMIT", "28"))  # outgoing Bot API calls per second
+TELEGRAM_RATE_BURST = int(os.getenv("TELEGRAM_RATE_BURST", "30"))
+TELEGRAM_CHAT_RATE_LIMIT = float(os.getenv("TELEGRAM_CHAT_RATE_LIMIT", "1"))  # outgoing calls per second to one chat
+TELEGRAM_CHAT_RATE_BURST = int(os.getenv("TELEGRAM_CHAT_RATE_BURST", "5"))
+TELEGRAM_RETRY_AFTER_ATTEMPTS = int(os.getenv("TELEGRAM_RETRY_AFTER_ATTEMPTS", "3"))  # retries on flood-control errors
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "2"))  # seconds between progress message edits
+CALLBACK_THROTTLE = float(os.getenv("CALLBACK_THROTTLE", "0.25"))  # seconds between button presses per user
+
 # API Configuration
 API_TIMEOUT = int(os.getenv("API_TIMEOUT", "30"))
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "50"))  # pooled connections to the Marzban panel
+API_KEEPALIVE_EXPIRY = float(os.getenv("API_KEEPALIVE_EXPIRY", "60"))  # seconds an idle connection is kept open
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+API_BATCH_CONCURRENCY = int(os.getenv("API_BATCH_CONCURRENCY", "10"))  # parallel per-user calls in batch operations
+API_USERS_PAGE_SIZE = int(os.getenv("API_USERS_PAGE_SIZE", "1000"))  # users fetched per request when paging
 
 # Messages in Persian
 MESSAGES = {
@@ -39,6 +70,8 @@ MESSAGES = {
     "invalid_format": "❌ فرمت ورودی اشتباه است.",
     "api_error": "⚠️ خطا در اتصال به API مرزبان.",
     "database_error": "⚠️ خطا در پایگاه داده.",
+    "rate_limited": "⏳ لطفا صبر کنید و چند لحظه دیگر دوباره تلاش کنید.",
+    "in_progress": "⏳ این درخواست در حال انجام است، لطفا صبر کنید.",
     "limit_warning": "⚠️ هشدار: شما به {percent}% از محدودیت خود رسیده‌اید!",
     "limit_exceeded": "🚫 محدودیت شما اشباع شده و کاربران غیرفعال شدند.",
     "users_reactivated": "✅ کاربران مجدداً فعال شدند.",
@@ -66,6 +99,7 @@ BUTTONS = {
     "my_users": "👥 کاربران من",
     "my_report": "📈 گزارش من",
     "reactivate_users": "🔄 فعالسازی کاربران",
+    "all_panels": "📊 همه پنل‌ها",
     "back": "🔙 بازگشت",
     "cancel": "❌ لغو"
 }
\ No newline at end of file
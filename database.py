@@ -1,18 +1,172 @@
+import asyncio
+import traceback
+from contextlib import asynccontextmanager
+import aiofiles
 import aiosqlite
 import json
+import time
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Optional, Dict, Any
 from models.schemas import AdminModel, UsageReportModel, LogModel
+from utils import authcache
+from utils.cache import TTLCache
 import config
 
 
+@lru_cache(maxsize=64)
+def _admin_update_sql(columns: tuple, where: str) -> str:
+    """Build (once per column set) the UPDATE statement used by the admin update helpers."""
+    set_clause = ", ".join(f"{column} = ?" for column in columns)
+    return f"UPDATE admins SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE {where}"
+
+
+_ADMIN_DATETIME_FIELDS = ("deactivated_at", "created_at", "updated_at")
+
+_DAY_SECONDS = 86_400
+
+_INSERT_LOG_SQL = """
+    INSERT INTO logs (admin_user_id, action, details, timestamp)
+    VALUES (?, ?, ?, ?)
+"""
+# Statements run from several methods share one string so they share one statement cache entry
+_INIT_CUMULATIVE_SQL = """
+    INSERT OR IGNORE INTO cumulative_traffic (admin_id, total_traffic_consumed, last_updated)
+    VALUES (?, 0, CURRENT_TIMESTAMP)
+"""
+# Upserts on the unique admin_id index, so the read-modify-write happens inside one statement
+_RAISE_CUMULATIVE_SQL = """
+    INSERT INTO cumulative_traffic (admin_id, total_traffic_consumed, last_updated)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(admin_id) DO UPDATE SET
+        total_traffic_consumed = excluded.total_traffic_consumed,
+        last_updated = CURRENT_TIMESTAMP
+    WHERE excluded.total_traffic_consumed > cumulative_traffic.total_traffic_consumed
+"""
+_ADD_CUMULATIVE_SQL = """
+    INSERT INTO cumulative_traffic (admin_id, total_traffic_consumed, last_updated)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(admin_id) DO UPDATE SET
+        total_traffic_consumed = cumulative_traffic.total_traffic_consumed + excluded.total_traffic_consumed,
+        last_updated = CURRENT_TIMESTAMP
+"""
+_ADMIN_VALIDITY_SQL = "SELECT created_at, validity_days FROM admins WHERE id = ?"
+
+_MISSING = object()
+
+
+def _admin_from_row(row) -> AdminModel:
+    """Build an AdminModel from an admins row, skipping pydantic validation for the usual column types."""
+    data = dict(row)
+    try:
+        for field in _ADMIN_DATETIME_FIELDS:
+            value = data.get(field)
+            if isinstance(value, str):
+                data[field] = datetime.fromisoformat(value)
+            elif value is not None:
+                raise ValueError(field)
+        data["is_active"] = bool(data["is_active"])
+    except (KeyError, ValueError):
+        # Unexpected stored format, let pydantic coerce it
+        return AdminModel(**dict(row))
+    return AdminModel.model_construct(**data)
+
+
 class Database:
     def __init__(self, db_path: str = config.DATABASE_PATH):
         self.db_path = db_path
+        self._err_queue: Optional[asyncio.Queue] = None
+        self._err_writer: Optional[asyncio.Task] = None
+        self._err_dropped = 0
+        self._log_queue: Optional[asyncio.Queue] = None
+        self._log_writer: Optional[asyncio.Task] = None
+        self._admins_by_id = TTLCache(ttl=config.ADMIN_CACHE_TTL, maxsize=config.AUTH_CACHE_SIZE)
+        self._first_admin_by_user = TTLCache(ttl=config.ADMIN_CACHE_TTL, maxsize=config.AUTH_CACHE_SIZE)
+        self._all_admins = TTLCache(ttl=config.ADMIN_CACHE_TTL, maxsize=1)
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._conn_lock: Optional[asyncio.Lock] = None
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        """Open the shared connection in WAL mode with a statement cache large enough for every query in this module."""
+        conn = aiosqlite.connect(self.db_path, cached_statements=config.DB_STATEMENT_CACHE_SIZE)
+        # The shared connection lives until close(); its worker thread must not keep the process alive without it
+        conn.daemon = True
+        await conn
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @asynccontextmanager
+    async def _connect(self):
+        """Borrow the shared connection; blocks are serialized so each one is its own transaction."""
+        if self._conn_lock is None:
+            self._conn_lock = asyncio.Lock()
+        async with self._conn_lock:
+            if self._conn is None:
+                self._conn = await self._open_connection()
+            conn = self._conn
+            conn.row_factory = None
+            try:
+                yield conn
+            finally:
+                # Drop anything a failed block left uncommitted, as closing a connection would
+                if conn.in_transaction:
+                    await conn.rollback()
+
+    def _invalidate_admins(self, user_id: Optional[int] = None):
+        """Drop cached admin lookups after a write to the admins table."""
+        self._admins_by_id.clear()
+        self._first_admin_by_user.clear()
+        self._all_admins.clear()
+        authcache.invalidate(user_id)
+
+    def _start_error_writer(self):
+        """Create the error queue and its background writer on the running loop."""
+        self._err_queue = asyncio.Queue(maxsize=config.DB_ERROR_QUEUE_SIZE)
+        self._err_writer = asyncio.get_running_loop().create_task(self._error_writer())
+
+    def _log_error(self, message: str):
+        """Queue an error line for the background writer, dropping it if the queue is full."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            print(message)
+            return
+
+        if self._err_writer is None or self._err_writer.done():
+            self._start_error_writer()
+
+        try:
+            self._err_queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._err_dropped += 1
+
+    async def _error_writer(self):
+        """Drain queued error lines and append them to the error log in batches."""
+        queue = self._err_queue
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            queued = len(batch)
+
+            if self._err_dropped:
+                batch.append(f"{self._err_dropped} error messages dropped (queue full)")
+                self._err_dropped = 0
+
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            try:
+                async with aiofiles.open(config.DB_ERROR_LOG_PATH, "a", encoding="utf-8") as f:
+                    await f.write("".join(f"[{timestamp}] {line}\n" for line in batch))
+            except OSError as e:
+                print(f"Error writing database error log: {e}")
+            finally:
+                for _ in range(queued):
+                    queue.task_done()
 
     async def init_db(self):
         """Initialize database and create tables if they don't exist."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             # Check if we need to migrate the old schema
             try:
                 # Check if the old UNIQUE constraint exists
@@ -24,7 +178,7 @@ class Database:
                         await db.commit()
                         print("Database migration completed successfully!")
             except Exception as e:
-                print(f"Error checking schema: {e}")
+                self._log_error(f"Error checking schema: {e}")
             
             # Create admins table - removed UNIQUE constraint on user_id to allow multiple panels per user
             await db.execute("""
@@ -129,6 +283,12 @@ class Database:
                 ON cumulative_traffic(admin_id)
             """)
 
+            # Partial index for the per-user active panel lookups
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_admins_user_active 
+                ON admins(user_id) WHERE is_active = 1
+            """)
+
             # Initialize cumulative traffic tracking for existing admins
             await self._initialize_cumulative_tracking_for_existing_admins(db)
 
@@ -186,20 +346,17 @@ class Database:
 
             for admin_id in admin_ids:
                 try:
-                    await db.execute("""
-                        INSERT OR IGNORE INTO cumulative_traffic (admin_id, total_traffic_consumed, last_updated)
-                        VALUES (?, 0, CURRENT_TIMESTAMP)
-                    """, (admin_id,))
+                    await db.execute(_INIT_CUMULATIVE_SQL, (admin_id,))
                 except Exception as e:
-                    print(f"Error initializing cumulative traffic for admin {admin_id}: {e}")
+                    self._log_error(f"Error initializing cumulative traffic for admin {admin_id}: {e}")
             print(f"Cumulative traffic tracking initialized for {len(admin_ids)} existing admins.")
         except Exception as e:
-            print(f"Error initializing cumulative traffic for existing admins: {e}")
+            self._log_error(f"Error initializing cumulative traffic for existing admins: {e}")
 
     async def add_admin(self, admin: AdminModel) -> int:
         """Add a new admin to the database. Returns admin_id on success, 0 on failure."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 cursor = await db.execute("""
                     INSERT INTO admins (user_id, admin_name, marzban_username, marzban_password,
                                       username, first_name, last_name, 
@@ -213,22 +370,19 @@ class Database:
                 
                 # Get the new admin ID and initialize cumulative tracking
                 new_admin_id = cursor.lastrowid
-                await db.execute("""
-                    INSERT OR IGNORE INTO cumulative_traffic (admin_id, total_traffic_consumed, last_updated)
-                    VALUES (?, 0, CURRENT_TIMESTAMP)
-                """, (new_admin_id,))
+                await db.execute(_INIT_CUMULATIVE_SQL, (new_admin_id,))
                 
                 await db.commit()
+                self._invalidate_admins(admin.user_id)
                 return new_admin_id
         except aiosqlite.IntegrityError as e:
-            print(f"Admin already exists (marzban_username must be unique): {e}")
-            print(f"Failed to add admin with marzban_username: {admin.marzban_username}")
+            self._log_error(f"Admin already exists (marzban_username must be unique): {e}")
+            self._log_error(f"Failed to add admin with marzban_username: {admin.marzban_username}")
             return 0
         except Exception as e:
-            print(f"Error adding admin: {e}")
-            print(f"Admin data: user_id={admin.user_id}, marzban_username={admin.marzban_username}")
-            import traceback
-            traceback.print_exc()
+            self._log_error(f"Error adding admin: {e}")
+            self._log_error(f"Admin data: user_id={admin.user_id}, marzban_username={admin.marzban_username}")
+            self._log_error(traceback.format_exc().rstrip())
             return 0
 
     async def add_admin_legacy(self, admin: AdminModel) -> bool:
@@ -238,68 +392,112 @@ class Database:
 
     async def get_admin(self, user_id: int) -> Optional[AdminModel]:
         """Get first admin by user_id for backward compatibility."""
+        # Misses are cached too, so repeated lookups for non-admins skip the query as well
+        admin = self._first_admin_by_user.get(user_id, _MISSING)
+        if admin is not _MISSING:
+            return admin
+        
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 async with db.execute("SELECT * FROM admins WHERE user_id = ? ORDER BY created_at ASC LIMIT 1", (user_id,)) as cursor:
                     row = await cursor.fetchone()
-                    if row:
-                        return AdminModel(**dict(row))
-                    return None
+                    admin = _admin_from_row(row) if row else None
+                    self._first_admin_by_user.set(user_id, admin)
+                    return admin
         except Exception as e:
-            print(f"Error getting admin: {e}")
+            self._log_error(f"Error getting admin: {e}")
             return None
 
     async def get_admins_for_user(self, user_id: int) -> List[AdminModel]:
         """Get all admins for a specific user_id."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 async with db.execute("SELECT * FROM admins WHERE user_id = ? ORDER BY created_at DESC", (user_id,)) as cursor:
                     rows = await cursor.fetchall()
-                    return [AdminModel(**dict(row)) for row in rows]
+                    return [_admin_from_row(row) for row in rows]
         except Exception as e:
-            print(f"Error getting admins for user: {e}")
+            self._log_error(f"Error getting admins for user: {e}")
+            return []
+
+    async def get_active_admins_for_user(self, user_id: int) -> Optional[List[AdminModel]]:
+        """Get active admins for a specific user_id, or None if the lookup failed."""
+        try:
+            async with self._connect() as db:
+                db.row_factory = aiosqlite.Row
+                async with db.execute("SELECT * FROM admins WHERE user_id = ? AND is_active = 1 ORDER BY created_at DESC", (user_id,)) as cursor:
+                    rows = await cursor.fetchall()
+                    return [_admin_from_row(row) for row in rows]
+        except Exception as e:
+            self._log_error(f"Error getting active admins for user: {e}")
+            return None
+
+    async def get_deactivated_admins_for_user(self, user_id: int) -> List[AdminModel]:
+        """Get deactivated admins for a specific user_id."""
+        try:
+            async with self._connect() as db:
+                db.row_factory = aiosqlite.Row
+                async with db.execute("SELECT * FROM admins WHERE user_id = ? AND is_active = 0 ORDER BY deactivated_at DESC", (user_id,)) as cursor:
+                    rows = await cursor.fetchall()
+                    return [_admin_from_row(row) for row in rows]
+        except Exception as e:
+            self._log_error(f"Error getting deactivated admins for user: {e}")
             return []
 
     async def get_admin_by_marzban_username(self, marzban_username: str) -> Optional[AdminModel]:
         """Get admin by marzban username."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 async with db.execute("SELECT * FROM admins WHERE marzban_username = ?", (marzban_username,)) as cursor:
                     row = await cursor.fetchone()
                     if row:
-                        return AdminModel(**dict(row))
+                        return _admin_from_row(row)
                     return None
         except Exception as e:
-            print(f"Error getting admin by marzban username: {e}")
+            self._log_error(f"Error getting admin by marzban username: {e}")
             return None
 
     async def get_admin_by_id(self, admin_id: int) -> Optional[AdminModel]:
-        """Get admin by admin ID."""
+        """Get admin by admin ID, served from a short-lived cache when possible."""
+        admin = self._admins_by_id.get(admin_id)
+        if admin is not None:
+            return admin
+        
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 async with db.execute("SELECT * FROM admins WHERE id = ?", (admin_id,)) as cursor:
                     row = await cursor.fetchone()
                     if row:
-                        return AdminModel(**dict(row))
+                        admin = _admin_from_row(row)
+                        self._admins_by_id.set(admin_id, admin)
+                        return admin
                     return None
         except Exception as e:
-            print(f"Error getting admin by ID: {e}")
+            self._log_error(f"Error getting admin by ID: {e}")
             return None
 
     async def get_all_admins(self) -> List[AdminModel]:
-        """Get all admins."""
+        """Get all admins, served from a short-lived cache when possible."""
+        admins = self._all_admins.get("all")
+        if admins is not None:
+            return list(admins)
+        
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 async with db.execute("SELECT * FROM admins ORDER BY created_at DESC") as cursor:
                     rows = await cursor.fetchall()
-                    return [AdminModel(**dict(row)) for row in rows]
+                    admins = [_admin_from_row(row) for row in rows]
+            # Seed the by-id cache too, so a follow-up lookup of a listed admin is free
+            self._all_admins.set("all", admins)
+            for admin in admins:
+                self._admins_by_id.set(admin.id, admin)
+            return list(admins)
         except Exception as e:
-            print(f"Error getting all admins: {e}")
+            self._log_error(f"Error getting all admins: {e}")
             return []
 
     async def update_admin(self, admin_id: int, **kwargs) -> bool:
@@ -308,18 +506,35 @@ class Database:
             if not kwargs:
                 return False
             
-            set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
+            sql = _admin_update_sql(tuple(kwargs), "id = ?")
             values = list(kwargs.values()) + [admin_id]
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(f"""
-                    UPDATE admins SET {set_clause}, updated_at = CURRENT_TIMESTAMP 
-                    WHERE id = ?
-                """, values)
+            async with self._connect() as db:
+                await db.execute(sql, values)
                 await db.commit()
+                self._invalidate_admins()
                 return True
         except Exception as e:
-            print(f"Error updating admin: {e}")
+            self._log_error(f"Error updating admin: {e}")
+            return False
+
+    async def update_admin_with_log(self, admin_id: int, log: LogModel, **kwargs) -> bool:
+        """Update admin data by admin ID and add a log entry in the same transaction."""
+        try:
+            if not kwargs:
+                return False
+            
+            sql = _admin_update_sql(tuple(kwargs), "id = ?")
+            values = list(kwargs.values()) + [admin_id]
+            
+            async with self._connect() as db:
+                await db.execute(sql, values)
+                await db.execute(_INSERT_LOG_SQL, (log.admin_user_id, log.action, log.details, log.timestamp))
+                await db.commit()
+                self._invalidate_admins()
+                return True
+        except Exception as e:
+            self._log_error(f"Error updating admin with log: {e}")
             return False
 
     async def update_admin_by_user_id(self, user_id: int, **kwargs) -> bool:
@@ -328,47 +543,46 @@ class Database:
             if not kwargs:
                 return False
             
-            set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
+            sql = _admin_update_sql(tuple(kwargs), "user_id = ? ORDER BY created_at ASC LIMIT 1")
             values = list(kwargs.values()) + [user_id]
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(f"""
-                    UPDATE admins SET {set_clause}, updated_at = CURRENT_TIMESTAMP 
-                    WHERE user_id = ? 
-                    ORDER BY created_at ASC LIMIT 1
-                """, values)
+            async with self._connect() as db:
+                await db.execute(sql, values)
                 await db.commit()
+                self._invalidate_admins(user_id)
                 return True
         except Exception as e:
-            print(f"Error updating admin by user_id: {e}")
+            self._log_error(f"Error updating admin by user_id: {e}")
             return False
 
     async def remove_admin(self, user_id: int) -> bool:
         """Remove first admin from database by user_id (for backward compatibility)."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("DELETE FROM admins WHERE user_id = ? ORDER BY created_at ASC LIMIT 1", (user_id,))
                 await db.commit()
+                self._invalidate_admins(user_id)
                 return True
         except Exception as e:
-            print(f"Error removing admin: {e}")
+            self._log_error(f"Error removing admin: {e}")
             return False
 
     async def remove_admin_by_id(self, admin_id: int) -> bool:
         """Remove admin from database by admin ID."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("DELETE FROM admins WHERE id = ?", (admin_id,))
                 await db.commit()
+                self._invalidate_admins()
                 return True
         except Exception as e:
-            print(f"Error removing admin by ID: {e}")
+            self._log_error(f"Error removing admin by ID: {e}")
             return False
 
     async def add_usage_report(self, report: UsageReportModel) -> bool:
         """Add usage report."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("""
                     INSERT INTO usage_reports (admin_user_id, check_time, current_users, 
                                              current_total_time, current_total_traffic, users_data)
@@ -378,13 +592,13 @@ class Database:
                 await db.commit()
                 return True
         except Exception as e:
-            print(f"Error adding usage report: {e}")
+            self._log_error(f"Error adding usage report: {e}")
             return False
 
     async def get_latest_usage_report(self, admin_user_id: int) -> Optional[UsageReportModel]:
         """Get latest usage report for admin."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 async with db.execute("""
                     SELECT * FROM usage_reports WHERE admin_user_id = ? 
@@ -395,27 +609,53 @@ class Database:
                         return UsageReportModel(**dict(row))
                     return None
         except Exception as e:
-            print(f"Error getting latest usage report: {e}")
+            self._log_error(f"Error getting latest usage report: {e}")
             return None
 
     async def add_log(self, log: LogModel) -> bool:
         """Add log entry."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO logs (admin_user_id, action, details, timestamp)
-                    VALUES (?, ?, ?, ?)
-                """, (log.admin_user_id, log.action, log.details, log.timestamp))
+            async with self._connect() as db:
+                await db.execute(_INSERT_LOG_SQL, (log.admin_user_id, log.action, log.details, log.timestamp))
                 await db.commit()
                 return True
         except Exception as e:
-            print(f"Error adding log: {e}")
+            self._log_error(f"Error adding log: {e}")
             return False
 
+    def queue_log(self, log: LogModel):
+        """Queue a log entry for the background writer instead of waiting for the insert."""
+        if self._log_queue is None:
+            self._log_queue = asyncio.Queue()
+        if self._log_writer is None or self._log_writer.done():
+            self._log_writer = asyncio.get_running_loop().create_task(self._write_logs())
+        self._log_queue.put_nowait(log)
+
+    async def _write_logs(self):
+        """Drain queued log entries and insert them in batches, one transaction per batch."""
+        queue = self._log_queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < config.DB_LOG_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            try:
+                async with self._connect() as db:
+                    await db.executemany(
+                        _INSERT_LOG_SQL,
+                        [(log.admin_user_id, log.action, log.details, log.timestamp) for log in batch]
+                    )
+                    await db.commit()
+            except Exception as e:
+                self._log_error(f"Error adding {len(batch)} logs: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
     async def get_logs(self, admin_user_id: Optional[int] = None, limit: int = 100) -> List[LogModel]:
         """Get logs, optionally filtered by admin."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 if admin_user_id:
                     query = "SELECT * FROM logs WHERE admin_user_id = ? ORDER BY timestamp DESC LIMIT ?"
@@ -428,7 +668,7 @@ class Database:
                     rows = await cursor.fetchall()
                     return [LogModel(**dict(row)) for row in rows]
         except Exception as e:
-            print(f"Error getting logs: {e}")
+            self._log_error(f"Error getting logs: {e}")
             return []
 
     async def is_admin_authorized(self, user_id: int) -> bool:
@@ -436,13 +676,12 @@ class Database:
         if user_id in config.SUDO_ADMINS:
             return True
         
-        admins = await self.get_admins_for_user(user_id)
-        return any(admin.is_active for admin in admins)
+        return bool(await self.get_active_admins_for_user(user_id))
 
     async def deactivate_admin(self, admin_id: int, reason: str = "Limit exceeded") -> bool:
         """Deactivate admin by admin ID and store original password."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("""
                     UPDATE admins SET 
                         is_active = 0, 
@@ -452,15 +691,16 @@ class Database:
                     WHERE id = ?
                 """, (reason, admin_id))
                 await db.commit()
+                self._invalidate_admins()
                 return True
         except Exception as e:
-            print(f"Error deactivating admin: {e}")
+            self._log_error(f"Error deactivating admin: {e}")
             return False
 
     async def deactivate_admin_by_user_id(self, user_id: int, reason: str = "Limit exceeded") -> bool:
         """Deactivate admin by user_id (for backward compatibility)."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("""
                     UPDATE admins SET 
                         is_active = 0, 
@@ -470,15 +710,16 @@ class Database:
                     WHERE user_id = ?
                 """, (reason, user_id))
                 await db.commit()
+                self._invalidate_admins(user_id)
                 return True
         except Exception as e:
-            print(f"Error deactivating admin: {e}")
+            self._log_error(f"Error deactivating admin: {e}")
             return False
 
     async def reactivate_admin(self, admin_id: int) -> bool:
         """Reactivate admin by admin ID and restore original password."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("""
                     UPDATE admins SET 
                         is_active = 1, 
@@ -488,15 +729,16 @@ class Database:
                     WHERE id = ?
                 """, (admin_id,))
                 await db.commit()
+                self._invalidate_admins()
                 return True
         except Exception as e:
-            print(f"Error reactivating admin: {e}")
+            self._log_error(f"Error reactivating admin: {e}")
             return False
 
     async def reactivate_admin_by_user_id(self, user_id: int) -> bool:
         """Reactivate admin by user_id (for backward compatibility)."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("""
                     UPDATE admins SET 
                         is_active = 1, 
@@ -506,97 +748,85 @@ class Database:
                     WHERE user_id = ?
                 """, (user_id,))
                 await db.commit()
+                self._invalidate_admins(user_id)
                 return True
         except Exception as e:
-            print(f"Error reactivating admin: {e}")
+            self._log_error(f"Error reactivating admin: {e}")
             return False
 
     async def get_deactivated_admins(self) -> List[AdminModel]:
         """Get all deactivated admins."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 db.row_factory = aiosqlite.Row
                 async with db.execute("SELECT * FROM admins WHERE is_active = 0 ORDER BY deactivated_at DESC") as cursor:
                     rows = await cursor.fetchall()
-                    return [AdminModel(**dict(row)) for row in rows]
+                    return [_admin_from_row(row) for row in rows]
         except Exception as e:
-            print(f"Error getting deactivated admins: {e}")
+            self._log_error(f"Error getting deactivated admins: {e}")
             return []
 
+    @staticmethod
+    async def _read_cumulative_traffic(db, admin_id: int) -> int:
+        """Read cumulative traffic on an already open connection."""
+        async with db.execute(
+            "SELECT total_traffic_consumed FROM cumulative_traffic WHERE admin_id = ?", 
+            (admin_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+
     async def get_cumulative_traffic(self, admin_id: int) -> int:
         """Get cumulative traffic consumed for an admin."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                async with db.execute(
-                    "SELECT total_traffic_consumed FROM cumulative_traffic WHERE admin_id = ?", 
-                    (admin_id,)
-                ) as cursor:
-                    row = await cursor.fetchone()
-                    return row[0] if row else 0
+            async with self._connect() as db:
+                return await self._read_cumulative_traffic(db, admin_id)
         except Exception as e:
-            print(f"Error getting cumulative traffic for admin {admin_id}: {e}")
+            self._log_error(f"Error getting cumulative traffic for admin {admin_id}: {e}")
             return 0
 
     async def update_cumulative_traffic(self, admin_id: int, current_traffic: int) -> bool:
         """Update cumulative traffic for an admin (only increases, never decreases)."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                # Get current cumulative traffic
-                current_cumulative = await self.get_cumulative_traffic(admin_id)
-                
-                # Only update if current traffic is higher than stored cumulative
-                if current_traffic > current_cumulative:
-                    await db.execute("""
-                        INSERT OR REPLACE INTO cumulative_traffic (admin_id, total_traffic_consumed, last_updated)
-                        VALUES (?, ?, CURRENT_TIMESTAMP)
-                    """, (admin_id, current_traffic))
-                    await db.commit()
-                    return True
+            if current_traffic <= 0:
                 return False
+            
+            async with self._connect() as db:
+                # Only changes the row if current traffic is higher than stored cumulative
+                cursor = await db.execute(_RAISE_CUMULATIVE_SQL, (admin_id, current_traffic))
+                await db.commit()
+                return cursor.rowcount > 0
         except Exception as e:
-            print(f"Error updating cumulative traffic for admin {admin_id}: {e}")
+            self._log_error(f"Error updating cumulative traffic for admin {admin_id}: {e}")
             return False
 
     async def add_to_cumulative_traffic(self, admin_id: int, traffic_to_add: int) -> bool:
         """Add traffic to cumulative total (used when users are deleted)."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                # Get current cumulative traffic
-                current_cumulative = await self.get_cumulative_traffic(admin_id)
-                new_total = current_cumulative + traffic_to_add
-                
-                await db.execute("""
-                    INSERT OR REPLACE INTO cumulative_traffic (admin_id, total_traffic_consumed, last_updated)
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                """, (admin_id, new_total))
+            async with self._connect() as db:
+                await db.execute(_ADD_CUMULATIVE_SQL, (admin_id, traffic_to_add))
                 await db.commit()
                 return True
         except Exception as e:
-            print(f"Error adding to cumulative traffic for admin {admin_id}: {e}")
+            self._log_error(f"Error adding to cumulative traffic for admin {admin_id}: {e}")
             return False
 
     async def initialize_cumulative_traffic(self, admin_id: int) -> bool:
         """Initialize cumulative traffic tracking for an admin if not exists."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT OR IGNORE INTO cumulative_traffic (admin_id, total_traffic_consumed, last_updated)
-                    VALUES (?, 0, CURRENT_TIMESTAMP)
-                """, (admin_id,))
+            async with self._connect() as db:
+                await db.execute(_INIT_CUMULATIVE_SQL, (admin_id,))
                 await db.commit()
                 return True
         except Exception as e:
-            print(f"Error initializing cumulative traffic for admin {admin_id}: {e}")
+            self._log_error(f"Error initializing cumulative traffic for admin {admin_id}: {e}")
             return False
 
     async def is_admin_expired(self, admin_id: int) -> bool:
         """Check if admin has expired based on created_at and validity_days."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                async with db.execute(
-                    "SELECT created_at, validity_days FROM admins WHERE id = ?", 
-                    (admin_id,)
-                ) as cursor:
+            async with self._connect() as db:
+                async with db.execute(_ADMIN_VALIDITY_SQL, (admin_id,)) as cursor:
                     row = await cursor.fetchone()
                     if not row:
                         return True  # Admin not found, consider expired
@@ -609,22 +839,19 @@ class Database:
                     created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
                     
                     # Calculate expiration time
-                    expiration_time = created_at.timestamp() + (validity_days * 24 * 3600)
-                    current_time = datetime.now().timestamp()
+                    expiration_time = created_at.timestamp() + validity_days * _DAY_SECONDS
+                    current_time = time.time()
                     
                     return current_time > expiration_time
         except Exception as e:
-            print(f"Error checking admin expiration for admin {admin_id}: {e}")
+            self._log_error(f"Error checking admin expiration for admin {admin_id}: {e}")
             return False  # Don't expire on error
     
     async def get_admin_remaining_days(self, admin_id: int) -> int:
         """Get remaining days for admin before expiration."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                async with db.execute(
-                    "SELECT created_at, validity_days FROM admins WHERE id = ?", 
-                    (admin_id,)
-                ) as cursor:
+            async with self._connect() as db:
+                async with db.execute(_ADMIN_VALIDITY_SQL, (admin_id,)) as cursor:
                     row = await cursor.fetchone()
                     if not row:
                         return 0  # Admin not found
@@ -637,31 +864,49 @@ class Database:
                     created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
                     
                     # Calculate remaining time
-                    expiration_time = created_at.timestamp() + (validity_days * 24 * 3600)
-                    current_time = datetime.now().timestamp()
+                    expiration_time = created_at.timestamp() + validity_days * _DAY_SECONDS
+                    current_time = time.time()
                     remaining_seconds = expiration_time - current_time
                     
                     # Convert to days (round up)
-                    remaining_days = max(0, int(remaining_seconds / (24 * 3600)) + (1 if remaining_seconds % (24 * 3600) > 0 else 0))
+                    remaining_days = max(0, int(remaining_seconds / _DAY_SECONDS) + (1 if remaining_seconds % _DAY_SECONDS > 0 else 0))
                     return remaining_days
         except Exception as e:
-            print(f"Error getting remaining days for admin {admin_id}: {e}")
+            self._log_error(f"Error getting remaining days for admin {admin_id}: {e}")
             return 0
 
     async def execute_query(self, query: str, params: tuple):
         """Execute a custom query with parameters."""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute(query, params)
                 await db.commit()
+                self._invalidate_admins()
                 return True
         except Exception as e:
-            print(f"Error executing query: {e}")
+            self._log_error(f"Error executing query: {e}")
             return False
 
     async def close(self):
-        """Close database connection (placeholder for future connection pooling)."""
-        pass
+        """Flush queued log entries, close the shared connection and flush pending error lines."""
+        if self._log_writer is not None and not self._log_writer.done():
+            try:
+                await asyncio.wait_for(self._log_queue.join(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+            self._log_writer.cancel()
+        
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+        
+        if self._err_writer is None or self._err_writer.done():
+            return
+        try:
+            await asyncio.wait_for(self._err_queue.join(), timeout=5)
+        except asyncio.TimeoutError:
+            pass
+        self._err_writer.cancel()
 
 
 # Global database instance
@@ -3,13 +3,22 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from typing import List
-import json
+import asyncio
+import httpx
 import logging
+import orjson
+import re
 import config
 from database import db
-from models.schemas import AdminModel, UsageReportModel
-from utils.notify import format_traffic_size, format_time_duration
-from marzban_api import marzban_api
+from models.schemas import AdminModel, UsageReportModel, AdminStatsModel
+from utils.notify import format_traffic_size, format_time_duration, format_expire_date
+from utils.authcache import is_authorized_cached, get_active_admins_cached
+from utils.cache import TTLCache, coalesce
+from utils.locks import get_lock
+from utils.messages import safe_edit_text
+from utils.ratelimit import check_rate
+from utils.tasks import spawn
+from marzban_api import marzban_api, MarzbanAPIError
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -17,27 +26,70 @@ logger = logging.getLogger(__name__)
 
 admin_router = Router()
 
+# Keyboards are immutable, so build them once at import time
+_ADMIN_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text=config.BUTTONS["my_info"], callback_data="my_info"),
+        InlineKeyboardButton(text=config.BUTTONS["my_report"], callback_data="my_report")
+    ],
+    [
+        InlineKeyboardButton(text=config.BUTTONS["my_users"], callback_data="my_users"),
+        InlineKeyboardButton(text=config.BUTTONS["reactivate_users"], callback_data="reactivate_users")
+    ],
+    [
+        InlineKeyboardButton(text=config.BUTTONS["all_panels"], callback_data="all_panels")
+    ]
+])
+# Shared by the static back keyboard and the dynamically built list keyboards
+_BACK_ROW = [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
+_BACK_KB = InlineKeyboardMarkup(inline_keyboard=[_BACK_ROW])
+
+_HELP_TEXT = (
+    "👋 شما ادمین معمولی هستید.\n\n"
+    "📋 دستورات موجود:\n"
+    "• /گزارش_من - گزارش استفاده\n"
+    "• /کاربران_من - لیست کاربران\n"
+    "• /اطلاعات_من - اطلاعات حساب\n"
+    "• /start - منوی اصلی\n\n"
+    "یا از دکمه‌های زیر استفاده کنید:"
+)
+
+# Failures worth reporting to the user as temporary; anything else is a bug and propagates
+_TEMPORARY_ERRORS = (httpx.HTTPError, asyncio.TimeoutError, MarzbanAPIError)
+_TEMPORARY_ERROR_TEXT = "❌ خطای موقت، لطفا دوباره تلاش کنید."
+
+# Interim text shown while a panel callback waits on Marzban
+_LOADING_TEXT = "⏳ در حال دریافت اطلاعات..."
+
+# Messages used on every request, bound once at import
+_MSG_UNAUTHORIZED = config.MESSAGES["unauthorized"]
+_MSG_RATE_LIMITED = config.MESSAGES["rate_limited"]
+_MSG_IN_PROGRESS = config.MESSAGES["in_progress"]
+_MSG_WELCOME_ADMIN = config.MESSAGES["welcome_admin"]
+
+# Reports with at least this many users are serialized in a worker thread
+_REPORT_OFFLOAD_THRESHOLD = 500
+
+# Number of users rendered in the users list views
+_USERS_LIST_LIMIT = 20
+
+# Short-lived cache of live panel stats, keyed by admin ID, to coalesce bursts of taps
+_panel_stats_cache = TTLCache(ttl=config.PANEL_STATS_CACHE_TTL)
+
+# In-flight/recent Marzban fetches for the text commands, keyed by (kind, marzban admin username)
+_marzban_fetches = TTLCache(ttl=config.MARZBAN_COALESCE_TTL)
+
 
 def get_admin_keyboard() -> InlineKeyboardMarkup:
     """Get admin main keyboard."""
-    buttons = [
-        [
-            InlineKeyboardButton(text=config.BUTTONS["my_info"], callback_data="my_info"),
-            InlineKeyboardButton(text=config.BUTTONS["my_report"], callback_data="my_report")
-        ],
-        [
-            InlineKeyboardButton(text=config.BUTTONS["my_users"], callback_data="my_users"),
-            InlineKeyboardButton(text=config.BUTTONS["reactivate_users"], callback_data="reactivate_users")
-        ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    return _ADMIN_KB
 
 
 def get_panel_selection_keyboard(admins: List[AdminModel]) -> InlineKeyboardMarkup:
     """Get keyboard for selecting between multiple admin panels."""
     buttons = []
     for admin in admins:
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
+        panel_name = admin.panel_name
         status = "✅" if admin.is_active else "❌"
         buttons.append([
             InlineKeyboardButton(
@@ -46,51 +98,94 @@ def get_panel_selection_keyboard(admins: List[AdminModel]) -> InlineKeyboardMark
             )
         ])
     
-    buttons.append([InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")])
+    buttons.append(_BACK_ROW)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def get_usage_bar(percentage: float, length: int = 10) -> str:
+    """Render a usage percentage as a text progress bar."""
+    filled = min(length, max(0, round(percentage / 100 * length)))
+    return "▰" * filled + "▱" * (length - filled)
+
+
+async def get_panel_stats(admin: AdminModel) -> AdminStatsModel:
+    """Get live stats of a panel, reusing a result fetched in the last few seconds."""
+    stats = _panel_stats_cache.get(admin.id)
+    if stats is None:
+        stats = await marzban_api.get_admin_stats_with_credentials(
+            admin.marzban_username, admin.marzban_password
+        )
+        _panel_stats_cache.set(admin.id, stats)
+    return stats
+
+
+async def get_users_coalesced(admin_username: str) -> list:
+    """Get an admin's users from Marzban, sharing one request between rapid or concurrent callers."""
+    return await coalesce(_marzban_fetches, ("users", admin_username),
+                          lambda: marzban_api.get_users(admin_username))
+
+
+async def get_admin_stats_coalesced(admin_username: str) -> AdminStatsModel:
+    """Get an admin's stats from Marzban, sharing one request between rapid or concurrent callers."""
+    return await coalesce(_marzban_fetches, ("stats", admin_username),
+                          lambda: marzban_api.get_admin_stats(admin_username))
+
+
+async def gather_all_panel_stats(active_admins: List[AdminModel]) -> list:
+    """Fetch stats of all panels concurrently. Failed panels are returned as exceptions."""
+    return await asyncio.gather(
+        *(get_panel_stats(admin) for admin in active_admins),
+        return_exceptions=True
+    )
+
+
+def build_admin_welcome(active_admins: List[AdminModel]) -> str:
+    """Build the admin main menu text, listing the user's active panels, in one join."""
+    if len(active_admins) > 1:
+        return "".join([
+            _MSG_WELCOME_ADMIN,
+            f"\n\n🔹 شما {len(active_admins)} پنل فعال دارید:",
+            *(f"\n• {admin.panel_name}" for admin in active_admins),
+        ])
+    if active_admins:
+        return f"{_MSG_WELCOME_ADMIN}\n\n🔹 پنل فعال: {active_admins[0].panel_name}"
+    return _MSG_WELCOME_ADMIN
+
+
 async def show_panel_selection_or_execute(callback: CallbackQuery, action_type: str):
     """Show panel selection if user has multiple panels, otherwise execute action directly."""
-    admins = await db.get_admins_for_user(callback.from_user.id)
-    active_admins = [admin for admin in admins if admin.is_active]
+    active_admins = await get_active_admins_cached(callback.from_user.id)
     
     if not active_admins:
         await callback.answer("شما هیچ پنل فعالی ندارید.", show_alert=True)
         return
     
     if len(active_admins) == 1:
-        # Only one panel, execute action directly
-        admin = active_admins[0]
-        if action_type == "info":
-            await show_admin_info(callback, admin)
-        elif action_type == "report":
-            await show_admin_report(callback, admin)
-        elif action_type == "users":
-            await show_admin_users(callback, admin)
-        elif action_type == "reactivate":
-            await show_admin_reactivate(callback, admin)
+        # Only one panel, execute action directly; showing the panel list below is not rate limited
+        if not check_rate(callback.from_user.id, action_type):
+            await callback.answer(_MSG_RATE_LIMITED, show_alert=True)
+            return
+        await _PANEL_ACTIONS[action_type](callback, active_admins[0])
     else:
         # Multiple panels, show selection
-        text = f"🔹 شما {len(active_admins)} پنل فعال دارید. کدام پنل را انتخاب می‌کنید؟\n\n"
-        for admin in active_admins:
-            panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-            text += f"• {panel_name}\n"
-        
-        # Store the action type in callback data for later use
+        # Build panel lines and buttons in one pass; the action type goes into callback data
+        panel_lines = []
         buttons = []
         for admin in active_admins:
-            panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
+            panel_name = admin.panel_name
+            panel_lines.append(f"• {panel_name}\n")
             buttons.append([
                 InlineKeyboardButton(
                     text=f"✅ {panel_name}",
                     callback_data=f"{action_type}_panel_{admin.id}"
                 )
             ])
+        text = f"🔹 شما {len(active_admins)} پنل فعال دارید. کدام پنل را انتخاب می‌کنید؟\n\n" + "".join(panel_lines)
         
-        buttons.append([InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")])
+        buttons.append(_BACK_ROW)
         
-        await callback.message.edit_text(
+        await safe_edit_text(
+            callback.message,
             text,
             reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
         )
@@ -103,25 +198,13 @@ async def admin_start(message: Message):
     if message.from_user.id in config.SUDO_ADMINS:
         return  # Let sudo handler handle this
     
-    # Check if user is authorized admin
-    if not await db.is_admin_authorized(message.from_user.id):
-        await message.answer(config.MESSAGES["unauthorized"])
+    # Sudo users returned above, so the user is an authorized admin exactly when they have active panels
+    active_admins = await get_active_admins_cached(message.from_user.id)
+    if not active_admins:
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
-    # Get user's admin panels
-    admins = await db.get_admins_for_user(message.from_user.id)
-    active_admins = [admin for admin in admins if admin.is_active]
-    
-    welcome_message = config.MESSAGES["welcome_admin"]
-    if len(active_admins) > 1:
-        welcome_message += f"\n\n🔹 شما {len(active_admins)} پنل فعال دارید:"
-        for admin in active_admins:
-            panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-            welcome_message += f"\n• {panel_name}"
-    elif len(active_admins) == 1:
-        admin = active_admins[0]
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-        welcome_message += f"\n\n🔹 پنل فعال: {panel_name}"
+    welcome_message = build_admin_welcome(active_admins)
     
     await message.answer(
         welcome_message,
@@ -136,41 +219,45 @@ async def get_my_info_text(user_id: int) -> str:
         return "❌ ادمین یافت نشد."
     
     try:
-        # Get current usage from Marzban
-        admin_stats = await marzban_api.get_admin_stats(admin.username or str(admin.user_id))
+        # Get current usage from Marzban and remaining days from the database concurrently
+        admin_stats, remaining_days = await asyncio.gather(
+            get_admin_stats_coalesced(admin.username or str(admin.user_id)),
+            db.get_admin_remaining_days(admin.id)
+        )
         
         # Calculate usage percentages
         user_percentage = (admin_stats.total_users / admin.max_users) * 100
         traffic_percentage = (admin_stats.total_traffic_used / admin.max_total_traffic) * 100
         time_percentage = (admin_stats.total_time_used / admin.max_total_time) * 100
         
-        # Get remaining days
-        remaining_days = await db.get_admin_remaining_days(admin.id)
-        
-        text = f"👤 اطلاعات حساب شما:\n\n"
-        text += f"📋 نام کاربری: {admin.username or 'نامشخص'}\n"
-        text += f"🆔 User ID: {admin.user_id}\n"
-        text += f"📅 تاریخ ایجاد: {admin.created_at}\n"
-        text += f"⏰ روزهای باقی‌مانده: {remaining_days} روز\n"
-        text += f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n"
+        parts = [f"👤 اطلاعات حساب شما:\n\n"]
+        parts.append(f"📋 نام کاربری: {admin.username or 'نامشخص'}\n")
+        parts.append(f"🆔 User ID: {admin.user_id}\n")
+        parts.append(f"📅 تاریخ ایجاد: {admin.created_at}\n")
+        parts.append(f"⏰ روزهای باقی‌مانده: {remaining_days} روز\n")
+        parts.append(f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n")
         
-        text += f"📊 محدودیت‌ها و استفاده:\n\n"
+        parts.append(f"📊 محدودیت‌ها و استفاده:\n\n")
         
         # Users
         user_status = "🟢" if user_percentage < 80 else "🟡" if user_percentage < 100 else "🔴"
-        text += f"{user_status} کاربران: {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n"
+        parts.append(f"{user_status} کاربران: {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n")
         
         # Traffic
         traffic_status = "🟢" if traffic_percentage < 80 else "🟡" if traffic_percentage < 100 else "🔴"
-        text += f"{traffic_status} ترافیک: {await format_traffic_size(admin_stats.total_traffic_used)}/{await format_traffic_size(admin.max_total_traffic)} ({traffic_percentage:.1f}%)\n"
+        traffic_used = format_traffic_size(admin_stats.total_traffic_used)
+        traffic_limit = format_traffic_size(admin.max_total_traffic)
+        parts.append(f"{traffic_status} ترافیک: {traffic_used}/{traffic_limit} ({traffic_percentage:.1f}%)\n")
         
         # Time
         time_status = "🟢" if time_percentage < 80 else "🟡" if time_percentage < 100 else "🔴"
-        text += f"{time_status} زمان: {await format_time_duration(admin_stats.total_time_used)}/{await format_time_duration(admin.max_total_time)} ({time_percentage:.1f}%)\n"
+        time_used = format_time_duration(admin_stats.total_time_used)
+        time_limit = format_time_duration(admin.max_total_time)
+        parts.append(f"{time_status} زمان: {time_used}/{time_limit} ({time_percentage:.1f}%)\n")
         
         # Warning if approaching limits
         if any(p >= 80 for p in [user_percentage, traffic_percentage, time_percentage]):
-            text += f"\n⚠️ توجه: شما به محدودیت‌هایتان نزدیک شده‌اید!"
+            parts.append(f"\n⚠️ توجه: شما به محدودیت‌هایتان نزدیک شده‌اید!")
         
     except Exception as e:
         # Get remaining days even if stats fail
@@ -179,99 +266,137 @@ async def get_my_info_text(user_id: int) -> str:
         except:
             remaining_days = admin.validity_days
             
-        text = f"👤 اطلاعات حساب شما:\n\n"
-        text += f"📋 نام کاربری: {admin.username or 'نامشخص'}\n"
-        text += f"🆔 User ID: {admin.user_id}\n"
-        text += f"📅 تاریخ ایجاد: {admin.created_at}\n"
-        text += f"⏰ روزهای باقی‌مانده: {remaining_days} روز\n"
-        text += f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n"
-        text += f"❌ خطا در دریافت آمار استفاده: {str(e)}"
-    
-    return text
-
-
-@admin_router.callback_query(F.data == "my_info")
-async def my_info_callback(callback: CallbackQuery):
-    """Show admin's own information and limits."""
-    if not await db.is_admin_authorized(callback.from_user.id):
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
-    await show_panel_selection_or_execute(callback, "info")
-
-
-@admin_router.callback_query(F.data.startswith("info_panel_"))
-async def info_panel_selected(callback: CallbackQuery):
-    """Handle admin info for selected panel."""
-    if not await db.is_admin_authorized(callback.from_user.id):
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
+        parts = [f"👤 اطلاعات حساب شما:\n\n"]
+        parts.append(f"📋 نام کاربری: {admin.username or 'نامشخص'}\n")
+        parts.append(f"🆔 User ID: {admin.user_id}\n")
+        parts.append(f"📅 تاریخ ایجاد: {admin.created_at}\n")
+        parts.append(f"⏰ روزهای باقی‌مانده: {remaining_days} روز\n")
+        parts.append(f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n")
+        parts.append(f"❌ خطا در دریافت آمار استفاده: {str(e)}")
     
-    admin_id = int(callback.data.split("_")[-1])
-    admin = await db.get_admin_by_id(admin_id)
-    
-    if not admin or admin.user_id != callback.from_user.id:
-        await callback.answer("پنل یافت نشد.", show_alert=True)
-        return
-    
-    await show_admin_info(callback, admin)
+    return "".join(parts)
 
 
 async def show_admin_info(callback: CallbackQuery, admin: AdminModel):
     """Show information for specific admin panel."""
+    panel_name = admin.panel_name
+    
+    await callback.answer()
+    
     try:
         # Get current usage from Marzban using admin's own credentials
-        admin_stats = await marzban_api.get_admin_stats_with_credentials(
-            admin.marzban_username, admin.marzban_password
-        )
+        admin_stats = await get_panel_stats(admin)
         
         # Calculate usage percentages
         user_percentage = (admin_stats.total_users / admin.max_users) * 100 if admin.max_users > 0 else 0
         traffic_percentage = (admin_stats.total_traffic_used / admin.max_total_traffic) * 100 if admin.max_total_traffic > 0 else 0
         time_percentage = (admin_stats.total_time_used / admin.max_total_time) * 100 if admin.max_total_time > 0 else 0
         
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-        
-        text = f"👤 اطلاعات پنل {panel_name}:\n\n"
-        text += f"📋 نام کاربری مرزبان: {admin.marzban_username}\n"
-        text += f"🆔 User ID: {admin.user_id}\n"
-        text += f"📅 تاریخ ایجاد: {admin.created_at}\n"
-        text += f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n"
+        parts = [f"👤 اطلاعات پنل {panel_name}:\n\n"]
+        parts.append(f"📋 نام کاربری مرزبان: {admin.marzban_username}\n")
+        parts.append(f"🆔 User ID: {admin.user_id}\n")
+        parts.append(f"📅 تاریخ ایجاد: {admin.created_at}\n")
+        parts.append(f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n")
         
-        text += f"📊 محدودیت‌ها و استفاده (لحظه‌ای):\n\n"
+        parts.append(f"📊 محدودیت‌ها و استفاده (لحظه‌ای):\n\n")
         
         # Users
         user_status = "🟢" if user_percentage < 80 else "🟡" if user_percentage < 100 else "🔴"
-        text += f"{user_status} کاربران: {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n"
+        parts.append(f"{user_status} کاربران: {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n")
         
         # Traffic
         traffic_status = "🟢" if traffic_percentage < 80 else "🟡" if traffic_percentage < 100 else "🔴"
-        text += f"{traffic_status} ترافیک: {await format_traffic_size(admin_stats.total_traffic_used)}/{await format_traffic_size(admin.max_total_traffic)} ({traffic_percentage:.1f}%)\n"
+        traffic_used = format_traffic_size(admin_stats.total_traffic_used)
+        traffic_limit = format_traffic_size(admin.max_total_traffic)
+        parts.append(f"{traffic_status} ترافیک: {traffic_used}/{traffic_limit} ({traffic_percentage:.1f}%)\n")
         
         # Time
         time_status = "🟢" if time_percentage < 80 else "🟡" if time_percentage < 100 else "🔴"
-        text += f"{time_status} زمان: {await format_time_duration(admin_stats.total_time_used)}/{await format_time_duration(admin.max_total_time)} ({time_percentage:.1f}%)\n"
+        time_used = format_time_duration(admin_stats.total_time_used)
+        time_limit = format_time_duration(admin.max_total_time)
+        parts.append(f"{time_status} زمان: {time_used}/{time_limit} ({time_percentage:.1f}%)\n")
         
         # Warning if approaching limits
         if any(p >= 80 for p in [user_percentage, traffic_percentage, time_percentage]):
-            text += f"\n⚠️ توجه: شما به محدودیت‌هایتان نزدیک شده‌اید!"
-        
-    except Exception as e:
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-        text = f"👤 اطلاعات پنل {panel_name}:\n\n"
-        text += f"📋 نام کاربری مرزبان: {admin.marzban_username}\n"
-        text += f"🆔 User ID: {admin.user_id}\n"
-        text += f"📅 تاریخ ایجاد: {admin.created_at}\n"
-        text += f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n"
-        text += f"❌ خطا در دریافت آمار استفاده: {str(e)}"
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
-        ])
+            parts.append(f"\n⚠️ توجه: شما به محدودیت‌هایتان نزدیک شده‌اید!")
+        
+    except _TEMPORARY_ERRORS:
+        logger.exception("show_admin_info failed for panel %s", admin.id)
+        parts = [f"👤 اطلاعات پنل {panel_name}:\n\n"]
+        parts.append(f"📋 نام کاربری مرزبان: {admin.marzban_username}\n")
+        parts.append(f"🆔 User ID: {admin.user_id}\n")
+        parts.append(f"📅 تاریخ ایجاد: {admin.created_at}\n")
+        parts.append(f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n")
+        parts.append(_TEMPORARY_ERROR_TEXT)
+    
+    await safe_edit_text(
+        callback.message,
+        "".join(parts),
+        reply_markup=_BACK_KB
     )
+
+
+@admin_router.callback_query(F.data == "all_panels")
+async def all_panels_callback(callback: CallbackQuery):
+    """Show usage of all active panels in a single message."""
+    if not await is_authorized_cached(callback.from_user.id):
+        await callback.answer("غیرمجاز", show_alert=True)
+        return
+    
+    if not check_rate(callback.from_user.id, "all_panels"):
+        await callback.answer(_MSG_RATE_LIMITED, show_alert=True)
+        return
+    
+    active_admins = await get_active_admins_cached(callback.from_user.id)
+    
+    if not active_admins:
+        await callback.answer("شما هیچ پنل فعالی ندارید.", show_alert=True)
+        return
+    
     await callback.answer()
+    await safe_edit_text(callback.message, _LOADING_TEXT, reply_markup=_BACK_KB)
+    
+    results = await gather_all_panel_stats(active_admins)
+    
+    parts = [f"📊 خلاصه همه پنل‌ها ({len(active_admins)} پنل):\n\n"]
+    for admin, admin_stats in zip(active_admins, results):
+        panel_name = admin.panel_name
+        parts.append(f"🔹 {panel_name}\n")
+        
+        if isinstance(admin_stats, Exception):
+            logger.error(f"Error getting stats for panel {admin.id}: {admin_stats}")
+            parts.append("   ❌ خطا در دریافت آمار استفاده\n\n")
+            continue
+        
+        user_percentage = (admin_stats.total_users / admin.max_users) * 100 if admin.max_users > 0 else 0
+        traffic_percentage = (admin_stats.total_traffic_used / admin.max_total_traffic) * 100 if admin.max_total_traffic > 0 else 0
+        
+        parts.append(f"   👥 {get_usage_bar(user_percentage)} {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n")
+        parts.append(f"   📊 {get_usage_bar(traffic_percentage)} {format_traffic_size(admin_stats.total_traffic_used)}/{format_traffic_size(admin.max_total_traffic)} ({traffic_percentage:.1f}%)\n\n")
+    
+    await safe_edit_text(
+        callback.message,
+        "".join(parts),
+        reply_markup=_BACK_KB
+    )
+
+
+async def persist_usage_report(admin_user_id: int, check_time: datetime, users_count: int,
+                               total_traffic: int, users_data: List[dict]):
+    """Serialize users_data and store the usage report. Meant to run in the background."""
+    if users_count >= _REPORT_OFFLOAD_THRESHOLD:
+        encoded = await asyncio.to_thread(orjson.dumps, users_data)
+    else:
+        encoded = orjson.dumps(users_data)
+    
+    report = UsageReportModel(
+        admin_user_id=admin_user_id,
+        check_time=check_time,
+        current_users=users_count,
+        current_total_traffic=total_traffic,
+        users_data=encoded.decode()
+    )
+    await db.add_usage_report(report)
 
 
 async def get_my_report_text(user_id: int) -> str:
@@ -281,113 +406,95 @@ async def get_my_report_text(user_id: int) -> str:
         return "❌ ادمین یافت نشد."
     
     try:
-        # Get users from Marzban
-        users = await marzban_api.get_users(admin.username or str(admin.user_id))
+        # Get users from Marzban and the previous report concurrently
+        users, latest_report = await asyncio.gather(
+            get_users_coalesced(admin.username or str(admin.user_id)),
+            db.get_latest_usage_report(admin.user_id)
+        )
         
         # Create usage report
         current_time = datetime.now()
-        total_traffic = sum(user.lifetime_used_traffic for user in users)
-        active_users = [user for user in users if user.status == "active"]
         
-        # Save report to database
-        users_data = [
-            {
+        # Aggregate totals and build the stored snapshot in a single pass
+        total_traffic = 0
+        active_count = 0
+        users_data = []
+        for user in users:
+            total_traffic += user.lifetime_used_traffic
+            if user.status == "active":
+                active_count += 1
+            users_data.append({
                 "username": user.username,
                 "status": user.status,
                 "used_traffic": user.lifetime_used_traffic,
                 "data_limit": user.data_limit,
                 "expire": user.expire
-            }
-            for user in users
-        ]
-        
-        report = UsageReportModel(
-            admin_user_id=admin.user_id,
-            check_time=current_time,
-            current_users=len(users),
-            current_total_traffic=total_traffic,
-            users_data=json.dumps(users_data, ensure_ascii=False)
-        )
+            })
         
-        await db.add_usage_report(report)
+        # Persist in the background; the previous report was read before this write
+        spawn(persist_usage_report(admin.user_id, current_time, len(users), total_traffic, users_data))
         
         # Format report message
-        text = f"📈 گزارش لحظه‌ای شما:\n\n"
-        text += f"🕐 زمان گزارش: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        text += f"👥 تعداد کل کاربران: {len(users)}\n"
-        text += f"✅ کاربران فعال: {len(active_users)}\n"
-        text += f"❌ کاربران غیرفعال: {len(users) - len(active_users)}\n\n"
-        text += f"📊 مجموع ترافیک مصرفی: {await format_traffic_size(total_traffic)}\n"
-        text += f"📈 میانگین ترافیک هر کاربر: {await format_traffic_size(total_traffic // max(len(users), 1))}\n\n"
+        parts = [f"📈 گزارش لحظه‌ای شما:\n\n"]
+        parts.append(f"🕐 زمان گزارش: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        parts.append(f"👥 تعداد کل کاربران: {len(users)}\n")
+        parts.append(f"✅ کاربران فعال: {active_count}\n")
+        parts.append(f"❌ کاربران غیرفعال: {len(users) - active_count}\n\n")
+        parts.append(f"📊 مجموع ترافیک مصرفی: {format_traffic_size(total_traffic)}\n")
+        parts.append(f"📈 میانگین ترافیک هر کاربر: {format_traffic_size(total_traffic // max(len(users), 1))}\n\n")
         
         # Show usage percentages
         user_percentage = (len(users) / admin.max_users) * 100
         traffic_percentage = (total_traffic / admin.max_total_traffic) * 100
         
-        text += f"📊 درصد استفاده از محدودیت‌ها:\n"
-        text += f"👥 کاربران: {user_percentage:.1f}%\n"
-        text += f"📊 ترافیک: {traffic_percentage:.1f}%\n"
+        parts.append(f"📊 درصد استفاده از محدودیت‌ها:\n")
+        parts.append(f"👥 کاربران: {user_percentage:.1f}%\n")
+        parts.append(f"📊 ترافیک: {traffic_percentage:.1f}%\n")
         
         # Recent usage trend (if available)
-        latest_report = await db.get_latest_usage_report(admin.user_id)
-        if latest_report and latest_report.id != report.id:
+        if latest_report:
             time_diff = (current_time - latest_report.check_time).total_seconds()
             if time_diff > 0:
                 traffic_diff = total_traffic - latest_report.current_total_traffic
                 user_diff = len(users) - latest_report.current_users
                 
-                text += f"\n📈 تغییرات از آخرین گزارش:\n"
-                text += f"👥 تغییر کاربران: {user_diff:+d}\n"
-                text += f"📊 ترافیک جدید: {await format_traffic_size(max(0, traffic_diff))}\n"
+                parts.append(f"\n📈 تغییرات از آخرین گزارش:\n")
+                parts.append(f"👥 تغییر کاربران: {user_diff:+d}\n")
+                parts.append(f"📊 ترافیک جدید: {format_traffic_size(max(0, traffic_diff))}\n")
         
     except Exception as e:
-        text = f"❌ خطا در دریافت گزارش: {str(e)}"
-    
-    return text
-
-
-@admin_router.callback_query(F.data == "my_report")
-async def my_report_callback(callback: CallbackQuery):
-    """Show admin's detailed usage report."""
-    if not await db.is_admin_authorized(callback.from_user.id):
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
-    await show_panel_selection_or_execute(callback, "report")
-
-
-@admin_router.callback_query(F.data.startswith("report_panel_"))
-async def report_panel_selected(callback: CallbackQuery):
-    """Handle admin report for selected panel."""
-    if not await db.is_admin_authorized(callback.from_user.id):
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
-    admin_id = int(callback.data.split("_")[-1])
-    admin = await db.get_admin_by_id(admin_id)
-    
-    if not admin or admin.user_id != callback.from_user.id:
-        await callback.answer("پنل یافت نشد.", show_alert=True)
-        return
+        parts = [f"❌ خطا در دریافت گزارش: {str(e)}"]
     
-    await show_admin_report(callback, admin)
+    return "".join(parts)
 
 
 async def show_admin_report(callback: CallbackQuery, admin: AdminModel):
     """Show report for specific admin panel with real-time data."""
+    panel_name = admin.panel_name
+    
+    await callback.answer()
+    await safe_edit_text(callback.message, _LOADING_TEXT, reply_markup=_BACK_KB)
+    
     try:
         # Get real-time users from Marzban using admin's own credentials
         admin_api = await marzban_api.create_admin_api(admin.marzban_username, admin.marzban_password)
-        users = await admin_api.get_users()
+        users, latest_report = await asyncio.gather(
+            admin_api.get_users(),
+            db.get_latest_usage_report(admin.user_id)
+        )
         
         # Create usage report
         current_time = datetime.now()
-        total_traffic = sum(user.used_traffic + (user.lifetime_used_traffic or 0) for user in users)
-        active_users = [user for user in users if user.status == "active"]
         
-        # Save report to database
-        users_data = [
-            {
+        # Aggregate totals and build the stored snapshot in a single pass
+        total_traffic = 0
+        active_count = 0
+        users_data = []
+        for user in users:
+            total_traffic += user.used_traffic + (user.lifetime_used_traffic or 0)
+            if user.status == "active":
+                active_count += 1
+            users_data.append({
                 "username": user.username,
                 "status": user.status,
                 "used_traffic": user.used_traffic,
@@ -395,298 +502,242 @@ async def show_admin_report(callback: CallbackQuery, admin: AdminModel):
                 "data_limit": user.data_limit,
                 "expire": user.expire,
                 "admin": user.admin
-            }
-            for user in users
-        ]
-        
-        report = UsageReportModel(
-            admin_user_id=admin.user_id,
-            check_time=current_time,
-            current_users=len(users),
-            current_total_traffic=total_traffic,
-            users_data=json.dumps(users_data, ensure_ascii=False)
-        )
-        
-        await db.add_usage_report(report)
+            })
         
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
+        # Persist in the background; the previous report was read before this write
+        spawn(persist_usage_report(admin.user_id, current_time, len(users), total_traffic, users_data))
         
         # Format report message
-        text = f"📈 گزارش لحظه‌ای پنل {panel_name}:\n\n"
-        text += f"🕐 زمان گزارش: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        text += f"👥 تعداد کل کاربران: {len(users)}\n"
-        text += f"✅ کاربران فعال: {len(active_users)}\n"
-        text += f"❌ کاربران غیرفعال: {len(users) - len(active_users)}\n\n"
-        text += f"📊 مجموع ترافیک مصرفی: {await format_traffic_size(total_traffic)}\n"
-        text += f"📈 میانگین ترافیک هر کاربر: {await format_traffic_size(total_traffic // max(len(users), 1))}\n\n"
+        parts = [f"📈 گزارش لحظه‌ای پنل {panel_name}:\n\n"]
+        parts.append(f"🕐 زمان گزارش: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        parts.append(f"👥 تعداد کل کاربران: {len(users)}\n")
+        parts.append(f"✅ کاربران فعال: {active_count}\n")
+        parts.append(f"❌ کاربران غیرفعال: {len(users) - active_count}\n\n")
+        parts.append(f"📊 مجموع ترافیک مصرفی: {format_traffic_size(total_traffic)}\n")
+        parts.append(f"📈 میانگین ترافیک هر کاربر: {format_traffic_size(total_traffic // max(len(users), 1))}\n\n")
         
         # Show usage percentages
         user_percentage = (len(users) / admin.max_users) * 100 if admin.max_users > 0 else 0
         traffic_percentage = (total_traffic / admin.max_total_traffic) * 100 if admin.max_total_traffic > 0 else 0
         
-        text += f"📊 درصد استفاده از محدودیت‌ها:\n"
-        text += f"👥 کاربران: {user_percentage:.1f}%\n"
-        text += f"📊 ترافیک: {traffic_percentage:.1f}%\n"
+        parts.append(f"📊 درصد استفاده از محدودیت‌ها:\n")
+        parts.append(f"👥 کاربران: {user_percentage:.1f}%\n")
+        parts.append(f"📊 ترافیک: {traffic_percentage:.1f}%\n")
         
         # Recent usage trend (if available)
-        latest_report = await db.get_latest_usage_report(admin.user_id)
-        if latest_report and latest_report.id != report.id:
+        if latest_report:
             time_diff = (current_time - latest_report.check_time).total_seconds()
             if time_diff > 0:
                 traffic_diff = total_traffic - latest_report.current_total_traffic
                 user_diff = len(users) - latest_report.current_users
                 
-                text += f"\n📈 تغییرات از آخرین گزارش:\n"
-                text += f"👥 تغییر کاربران: {user_diff:+d}\n"
-                text += f"📊 ترافیک جدید: {await format_traffic_size(max(0, traffic_diff))}\n"
-        
-    except Exception as e:
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-        text = f"❌ خطا در دریافت گزارش پنل {panel_name}: {str(e)}"
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
-        ])
+                parts.append(f"\n📈 تغییرات از آخرین گزارش:\n")
+                parts.append(f"👥 تغییر کاربران: {user_diff:+d}\n")
+                parts.append(f"📊 ترافیک جدید: {format_traffic_size(max(0, traffic_diff))}\n")
+        
+    except _TEMPORARY_ERRORS:
+        logger.exception("show_admin_report failed for panel %s", admin.id)
+        parts = [_TEMPORARY_ERROR_TEXT]
+    except Exception:
+        # Don't leave the message stuck on the loading text
+        logger.exception("show_admin_report failed for panel %s", admin.id)
+        await safe_edit_text(callback.message, _TEMPORARY_ERROR_TEXT, reply_markup=_BACK_KB)
+        raise
+    
+    await safe_edit_text(
+        callback.message,
+        "".join(parts),
+        reply_markup=_BACK_KB
     )
-    await callback.answer()
-
-
-# Users and reactivate handlers
-@admin_router.callback_query(F.data == "my_users")
-async def my_users_callback(callback: CallbackQuery):
-    """Show admin's users list."""
-    if not await db.is_admin_authorized(callback.from_user.id):
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
-    await show_panel_selection_or_execute(callback, "users")
-
-
-@admin_router.callback_query(F.data.startswith("users_panel_"))
-async def users_panel_selected(callback: CallbackQuery):
-    """Handle admin users for selected panel."""
-    if not await db.is_admin_authorized(callback.from_user.id):
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
-    admin_id = int(callback.data.split("_")[-1])
-    admin = await db.get_admin_by_id(admin_id)
-    
-    if not admin or admin.user_id != callback.from_user.id:
-        await callback.answer("پنل یافت نشد.", show_alert=True)
-        return
-    
-    await show_admin_users(callback, admin)
 
 
 async def show_admin_users(callback: CallbackQuery, admin: AdminModel):
     """Show users list for specific admin panel."""
+    panel_name = admin.panel_name
+    
+    await callback.answer()
+    await safe_edit_text(callback.message, _LOADING_TEXT, reply_markup=_BACK_KB)
+    
     try:
         # Get real-time users from Marzban using admin's own credentials
         admin_api = await marzban_api.create_admin_api(admin.marzban_username, admin.marzban_password)
         users = await admin_api.get_users()
         
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-        
         if not users:
-            text = f"❌ هیچ کاربری در پنل {panel_name} یافت نشد."
+            parts = [f"❌ هیچ کاربری در پنل {panel_name} یافت نشد."]
         else:
-            text = f"👥 لیست کاربران پنل {panel_name} ({len(users)} کاربر):\n\n"
+            parts = [f"👥 لیست کاربران پنل {panel_name} ({len(users)} کاربر):\n\n"]
             
-            for i, user in enumerate(users[:20], 1):  # Show first 20 users
+            head = users[:_USERS_LIST_LIMIT]
+            extra = len(users) - len(head)
+            for i, user in enumerate(head, 1):
                 status_emoji = "✅" if user.status == "active" else "❌"
-                traffic_info = f"{await format_traffic_size(user.used_traffic + (user.lifetime_used_traffic or 0))}"
+                used = format_traffic_size(user.used_traffic + (user.lifetime_used_traffic or 0))
+                traffic_info = f"{used}/{format_traffic_size(user.data_limit)}" if user.data_limit else used
+                expire_line = f"   📅 انقضا: {format_expire_date(user.expire)}\n" if user.expire else ""
                 
-                if user.data_limit:
-                    traffic_info += f"/{await format_traffic_size(user.data_limit)}"
+                parts.append(f"{i}. {status_emoji} {user.username}\n   📊 ترافیک: {traffic_info}\n{expire_line}\n")
+            
+            if extra:
+                parts.append(f"... و {extra} کاربر دیگر")
+        
+    except _TEMPORARY_ERRORS:
+        logger.exception("show_admin_users failed for panel %s", admin.id)
+        parts = [_TEMPORARY_ERROR_TEXT]
+    except Exception:
+        logger.exception("show_admin_users failed for panel %s", admin.id)
+        await safe_edit_text(callback.message, _TEMPORARY_ERROR_TEXT, reply_markup=_BACK_KB)
+        raise
+    
+    await safe_edit_text(
+        callback.message,
+        "".join(parts),
+        reply_markup=_BACK_KB
+    )
+
+
+async def show_admin_reactivate(callback: CallbackQuery, admin: AdminModel):
+    """Reactivate disabled users of a specific admin panel once it is back within its limits."""
+    # Ignore repeated clicks while the same operation is still running
+    lock = get_lock(("reactivate_users", admin.id))
+    if lock.locked():
+        await callback.answer(_MSG_IN_PROGRESS, show_alert=True)
+        return
+    
+    async with lock:
+        panel_name = admin.panel_name
+    
+        await callback.answer()
+        await safe_edit_text(callback.message, _LOADING_TEXT, reply_markup=_BACK_KB)
+    
+        try:
+            admin_api = await marzban_api.create_admin_api(admin.marzban_username, admin.marzban_password)
+            users = await admin_api.get_users()
+            disabled_users = [user.username for user in users if user.status == "disabled"]
+        
+            if not disabled_users:
+                parts = [f"✅ همه کاربران پنل {panel_name} فعال هستند."]
+            else:
+                # Check limits before reactivating, always against fresh stats
+                current_stats = await admin_api.get_admin_stats()
+                user_percentage = (current_stats.total_users / admin.max_users) * 100 if admin.max_users > 0 else 0
+                traffic_percentage = (current_stats.total_traffic_used / admin.max_total_traffic) * 100 if admin.max_total_traffic > 0 else 0
+            
+                if user_percentage >= 100 or traffic_percentage >= 100:
+                    parts = [
+                        f"❌ پنل {panel_name} همچنان از محدودیت‌هایش عبور کرده است.\n"
+                        "برای فعالسازی مجدد کاربران، ابتدا باید محدودیت‌ها رفع شوند."
+                    ]
+                else:
+                    results = await marzban_api.enable_users_batch(disabled_users)
+                    _panel_stats_cache.pop(admin.id)
                 
-                text += f"{i}. {status_emoji} {user.username}\n"
-                text += f"   📊 ترافیک: {traffic_info}\n"
+                    successful = [username for username, success in results.items() if success]
+                    failed = [username for username, success in results.items() if not success]
                 
-                if user.expire:
-                    expire_date = datetime.fromtimestamp(user.expire)
-                    text += f"   📅 انقضا: {expire_date.strftime('%Y-%m-%d')}\n"
+                    parts = [f"🔄 نتیجه فعالسازی کاربران پنل {panel_name}:\n\n"]
+                    parts.append(f"✅ موفق: {len(successful)} کاربر\n")
+                    parts.append(f"❌ ناموفق: {len(failed)} کاربر\n\n")
                 
-                text += "\n"
-            
-            if len(users) > 20:
-                text += f"... و {len(users) - 20} کاربر دیگر"
-        
-    except Exception as e:
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-        text = f"❌ خطا در دریافت لیست کاربران پنل {panel_name}: {str(e)}"
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
-        ])
-    )
-    await callback.answer()
+                    if successful:
+                        parts.append("✅ کاربران فعال شده:\n")
+                        for username in successful[:10]:
+                            parts.append(f"• {username}\n")
+                        if len(successful) > 10:
+                            parts.append(f"... و {len(successful) - 10} کاربر دیگر\n")
+                
+                    if failed:
+                        parts.append("\n❌ کاربران ناموفق:\n")
+                        for username in failed[:5]:
+                            parts.append(f"• {username}\n")
+                        if len(failed) > 5:
+                            parts.append(f"... و {len(failed) - 5} کاربر دیگر\n")
+        
+        except _TEMPORARY_ERRORS:
+            logger.exception("show_admin_reactivate failed for panel %s", admin.id)
+            parts = [_TEMPORARY_ERROR_TEXT]
+        except Exception:
+            logger.exception("show_admin_reactivate failed for panel %s", admin.id)
+            await safe_edit_text(callback.message, _TEMPORARY_ERROR_TEXT, reply_markup=_BACK_KB)
+            raise
+    
+        await safe_edit_text(
+            callback.message,
+            "".join(parts),
+            reply_markup=_BACK_KB
+        )
+
+
+# Per-panel actions, reached through `<action>_panel_<id>` callbacks
+_PANEL_ACTIONS = {
+    "info": show_admin_info,
+    "report": show_admin_report,
+    "users": show_admin_users,
+    "reactivate": show_admin_reactivate,
+}
 
 
-@admin_router.callback_query(F.data == "reactivate_users")
-async def reactivate_users_callback(callback: CallbackQuery):
-    """Show admin's reactivate users option."""
-    if not await db.is_admin_authorized(callback.from_user.id):
+# Main menu buttons and the action each one runs
+_MENU_ACTIONS = {
+    "my_info": "info",
+    "my_report": "report",
+    "my_users": "users",
+    "reactivate_users": "reactivate",
+}
+
+
+@admin_router.callback_query(F.data.in_(_MENU_ACTIONS))
+async def menu_action_selected(callback: CallbackQuery):
+    """Run a main menu action, asking for a panel first when the user has several."""
+    if not await is_authorized_cached(callback.from_user.id):
         await callback.answer("غیرمجاز", show_alert=True)
         return
     
-    await show_panel_selection_or_execute(callback, "reactivate")
+    await show_panel_selection_or_execute(callback, _MENU_ACTIONS[callback.data])
 
 
-@admin_router.callback_query(F.data.startswith("reactivate_panel_"))
-async def reactivate_panel_selected(callback: CallbackQuery):
-    """Handle admin reactivate for selected panel."""
-    if not await db.is_admin_authorized(callback.from_user.id):
+@admin_router.callback_query(F.data.regexp(r"^(info|report|users|reactivate)_panel_(\d+)$").as_("panel_match"))
+async def panel_action_selected(callback: CallbackQuery, panel_match: re.Match):
+    """Run the selected action for one of the user's own panels."""
+    if not await is_authorized_cached(callback.from_user.id):
         await callback.answer("غیرمجاز", show_alert=True)
         return
     
-    admin_id = int(callback.data.split("_")[-1])
-    admin = await db.get_admin_by_id(admin_id)
+    action, admin_id = panel_match.group(1), int(panel_match.group(2))
+    if not check_rate(callback.from_user.id, action):
+        await callback.answer(_MSG_RATE_LIMITED, show_alert=True)
+        return
     
+    # The selection list was built from the cached active panels, so look there first
+    active_admins = await get_active_admins_cached(callback.from_user.id)
+    admin = next((a for a in active_admins if a.id == admin_id), None)
+    if admin is None:
+        admin = await db.get_admin_by_id(admin_id)
     if not admin or admin.user_id != callback.from_user.id:
         await callback.answer("پنل یافت نشد.", show_alert=True)
         return
     
-    await show_admin_reactivate(callback, admin)
-
-
-async def show_admin_reactivate(callback: CallbackQuery, admin: AdminModel):
-    """Show reactivate users option for specific admin panel."""
-    panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-    text = f"🔄 فعالسازی کاربران پنل {panel_name}\n\n"
-    text += "این قابلیت به زودی اضافه خواهد شد."
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
-        ])
-    )
-    await callback.answer()
+    await _PANEL_ACTIONS[action](callback, admin)
 
 
 # Back to main menu handler
 @admin_router.callback_query(F.data == "back_to_admin_main")
 async def back_to_admin_main(callback: CallbackQuery):
     """Return to admin main menu."""
-    if not await db.is_admin_authorized(callback.from_user.id):
+    if not await is_authorized_cached(callback.from_user.id):
         await callback.answer("غیرمجاز", show_alert=True)
         return
     
     # Get user's admin panels
-    admins = await db.get_admins_for_user(callback.from_user.id)
-    active_admins = [admin for admin in admins if admin.is_active]
+    active_admins = await get_active_admins_cached(callback.from_user.id)
+    welcome_message = build_admin_welcome(active_admins)
     
-    welcome_message = config.MESSAGES["welcome_admin"]
-    if len(active_admins) > 1:
-        welcome_message += f"\n\n🔹 شما {len(active_admins)} پنل فعال دارید:"
-        for admin in active_admins:
-            panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-            welcome_message += f"\n• {panel_name}"
-    elif len(active_admins) == 1:
-        admin = active_admins[0]
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-        welcome_message += f"\n\n🔹 پنل فعال: {panel_name}"
-    
-    await callback.message.edit_text(
+    await safe_edit_text(
+        callback.message,
         welcome_message,
         reply_markup=get_admin_keyboard()
     )
     await callback.answer()
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
-        ])
-    )
-    await callback.answer()
-
-
-@admin_router.callback_query(F.data == "reactivate_users")
-async def reactivate_users_callback(callback: CallbackQuery):
-    """Reactivate disabled users (if allowed)."""
-    if not await db.is_admin_authorized(callback.from_user.id):
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
-    admin = await db.get_admin(callback.from_user.id)
-    if not admin:
-        await callback.answer("ادمین یافت نشد", show_alert=True)
-        return
-    
-    try:
-        # Get users from Marzban
-        users = await marzban_api.get_users(admin.username or str(admin.user_id))
-        disabled_users = [user for user in users if user.status == "disabled"]
-        
-        if not disabled_users:
-            await callback.message.edit_text(
-                "✅ همه کاربران شما فعال هستند.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
-                ])
-            )
-            await callback.answer()
-            return
-        
-        # Check if admin still has capacity
-        current_stats = await marzban_api.get_admin_stats(admin.username or str(admin.user_id))
-        
-        # Check limits before reactivating
-        user_percentage = (current_stats.total_users / admin.max_users) * 100
-        traffic_percentage = (current_stats.total_traffic_used / admin.max_total_traffic) * 100
-        
-        if user_percentage >= 100 or traffic_percentage >= 100:
-            await callback.message.edit_text(
-                "❌ شما همچنان محدودیت‌هایتان را عبور کرده‌اید.\n"
-                "برای فعالسازی مجدد کاربران، ابتدا باید محدودیت‌ها رفع شوند.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
-                ])
-            )
-            await callback.answer()
-            return
-        
-        # Reactivate users
-        usernames = [user.username for user in disabled_users]
-        results = await marzban_api.enable_users_batch(usernames)
-        
-        successful = [username for username, success in results.items() if success]
-        failed = [username for username, success in results.items() if not success]
-        
-        text = f"🔄 نتیجه فعالسازی کاربران:\n\n"
-        text += f"✅ موفق: {len(successful)} کاربر\n"
-        text += f"❌ ناموفق: {len(failed)} کاربر\n\n"
-        
-        if successful:
-            text += f"✅ کاربران فعال شده:\n"
-            for username in successful[:10]:
-                text += f"• {username}\n"
-            if len(successful) > 10:
-                text += f"... و {len(successful) - 10} کاربر دیگر\n"
-        
-        if failed:
-            text += f"\n❌ کاربران ناموفق:\n"
-            for username in failed[:5]:
-                text += f"• {username}\n"
-            if len(failed) > 5:
-                text += f"... و {len(failed) - 5} کاربر دیگر\n"
-        
-    except Exception as e:
-        text = f"❌ خطا در فعالسازی کاربران: {str(e)}"
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_admin_main")]
-        ])
-    )
-    await callback.answer()
 
 
 @admin_router.message(Command("گزارش_من"))
@@ -696,8 +747,8 @@ async def my_report_command(message: Message):
         return  # Let sudo handler handle this
     
     # Check if user is authorized admin
-    if not await db.is_admin_authorized(message.from_user.id):
-        await message.answer(config.MESSAGES["unauthorized"])
+    if not await is_authorized_cached(message.from_user.id):
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     text = await get_my_report_text(message.from_user.id)
@@ -711,28 +762,14 @@ async def my_users_command(message: Message):
         return  # Let sudo handler handle this
     
     # Check if user is authorized admin
-    if not await db.is_admin_authorized(message.from_user.id):
-        await message.answer(config.MESSAGES["unauthorized"])
+    if not await is_authorized_cached(message.from_user.id):
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     text = await get_my_users_text(message.from_user.id)
     await message.answer(text, reply_markup=get_admin_keyboard())
 
 
-@admin_router.callback_query(F.data == "back_to_admin_main")
-async def back_to_admin_main(callback: CallbackQuery):
-    """Return to admin main menu."""
-    if not await db.is_admin_authorized(callback.from_user.id):
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
-    await callback.message.edit_text(
-        config.MESSAGES["welcome_admin"],
-        reply_markup=get_admin_keyboard()
-    )
-    await callback.answer()
-
-
 # Text command handlers for direct commands
 @admin_router.message(Command("گزارش_من", "my_report"))
 async def my_report_command(message: Message):
@@ -740,8 +777,8 @@ async def my_report_command(message: Message):
     if message.from_user.id in config.SUDO_ADMINS:
         return  # Let sudo handler handle this
     
-    if not await db.is_admin_authorized(message.from_user.id):
-        await message.answer(config.MESSAGES["unauthorized"])
+    if not await is_authorized_cached(message.from_user.id):
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     admin = await db.get_admin(message.from_user.id)
@@ -750,69 +787,66 @@ async def my_report_command(message: Message):
         return
     
     try:
-        # Get users from Marzban
-        users = await marzban_api.get_users(admin.username or str(admin.user_id))
+        # Get users from Marzban and the previous report concurrently
+        users, latest_report = await asyncio.gather(
+            get_users_coalesced(admin.username or str(admin.user_id)),
+            db.get_latest_usage_report(admin.user_id)
+        )
         
         # Create usage report
         current_time = datetime.now()
-        total_traffic = sum(user.lifetime_used_traffic for user in users)
-        active_users = [user for user in users if user.status == "active"]
         
-        # Save report to database
-        users_data = [
-            {
+        # Aggregate totals and build the stored snapshot in a single pass
+        total_traffic = 0
+        active_count = 0
+        users_data = []
+        for user in users:
+            total_traffic += user.lifetime_used_traffic
+            if user.status == "active":
+                active_count += 1
+            users_data.append({
                 "username": user.username,
                 "status": user.status,
                 "used_traffic": user.lifetime_used_traffic,
                 "data_limit": user.data_limit,
                 "expire": user.expire
-            }
-            for user in users
-        ]
-        
-        report = UsageReportModel(
-            admin_user_id=admin.user_id,
-            check_time=current_time,
-            current_users=len(users),
-            current_total_traffic=total_traffic,
-            users_data=json.dumps(users_data, ensure_ascii=False)
-        )
+            })
         
-        await db.add_usage_report(report)
+        # Persist in the background; the previous report was read before this write
+        spawn(persist_usage_report(admin.user_id, current_time, len(users), total_traffic, users_data))
         
         # Format report message
-        text = f"📈 گزارش لحظه‌ای شما:\n\n"
-        text += f"🕐 زمان گزارش: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        text += f"👥 تعداد کل کاربران: {len(users)}\n"
-        text += f"✅ کاربران فعال: {len(active_users)}\n"
-        text += f"❌ کاربران غیرفعال: {len(users) - len(active_users)}\n\n"
-        text += f"📊 مجموع ترافیک مصرفی: {await format_traffic_size(total_traffic)}\n"
-        text += f"📈 میانگین ترافیک هر کاربر: {await format_traffic_size(total_traffic // max(len(users), 1))}\n\n"
+        parts = [f"📈 گزارش لحظه‌ای شما:\n\n"]
+        parts.append(f"🕐 زمان گزارش: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        parts.append(f"👥 تعداد کل کاربران: {len(users)}\n")
+        parts.append(f"✅ کاربران فعال: {active_count}\n")
+        parts.append(f"❌ کاربران غیرفعال: {len(users) - active_count}\n\n")
+        parts.append(f"📊 مجموع ترافیک مصرفی: {format_traffic_size(total_traffic)}\n")
+        parts.append(f"📈 میانگین ترافیک هر کاربر: {format_traffic_size(total_traffic // max(len(users), 1))}\n\n")
         
         # Show usage percentages
         user_percentage = (len(users) / admin.max_users) * 100
         traffic_percentage = (total_traffic / admin.max_total_traffic) * 100
         
-        text += f"📊 درصد استفاده از محدودیت‌ها:\n"
-        text += f"👥 کاربران: {user_percentage:.1f}%\n"
-        text += f"📊 ترافیک: {traffic_percentage:.1f}%\n"
+        parts.append(f"📊 درصد استفاده از محدودیت‌ها:\n")
+        parts.append(f"👥 کاربران: {user_percentage:.1f}%\n")
+        parts.append(f"📊 ترافیک: {traffic_percentage:.1f}%\n")
         
         # Recent usage trend (if available)
-        latest_report = await db.get_latest_usage_report(admin.user_id)
-        if latest_report and latest_report.id != report.id:
+        if latest_report:
             time_diff = (current_time - latest_report.check_time).total_seconds()
             if time_diff > 0:
                 traffic_diff = total_traffic - latest_report.current_total_traffic
                 user_diff = len(users) - latest_report.current_users
                 
-                text += f"\n📈 تغییرات از آخرین گزارش:\n"
-                text += f"👥 تغییر کاربران: {user_diff:+d}\n"
-                text += f"📊 ترافیک جدید: {await format_traffic_size(max(0, traffic_diff))}\n"
+                parts.append(f"\n📈 تغییرات از آخرین گزارش:\n")
+                parts.append(f"👥 تغییر کاربران: {user_diff:+d}\n")
+                parts.append(f"📊 ترافیک جدید: {format_traffic_size(max(0, traffic_diff))}\n")
         
     except Exception as e:
-        text = f"❌ خطا در دریافت گزارش: {str(e)}"
+        parts = [f"❌ خطا در دریافت گزارش: {str(e)}"]
     
-    await message.answer(text, reply_markup=get_admin_keyboard())
+    await message.answer("".join(parts), reply_markup=get_admin_keyboard())
 
 
 @admin_router.message(Command("کاربران_من", "my_users"))
@@ -821,8 +855,8 @@ async def my_users_command(message: Message):
     if message.from_user.id in config.SUDO_ADMINS:
         return  # Let sudo handler handle this
     
-    if not await db.is_admin_authorized(message.from_user.id):
-        await message.answer(config.MESSAGES["unauthorized"])
+    if not await is_authorized_cached(message.from_user.id):
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     admin = await db.get_admin(message.from_user.id)
@@ -832,36 +866,30 @@ async def my_users_command(message: Message):
     
     try:
         # Get users from Marzban
-        users = await marzban_api.get_users(admin.username or str(admin.user_id))
+        users = await get_users_coalesced(admin.username or str(admin.user_id))
         
         if not users:
-            text = "❌ کاربری یافت نشد."
+            parts = ["❌ کاربری یافت نشد."]
         else:
-            text = f"👥 لیست کاربران شما ({len(users)} کاربر):\n\n"
+            parts = [f"👥 لیست کاربران شما ({len(users)} کاربر):\n\n"]
             
-            for i, user in enumerate(users[:20], 1):  # Show first 20 users
+            head = users[:_USERS_LIST_LIMIT]
+            extra = len(users) - len(head)
+            for i, user in enumerate(head, 1):
                 status_emoji = "✅" if user.status == "active" else "❌"
-                traffic_info = f"{await format_traffic_size(user.lifetime_used_traffic)}"
-                
-                if user.data_limit:
-                    traffic_info += f"/{await format_traffic_size(user.data_limit)}"
-                
-                text += f"{i}. {status_emoji} {user.username}\n"
-                text += f"   📊 ترافیک: {traffic_info}\n"
+                used = format_traffic_size(user.lifetime_used_traffic)
+                traffic_info = f"{used}/{format_traffic_size(user.data_limit)}" if user.data_limit else used
+                expire_line = f"   📅 انقضا: {format_expire_date(user.expire)}\n" if user.expire else ""
                 
-                if user.expire:
-                    expire_date = datetime.fromtimestamp(user.expire)
-                    text += f"   📅 انقضا: {expire_date.strftime('%Y-%m-%d')}\n"
-                
-                text += "\n"
+                parts.append(f"{i}. {status_emoji} {user.username}\n   📊 ترافیک: {traffic_info}\n{expire_line}\n")
             
-            if len(users) > 20:
-                text += f"... و {len(users) - 20} کاربر دیگر"
+            if extra:
+                parts.append(f"... و {extra} کاربر دیگر")
         
     except Exception as e:
-        text = f"❌ خطا در دریافت لیست کاربران: {str(e)}"
+        parts = [f"❌ خطا در دریافت لیست کاربران: {str(e)}"]
     
-    await message.answer(text, reply_markup=get_admin_keyboard())
+    await message.answer("".join(parts), reply_markup=get_admin_keyboard())
 
 
 @admin_router.message(Command("اطلاعات_من", "my_info"))
@@ -870,8 +898,8 @@ async def my_info_command(message: Message):
     if message.from_user.id in config.SUDO_ADMINS:
         return  # Let sudo handler handle this
         
-    if not await db.is_admin_authorized(message.from_user.id):
-        await message.answer(config.MESSAGES["unauthorized"])
+    if not await is_authorized_cached(message.from_user.id):
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     admin = await db.get_admin(message.from_user.id)
@@ -880,41 +908,45 @@ async def my_info_command(message: Message):
         return
     
     try:
-        # Get current usage from Marzban
-        admin_stats = await marzban_api.get_admin_stats(admin.username or str(admin.user_id))
+        # Get current usage from Marzban and remaining days from the database concurrently
+        admin_stats, remaining_days = await asyncio.gather(
+            get_admin_stats_coalesced(admin.username or str(admin.user_id)),
+            db.get_admin_remaining_days(admin.id)
+        )
         
         # Calculate usage percentages
         user_percentage = (admin_stats.total_users / admin.max_users) * 100
         traffic_percentage = (admin_stats.total_traffic_used / admin.max_total_traffic) * 100
         time_percentage = (admin_stats.total_time_used / admin.max_total_time) * 100
         
-        # Get remaining days
-        remaining_days = await db.get_admin_remaining_days(admin.id)
-        
-        text = f"👤 اطلاعات حساب شما:\n\n"
-        text += f"📋 نام کاربری: {admin.username or 'نامشخص'}\n"
-        text += f"🆔 User ID: {admin.user_id}\n"
-        text += f"📅 تاریخ ایجاد: {admin.created_at}\n"
-        text += f"⏰ روزهای باقی‌مانده: {remaining_days} روز\n"
-        text += f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n"
+        parts = [f"👤 اطلاعات حساب شما:\n\n"]
+        parts.append(f"📋 نام کاربری: {admin.username or 'نامشخص'}\n")
+        parts.append(f"🆔 User ID: {admin.user_id}\n")
+        parts.append(f"📅 تاریخ ایجاد: {admin.created_at}\n")
+        parts.append(f"⏰ روزهای باقی‌مانده: {remaining_days} روز\n")
+        parts.append(f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n")
         
-        text += f"📊 محدودیت‌ها و استفاده:\n\n"
+        parts.append(f"📊 محدودیت‌ها و استفاده:\n\n")
         
         # Users
         user_status = "🟢" if user_percentage < 80 else "🟡" if user_percentage < 100 else "🔴"
-        text += f"{user_status} کاربران: {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n"
+        parts.append(f"{user_status} کاربران: {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n")
         
         # Traffic
         traffic_status = "🟢" if traffic_percentage < 80 else "🟡" if traffic_percentage < 100 else "🔴"
-        text += f"{traffic_status} ترافیک: {await format_traffic_size(admin_stats.total_traffic_used)}/{await format_traffic_size(admin.max_total_traffic)} ({traffic_percentage:.1f}%)\n"
+        traffic_used = format_traffic_size(admin_stats.total_traffic_used)
+        traffic_limit = format_traffic_size(admin.max_total_traffic)
+        parts.append(f"{traffic_status} ترافیک: {traffic_used}/{traffic_limit} ({traffic_percentage:.1f}%)\n")
         
         # Time
         time_status = "🟢" if time_percentage < 80 else "🟡" if time_percentage < 100 else "🔴"
-        text += f"{time_status} زمان: {await format_time_duration(admin_stats.total_time_used)}/{await format_time_duration(admin.max_total_time)} ({time_percentage:.1f}%)\n"
+        time_used = format_time_duration(admin_stats.total_time_used)
+        time_limit = format_time_duration(admin.max_total_time)
+        parts.append(f"{time_status} زمان: {time_used}/{time_limit} ({time_percentage:.1f}%)\n")
         
         # Warning if approaching limits
         if any(p >= 80 for p in [user_percentage, traffic_percentage, time_percentage]):
-            text += f"\n⚠️ توجه: شما به محدودیت‌هایتان نزدیک شده‌اید!"
+            parts.append(f"\n⚠️ توجه: شما به محدودیت‌هایتان نزدیک شده‌اید!")
         
     except Exception as e:
         # Get remaining days even if stats fail
@@ -923,15 +955,15 @@ async def my_info_command(message: Message):
         except:
             remaining_days = admin.validity_days
             
-        text = f"👤 اطلاعات حساب شما:\n\n"
-        text += f"📋 نام کاربری: {admin.username or 'نامشخص'}\n"
-        text += f"🆔 User ID: {admin.user_id}\n"
-        text += f"📅 تاریخ ایجاد: {admin.created_at}\n"
-        text += f"⏰ روزهای باقی‌مانده: {remaining_days} روز\n"
-        text += f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n"
-        text += f"❌ خطا در دریافت آمار استفاده: {str(e)}"
+        parts = [f"👤 اطلاعات حساب شما:\n\n"]
+        parts.append(f"📋 نام کاربری: {admin.username or 'نامشخص'}\n")
+        parts.append(f"🆔 User ID: {admin.user_id}\n")
+        parts.append(f"📅 تاریخ ایجاد: {admin.created_at}\n")
+        parts.append(f"⏰ روزهای باقی‌مانده: {remaining_days} روز\n")
+        parts.append(f"✅ وضعیت: {'فعال' if admin.is_active else 'غیرفعال'}\n\n")
+        parts.append(f"❌ خطا در دریافت آمار استفاده: {str(e)}")
     
-    await message.answer(text, reply_markup=get_admin_keyboard())
+    await message.answer("".join(parts), reply_markup=get_admin_keyboard())
 
 
 @admin_router.message(StateFilter(None), F.text & ~F.text.startswith('/'))
@@ -940,7 +972,7 @@ async def admin_unhandled_text(message: Message, state: FSMContext):
     if message.from_user.id in config.SUDO_ADMINS:
         return  # Let sudo handler handle this
     
-    if not await db.is_admin_authorized(message.from_user.id):
+    if not await is_authorized_cached(message.from_user.id):
         return  # Let unauthorized handler handle this
     
     # This handler should only be called when user is NOT in any FSM state
@@ -952,13 +984,4 @@ async def admin_unhandled_text(message: Message, state: FSMContext):
     logger.info(f"Admin user {message.from_user.id} sent unhandled text: {message.text}")
     
     # Show admin menu with a helpful message
-    await message.answer(
-        "👋 شما ادمین معمولی هستید.\n\n"
-        "📋 دستورات موجود:\n"
-        "• /گزارش_من - گزارش استفاده\n"
-        "• /کاربران_من - لیست کاربران\n"
-        "• /اطلاعات_من - اطلاعات حساب\n"
-        "• /start - منوی اصلی\n\n"
-        "یا از دکمه‌های زیر استفاده کنید:",
-        reply_markup=get_admin_keyboard()
-    )
\ No newline at end of file
+    await message.answer(_HELP_TEXT, reply_markup=_ADMIN_KB)
\ No newline at end of file
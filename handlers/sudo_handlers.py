@@ -1,20 +1,27 @@
-from aiogram import Router, F
+from aiogram import BaseMiddleware, Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from typing import List
+from typing import List, Optional
 import logging
 import asyncio
+import time
+import re
 import config
 from database import db
-from models.schemas import AdminModel, LogModel
+from models.schemas import AdminModel, AdminStatsModel, LogModel
 from utils.notify import (
     notify_admin_added, notify_admin_removed, format_traffic_size, format_time_duration,
     gb_to_bytes, days_to_seconds, bytes_to_gb, seconds_to_days
 )
+from utils.locks import get_lock
+from utils.messages import safe_edit_text
+from utils.progress import ProgressMessage
+from utils.tasks import spawn
 from marzban_api import marzban_api
 from datetime import datetime
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -43,47 +50,123 @@ class AddExistingAdminStates(StatesGroup):
     waiting_for_confirmation = State()
 
 
+class SudoOnlyMiddleware(BaseMiddleware):
+    """Answer callbacks from non-sudo users as unauthorized before any sudo handler runs."""
+
+    async def __call__(self, handler, event: CallbackQuery, data):
+        if event.from_user.id not in config.SUDO_ADMINS:
+            await event.answer("غیرمجاز", show_alert=True)
+            return
+        return await handler(event, data)
+
+
 sudo_router = Router()
+sudo_router.callback_query.middleware(SudoOnlyMiddleware())
+
+# Allowed Marzban admin usernames, compiled once instead of per message
+_MARZBAN_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_-]{3,50}$')
+
+# Keyboards are immutable, so build them once at import time
+_SUDO_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text=config.BUTTONS["add_admin"], callback_data="add_admin"),
+        InlineKeyboardButton(text=config.BUTTONS["add_existing_admin"], callback_data="add_existing_admin")
+    ],
+    [
+        InlineKeyboardButton(text=config.BUTTONS["remove_admin"], callback_data="remove_admin"),
+        InlineKeyboardButton(text=config.BUTTONS["activate_admin"], callback_data="activate_admin")
+    ],
+    [
+        InlineKeyboardButton(text=config.BUTTONS["edit_panel"], callback_data="edit_panel"),
+        InlineKeyboardButton(text=config.BUTTONS["admin_status"], callback_data="admin_status")
+    ],
+    [
+        InlineKeyboardButton(text=config.BUTTONS["list_admins"], callback_data="list_admins")
+    ]
+])
+# Shared by the static back keyboard and the dynamically built list keyboards
+_BACK_ROW = [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
+_BACK_KB = InlineKeyboardMarkup(inline_keyboard=[_BACK_ROW])
+
+# Messages used on every request, bound once at import
+_MSG_UNAUTHORIZED = config.MESSAGES["unauthorized"]
+_MSG_IN_PROGRESS = config.MESSAGES["in_progress"]
+_MSG_WELCOME_SUDO = config.MESSAGES["welcome_sudo"]
+_MSG_FORBIDDEN = "⛔ شما مجاز به انجام این عمل نیستید."
+_CANCEL_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text=config.BUTTONS["cancel"], callback_data="back_to_main")]
+])
+_CONFIRM_CREATE_ADMIN_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="✅ تایید و ایجاد", callback_data="confirm_create_admin"),
+        InlineKeyboardButton(text="❌ لغو", callback_data="back_to_main")
+    ]
+])
+_CONFIRM_EDIT_PANEL_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="✅ تأیید", callback_data="confirm_edit_panel"),
+        InlineKeyboardButton(text="❌ لغو", callback_data="back_to_main")
+    ]
+])
+_CONFIRM_ADD_EXISTING_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="✅ تأیید و اضافه کردن", callback_data="confirm_add_existing_admin"),
+        InlineKeyboardButton(text="❌ لغو", callback_data="back_to_main")
+    ]
+])
+
+# Reactivation result messages, filled with str.format_map
+_REACTIVATION_RESULT_TMPL = (
+    "🎉 **نتیجه فعالسازی مجدد**\n\n"
+    "👤 **کاربر:** {user_id}\n"
+    "✅ **موفق:** {successful} پنل\n"
+    "❌ **ناموفق:** {failed} پنل\n\n"
+    "📋 **جزئیات:**\n"
+    "{details}\n\n"
+    "{footer}"
+)
+_REACTIVATION_FAILED_TMPL = (
+    "❌ **فعالسازی ناموفق**\n\n"
+    "👤 **کاربر:** {user_id}\n"
+    "هیچ پنلی فعال نشد.\n\n"
+    "📋 **جزئیات:**\n"
+    "{details}"
+)
+
+
+async def _reject_non_sudo(message: Message, state: FSMContext, action: str) -> bool:
+    """Refuse a wizard step from a non-sudo user and clear their state; returns True when refused."""
+    if message.from_user.id in config.SUDO_ADMINS:
+        return False
+    logger.warning(f"Non-sudo user {message.from_user.id} attempted {action}")
+    await message.answer(_MSG_FORBIDDEN)
+    await state.clear()
+    return True
 
 
+async def _is_repeated_value(state: FSMContext, key: str, value) -> bool:
+    """Return True if value repeats the one last warned about for key; otherwise remember it for next time."""
+    pending_key = f"pending_{key}"
+    if (await state.get_data()).get(pending_key) == value:
+        return True
+    await state.update_data({pending_key: value})
+    return False
+
+
+@lru_cache(maxsize=None)
 def get_progress_indicator(current_step: int, total_steps: int = 7) -> str:
-    """Generate a visual progress indicator."""
-    filled = "🟢"
-    current = "🔵" 
-    empty = "⚪"
-    
-    indicators = []
-    for i in range(1, total_steps + 1):
-        if i < current_step:
-            indicators.append(filled)
-        elif i == current_step:
-            indicators.append(current)
-        else:
-            indicators.append(empty)
-    
-    return "".join(indicators) + f" ({current_step}/{total_steps})"
+    """Generate a visual progress indicator; there are only a handful of distinct steps, so each is built once."""
+    return (
+        "🟢" * (current_step - 1)
+        + "🔵"
+        + "⚪" * (total_steps - current_step)
+        + f" ({current_step}/{total_steps})"
+    )
 
 
 def get_sudo_keyboard() -> InlineKeyboardMarkup:
     """Get sudo admin main keyboard."""
-    buttons = [
-        [
-            InlineKeyboardButton(text=config.BUTTONS["add_admin"], callback_data="add_admin"),
-            InlineKeyboardButton(text=config.BUTTONS["add_existing_admin"], callback_data="add_existing_admin")
-        ],
-        [
-            InlineKeyboardButton(text=config.BUTTONS["remove_admin"], callback_data="remove_admin"),
-            InlineKeyboardButton(text=config.BUTTONS["activate_admin"], callback_data="activate_admin")
-        ],
-        [
-            InlineKeyboardButton(text=config.BUTTONS["edit_panel"], callback_data="edit_panel"),
-            InlineKeyboardButton(text=config.BUTTONS["admin_status"], callback_data="admin_status")
-        ],
-        [
-            InlineKeyboardButton(text=config.BUTTONS["list_admins"], callback_data="list_admins")
-        ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    return _SUDO_KB
 
 
 def get_admin_list_keyboard(admins: List[AdminModel], action: str) -> InlineKeyboardMarkup:
@@ -119,7 +202,7 @@ def get_admin_list_keyboard(admins: List[AdminModel], action: str) -> InlineKeyb
             )
         ])
     
-    buttons.append([InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")])
+    buttons.append(_BACK_ROW)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
@@ -150,7 +233,7 @@ def get_panel_list_keyboard(admins: List[AdminModel], action: str) -> InlineKeyb
             )
         ])
     
-    buttons.append([InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")])
+    buttons.append(_BACK_ROW)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
@@ -158,11 +241,11 @@ def get_panel_list_keyboard(admins: List[AdminModel], action: str) -> InlineKeyb
 async def sudo_start(message: Message):
     """Start command for sudo users."""
     if message.from_user.id not in config.SUDO_ADMINS:
-        await message.answer(config.MESSAGES["unauthorized"])
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     await message.answer(
-        config.MESSAGES["welcome_sudo"],
+        _MSG_WELCOME_SUDO,
         reply_markup=get_sudo_keyboard()
     )
 
@@ -170,10 +253,6 @@ async def sudo_start(message: Message):
 @sudo_router.callback_query(F.data == "add_admin")
 async def add_admin_callback(callback: CallbackQuery, state: FSMContext):
     """Start adding new admin process."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
     # Clear any existing state first
     current_state = await state.get_state()
     logger.info(f"User {callback.from_user.id} clearing previous state before add_admin: {current_state}")
@@ -189,9 +268,7 @@ async def add_admin_callback(callback: CallbackQuery, state: FSMContext):
         "🔍 **نکته:** User ID باید یک عدد صحیح باشد\n"
         "📋 **مثال:** `123456789`\n\n"
         "💡 **راهنما:** برای یافتن User ID می‌توانید از ربات‌های مخصوص یا دستور /start در ربات‌ها استفاده کنید.",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["cancel"], callback_data="back_to_main")]
-        ])
+        reply_markup=_CANCEL_KB
     )
     
     # Set initial state for the add admin process
@@ -208,10 +285,6 @@ async def add_admin_callback(callback: CallbackQuery, state: FSMContext):
 @sudo_router.callback_query(F.data == "add_existing_admin")
 async def add_existing_admin_callback(callback: CallbackQuery, state: FSMContext):
     """Start adding existing admin process."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
     # Clear any existing state first
     current_state = await state.get_state()
     logger.info(f"User {callback.from_user.id} clearing previous state before add_existing_admin: {current_state}")
@@ -226,9 +299,7 @@ async def add_existing_admin_callback(callback: CallbackQuery, state: FSMContext
         "لطفاً User ID (آیدی تلگرام) ادمین را ارسال کنید:\n\n"
         "🔍 **نکته:** User ID باید یک عدد صحیح باشد\n"
         "📋 **مثال:** `123456789`",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["cancel"], callback_data="back_to_main")]
-        ])
+        reply_markup=_CANCEL_KB
     )
     
     # Set initial state for the add existing admin process
@@ -250,10 +321,7 @@ async def process_admin_user_id(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_admin_user_id' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "admin addition"):
         return
     
     try:
@@ -316,10 +384,7 @@ async def process_admin_name(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_admin_name' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "admin addition"):
         return
     
     try:
@@ -381,18 +446,14 @@ async def process_marzban_username(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_marzban_username' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "admin addition"):
         return
     
     try:
         marzban_username = message.text.strip()
         
         # Validate username format
-        import re
-        if not re.match(r'^[a-zA-Z0-9_-]{3,50}$', marzban_username):
+        if not _MARZBAN_USERNAME_RE.match(marzban_username):
             await message.answer(
                 "❌ **فرمت Username اشتباه است!**\n\n"
                 "⚠️ **شرایط Username:**\n"
@@ -454,10 +515,7 @@ async def process_marzban_password(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_marzban_password' activated for user {user_id}, current state: {current_state}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "admin addition"):
         return
     
     try:
@@ -480,12 +538,9 @@ async def process_marzban_password(message: Message, state: FSMContext):
             )
             return
         
-        # Basic password strength check
-        has_upper = any(c.isupper() for c in marzban_password)
-        has_lower = any(c.islower() for c in marzban_password)
-        has_digit = any(c.isdigit() for c in marzban_password)
-        
-        if not (has_upper or has_lower or has_digit):
+        # Basic password strength check; sending the same password again confirms it
+        if (not any(c.isupper() or c.islower() or c.isdigit() for c in marzban_password)
+                and not await _is_repeated_value(state, "marzban_password", marzban_password)):
             await message.answer(
                 "⚠️ **Password ضعیف است!**\n\n"
                 "برای امنیت بیشتر، Password باید شامل:\n"
@@ -537,10 +592,7 @@ async def process_traffic_volume(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_traffic_volume' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "admin addition"):
         return
     
     try:
@@ -555,7 +607,8 @@ async def process_traffic_volume(message: Message, state: FSMContext):
             )
             return
         
-        if traffic_gb > 10000:  # More than 10TB seems unrealistic
+        # More than 10TB seems unrealistic; sending the same value again confirms it
+        if traffic_gb > 10000 and not await _is_repeated_value(state, "traffic_gb", traffic_gb):
             await message.answer(
                 "⚠️ **حجم ترافیک خیلی زیاد است!**\n\n"
                 f"آیا واقعاً می‌خواهید {traffic_gb} گیگابایت تخصیص دهید؟\n\n"
@@ -614,10 +667,7 @@ async def process_max_users(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_max_users' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "admin addition"):
         return
     
     try:
@@ -632,7 +682,8 @@ async def process_max_users(message: Message, state: FSMContext):
             )
             return
         
-        if max_users > 10000:  # More than 10k users seems unrealistic for one admin
+        # More than 10k users seems unrealistic for one admin; sending the same value again confirms it
+        if max_users > 10000 and not await _is_repeated_value(state, "max_users", max_users):
             await message.answer(
                 "⚠️ **تعداد کاربر خیلی زیاد است!**\n\n"
                 f"آیا واقعاً می‌خواهید {max_users} کاربر تخصیص دهید؟\n\n"
@@ -688,10 +739,7 @@ async def process_validity_period(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_validity_period' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "admin addition"):
         return
     
     try:
@@ -706,7 +754,8 @@ async def process_validity_period(message: Message, state: FSMContext):
             )
             return
         
-        if validity_days > 3650:  # More than 10 years seems unrealistic
+        # More than 10 years seems unrealistic; sending the same value again confirms it
+        if validity_days > 3650 and not await _is_repeated_value(state, "validity_days", validity_days):
             await message.answer(
                 "⚠️ **مدت اعتبار خیلی طولانی است!**\n\n"
                 f"آیا واقعاً می‌خواهید {validity_days} روز ({validity_days//365} سال) تخصیص دهید؟\n\n"
@@ -717,13 +766,11 @@ async def process_validity_period(message: Message, state: FSMContext):
         # Convert days to seconds
         validity_seconds = days_to_seconds(validity_days)
         
-        # Save validity period to state data
-        await state.update_data(validity_days=validity_days, validity_seconds=validity_seconds)
+        # Save validity period to state data; update_data returns everything collected so far for the confirmation
+        data = await state.update_data(validity_days=validity_days, validity_seconds=validity_seconds)
         
         logger.info(f"User {user_id} entered validity period: {validity_days} days ({validity_seconds} seconds)")
         
-        # Get all collected data for confirmation
-        data = await state.get_data()
         admin_user_id = data.get("user_id")
         admin_name = data.get("admin_name")
         marzban_username = data.get("marzban_username")
@@ -744,15 +791,7 @@ async def process_validity_period(message: Message, state: FSMContext):
             "❌ برای **لغو** دکمه لغو را بزنید"
         )
         
-        # Create confirmation keyboard
-        confirmation_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✅ تایید و ایجاد", callback_data="confirm_create_admin"),
-                InlineKeyboardButton(text="❌ لغو", callback_data="back_to_main")
-            ]
-        ])
-        
-        await message.answer(confirmation_text, reply_markup=confirmation_keyboard)
+        await message.answer(confirmation_text, reply_markup=_CONFIRM_CREATE_ADMIN_KB)
         
         # Change state to waiting for confirmation
         await state.set_state(AddAdminStates.waiting_for_confirmation)
@@ -780,156 +819,158 @@ async def process_validity_period(message: Message, state: FSMContext):
 @sudo_router.callback_query(F.data == "confirm_create_admin")
 async def confirm_create_admin(callback: CallbackQuery, state: FSMContext):
     """Confirm and create the admin."""
-    user_id = callback.from_user.id
-    
-    # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
+    # Ignore repeated clicks while the same operation is still running
+    lock = get_lock(("create_admin", callback.from_user.id))
+    if lock.locked():
+        await callback.answer(_MSG_IN_PROGRESS, show_alert=True)
         return
     
-    # Verify state
-    current_state = await state.get_state()
-    if current_state != AddAdminStates.waiting_for_confirmation:
-        await callback.answer("جلسه منقضی شده", show_alert=True)
-        await state.clear()
-        return
+    async with lock:
+        user_id = callback.from_user.id
     
-    try:
-        # Get all collected data
-        data = await state.get_data()
-        admin_user_id = data.get("user_id")
-        admin_name = data.get("admin_name")
-        marzban_username = data.get("marzban_username")
-        marzban_password = data.get("marzban_password")
-        traffic_bytes = data.get("traffic_bytes")
-        max_users = data.get("max_users")
-        validity_seconds = data.get("validity_seconds")
-        validity_days = data.get("validity_days")
-        
-        # Validate required data
-        if not all([admin_user_id, admin_name, marzban_username, marzban_password, traffic_bytes, max_users, validity_seconds]):
-            logger.error(f"Missing required data in state for user {user_id}")
-            await callback.message.edit_text(
-                "❌ **خطا: اطلاعات ناقص**\n\n"
-                "اطلاعات جلسه ناقص است. لطفاً مجدداً شروع کنید.",
-                reply_markup=get_sudo_keyboard()
-            )
+        # Verify state
+        current_state = await state.get_state()
+        if current_state != AddAdminStates.waiting_for_confirmation:
+            await callback.answer("جلسه منقضی شده", show_alert=True)
             await state.clear()
-            await callback.answer()
             return
+    
+        try:
+            # Get all collected data
+            data = await state.get_data()
+            admin_user_id = data.get("user_id")
+            admin_name = data.get("admin_name")
+            marzban_username = data.get("marzban_username")
+            marzban_password = data.get("marzban_password")
+            traffic_bytes = data.get("traffic_bytes")
+            max_users = data.get("max_users")
+            validity_seconds = data.get("validity_seconds")
+            validity_days = data.get("validity_days")
+        
+            # Validate required data
+            if not all([admin_user_id, admin_name, marzban_username, marzban_password, traffic_bytes, max_users, validity_seconds]):
+                logger.error(f"Missing required data in state for user {user_id}")
+                await callback.message.edit_text(
+                    "❌ **خطا: اطلاعات ناقص**\n\n"
+                    "اطلاعات جلسه ناقص است. لطفاً مجدداً شروع کنید.",
+                    reply_markup=get_sudo_keyboard()
+                )
+                await state.clear()
+                await callback.answer()
+                return
         
-        # Update message to show progress
-        await callback.message.edit_text(
-            "⏳ **در حال ایجاد ادمین...**\n\n"
-            "لطفاً صبر کنید..."
-        )
-        
-        logger.info(f"Creating admin: {admin_user_id} with username: {marzban_username}")
-        
-        # Step 1: Create admin in Marzban panel
-        marzban_success = await marzban_api.create_admin(
-            username=marzban_username,
-            password=marzban_password,
-            telegram_id=admin_user_id
-        )
-        
-        if not marzban_success:
-            logger.error(f"Failed to create admin in Marzban: {marzban_username}")
+            # Update message to show progress
             await callback.message.edit_text(
-                "❌ **خطا در ایجاد ادمین در پنل مرزبان**\n\n"
-                "علت‌های احتمالی:\n"
-                "• Username تکراری است\n"
-                "• اتصال به مرزبان برقرار نیست\n"
-                "• تنظیمات API نادرست است\n"
-                "• مشکل در احراز هویت\n\n"
-                "⚠️ **هیچ تغییری در سیستم انجام نشد**\n"
-                "لطفاً مشکل را بررسی کرده و مجدداً تلاش کنید.",
-                reply_markup=get_sudo_keyboard()
+                "⏳ **در حال ایجاد ادمین...**\n\n"
+                "لطفاً صبر کنید..."
             )
-            await state.clear()
-            await callback.answer()
-            return
         
-        # Step 2: Create admin in local database
-        admin = AdminModel(
-            user_id=admin_user_id,
-            admin_name=admin_name,
-            marzban_username=marzban_username,
-            marzban_password=marzban_password,  # Store for management purposes
-            max_users=max_users,
-            max_total_time=validity_seconds,
-            max_total_traffic=traffic_bytes,
-            validity_days=validity_days
-        )
+            logger.info(f"Creating admin: {admin_user_id} with username: {marzban_username}")
         
-        admin_id = await db.add_admin(admin)
+            # Step 1: Create admin in Marzban panel
+            marzban_success = await marzban_api.create_admin(
+                username=marzban_username,
+                password=marzban_password,
+                telegram_id=admin_user_id
+            )
         
-        if admin_id == 0:
-            logger.error(f"Failed to add admin to database: {admin_user_id}")
-            # Try to remove from Marzban if database failed
-            try:
-                await marzban_api.delete_admin(marzban_username)
-                logger.info(f"Cleaned up admin {marzban_username} from Marzban after database failure")
-            except Exception as cleanup_error:
-                logger.error(f"Failed to cleanup admin {marzban_username} from Marzban: {cleanup_error}")
-            
-            await callback.message.edit_text(
-                "❌ **خطا در ذخیره اطلاعات در پایگاه داده**\n\n"
-                "ادمین در پنل مرزبان ایجاد شد اما در پایگاه داده ربات ذخیره نشد.\n\n"
-                "🔄 **اقدام انجام شده:** ادمین از مرزبان نیز حذف شد تا تناقض پیش نیاید.\n\n"
-                "⚠️ لطفاً مشکل پایگاه داده را بررسی و مجدداً تلاش کنید.",
-                reply_markup=get_sudo_keyboard()
+            if not marzban_success:
+                logger.error(f"Failed to create admin in Marzban: {marzban_username}")
+                await callback.message.edit_text(
+                    "❌ **خطا در ایجاد ادمین در پنل مرزبان**\n\n"
+                    "علت‌های احتمالی:\n"
+                    "• Username تکراری است\n"
+                    "• اتصال به مرزبان برقرار نیست\n"
+                    "• تنظیمات API نادرست است\n"
+                    "• مشکل در احراز هویت\n\n"
+                    "⚠️ **هیچ تغییری در سیستم انجام نشد**\n"
+                    "لطفاً مشکل را بررسی کرده و مجدداً تلاش کنید.",
+                    reply_markup=get_sudo_keyboard()
+                )
+                await state.clear()
+                await callback.answer()
+                return
+        
+            # Step 2: Create admin in local database
+            admin = AdminModel(
+                user_id=admin_user_id,
+                admin_name=admin_name,
+                marzban_username=marzban_username,
+                marzban_password=marzban_password,  # Store for management purposes
+                max_users=max_users,
+                max_total_time=validity_seconds,
+                max_total_traffic=traffic_bytes,
+                validity_days=validity_days
             )
-            await state.clear()
-            await callback.answer()
-            return
         
-        # Step 3: Send notifications
-        admin_info = {
-            "user_id": admin_user_id,
-            "admin_name": admin_name,
-            "marzban_username": marzban_username,
-            "max_users": max_users,
-            "max_total_time": validity_seconds,
-            "max_total_traffic": traffic_bytes,
-            "validity_days": validity_days
-        }
+            admin_id = await db.add_admin(admin)
         
-        await notify_admin_added(callback.bot, admin_user_id, admin_info, user_id)
+            if admin_id == 0:
+                logger.error(f"Failed to add admin to database: {admin_user_id}")
+                # Try to remove from Marzban if database failed
+                try:
+                    await marzban_api.delete_admin(marzban_username)
+                    logger.info(f"Cleaned up admin {marzban_username} from Marzban after database failure")
+                except Exception as cleanup_error:
+                    logger.error(f"Failed to cleanup admin {marzban_username} from Marzban: {cleanup_error}")
+            
+                await callback.message.edit_text(
+                    "❌ **خطا در ذخیره اطلاعات در پایگاه داده**\n\n"
+                    "ادمین در پنل مرزبان ایجاد شد اما در پایگاه داده ربات ذخیره نشد.\n\n"
+                    "🔄 **اقدام انجام شده:** ادمین از مرزبان نیز حذف شد تا تناقض پیش نیاید.\n\n"
+                    "⚠️ لطفاً مشکل پایگاه داده را بررسی و مجدداً تلاش کنید.",
+                    reply_markup=get_sudo_keyboard()
+                )
+                await state.clear()
+                await callback.answer()
+                return
+        
+            # Step 3: Send notifications in the background
+            admin_info = {
+                "user_id": admin_user_id,
+                "admin_name": admin_name,
+                "marzban_username": marzban_username,
+                "max_users": max_users,
+                "max_total_time": validity_seconds,
+                "max_total_traffic": traffic_bytes,
+                "validity_days": validity_days
+            }
         
-        # Step 4: Show success message
-        success_text = (
-            "✅ **ادمین با موفقیت ایجاد شد!**\n\n"
-            f"👤 **User ID:** {admin_user_id}\n"
-            f"📝 **نام ادمین:** {admin_name}\n"
-            f"🔐 **Username مرزبان:** {marzban_username}\n"
-            f"👥 **حداکثر کاربر:** {max_users}\n"
-            f"📊 **حجم ترافیک:** {await format_traffic_size(traffic_bytes)}\n"
-            f"📅 **مدت اعتبار:** {validity_days} روز\n\n"
-            "🎉 **مراحل انجام شده:**\n"
-            "✅ ایجاد در پنل مرزبان\n"
-            "✅ ذخیره در پایگاه داده\n"
-            "✅ ارسال اطلاع‌رسانی\n\n"
-            "🔔 ادمین جدید می‌تواند از ربات استفاده کند."
-        )
+            spawn(notify_admin_added(callback.bot, admin_user_id, admin_info, user_id))
+        
+            # Step 4: Show success message
+            success_text = (
+                "✅ **ادمین با موفقیت ایجاد شد!**\n\n"
+                f"👤 **User ID:** {admin_user_id}\n"
+                f"📝 **نام ادمین:** {admin_name}\n"
+                f"🔐 **Username مرزبان:** {marzban_username}\n"
+                f"👥 **حداکثر کاربر:** {max_users}\n"
+                f"📊 **حجم ترافیک:** {format_traffic_size(traffic_bytes)}\n"
+                f"📅 **مدت اعتبار:** {validity_days} روز\n\n"
+                "🎉 **مراحل انجام شده:**\n"
+                "✅ ایجاد در پنل مرزبان\n"
+                "✅ ذخیره در پایگاه داده\n"
+                "✅ ارسال اطلاع‌رسانی\n\n"
+                "🔔 ادمین جدید می‌تواند از ربات استفاده کند."
+            )
         
-        await callback.message.edit_text(success_text, reply_markup=get_sudo_keyboard())
+            await callback.message.edit_text(success_text, reply_markup=get_sudo_keyboard())
         
-        logger.info(f"Admin {admin_user_id} successfully created by {user_id}")
+            logger.info(f"Admin {admin_user_id} successfully created by {user_id}")
         
-        await state.clear()
-        await callback.answer("ادمین با موفقیت ایجاد شد! ✅")
+            await state.clear()
+            await callback.answer("ادمین با موفقیت ایجاد شد! ✅")
         
-    except Exception as e:
-        logger.error(f"Error creating admin for {user_id}: {e}")
-        await callback.message.edit_text(
-            f"❌ **خطا در ایجاد ادمین**\n\n"
-            f"خطا: {str(e)}\n\n"
-            "لطفاً مجدداً تلاش کنید.",
-            reply_markup=get_sudo_keyboard()
-        )
-        await state.clear()
-        await callback.answer()
+        except Exception as e:
+            logger.error(f"Error creating admin for {user_id}: {e}")
+            await callback.message.edit_text(
+                f"❌ **خطا در ایجاد ادمین**\n\n"
+                f"خطا: {str(e)}\n\n"
+                "لطفاً مجدداً تلاش کنید.",
+                reply_markup=get_sudo_keyboard()
+            )
+            await state.clear()
+            await callback.answer()
 
 
 @sudo_router.message(AddAdminStates.waiting_for_confirmation, F.text)
@@ -947,6 +988,18 @@ async def handle_text_in_confirmation_state(message: Message, state: FSMContext)
     )
 
 
+# What each add-admin step is waiting for, shown when a non-text message arrives
+_STATE_LABELS = {
+    "AddAdminStates:waiting_for_user_id": "User ID",
+    "AddAdminStates:waiting_for_admin_name": "نام ادمین",
+    "AddAdminStates:waiting_for_marzban_username": "Username مرزبان",
+    "AddAdminStates:waiting_for_marzban_password": "Password مرزبان",
+    "AddAdminStates:waiting_for_traffic_volume": "حجم ترافیک",
+    "AddAdminStates:waiting_for_max_users": "تعداد کاربر مجاز",
+    "AddAdminStates:waiting_for_validity_period": "مدت اعتبار"
+}
+
+
 # Add help handlers for when users send unrelated commands during FSM flow
 @sudo_router.message(AddAdminStates.waiting_for_user_id, ~F.text)
 @sudo_router.message(AddAdminStates.waiting_for_admin_name, ~F.text)  
@@ -960,17 +1013,7 @@ async def handle_non_text_in_fsm(message: Message, state: FSMContext):
     current_state = await state.get_state()
     logger.info(f"User {message.from_user.id} sent non-text message in state {current_state}")
     
-    state_names = {
-        "AddAdminStates:waiting_for_user_id": "User ID",
-        "AddAdminStates:waiting_for_admin_name": "نام ادمین",
-        "AddAdminStates:waiting_for_marzban_username": "Username مرزبان",
-        "AddAdminStates:waiting_for_marzban_password": "Password مرزبان",
-        "AddAdminStates:waiting_for_traffic_volume": "حجم ترافیک",
-        "AddAdminStates:waiting_for_max_users": "تعداد کاربر مجاز",
-        "AddAdminStates:waiting_for_validity_period": "مدت اعتبار"
-    }
-    
-    current_step = state_names.get(current_state, "اطلاعات")
+    current_step = _STATE_LABELS.get(current_state, "اطلاعات")
     
     await message.answer(
         f"📝 **در انتظار: {current_step}**\n\n"
@@ -1006,10 +1049,6 @@ async def handle_commands_in_fsm(message: Message, state: FSMContext):
 @sudo_router.callback_query(F.data == "remove_admin")
 async def remove_admin_callback(callback: CallbackQuery):
     """Show panel list for complete deletion."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
     # Get only active admins for deletion
     all_admins = await db.get_all_admins()
     active_admins = [admin for admin in all_admins if admin.is_active]
@@ -1017,9 +1056,7 @@ async def remove_admin_callback(callback: CallbackQuery):
     if not active_admins:
         await callback.message.edit_text(
             "❌ هیچ پنل فعالی برای حذف یافت نشد.",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
-            ])
+            reply_markup=_BACK_KB
         )
         await callback.answer()
         return
@@ -1031,58 +1068,56 @@ async def remove_admin_callback(callback: CallbackQuery):
     await callback.answer()
 
 
-@sudo_router.callback_query(F.data.startswith("confirm_deactivate_"))
-async def confirm_deactivate_panel(callback: CallbackQuery):
+@sudo_router.callback_query(F.data.regexp(r"^confirm_deactivate_(\d+)$").as_("id_match"))
+async def confirm_deactivate_panel(callback: CallbackQuery, id_match: re.Match):
     """Confirm panel deactivation."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
+    admin_id = int(id_match.group(1))
+    
+    # Ignore repeated clicks while the same operation is still running
+    lock = get_lock(("deactivate_panel", admin_id))
+    if lock.locked():
+        await callback.answer(_MSG_IN_PROGRESS, show_alert=True)
         return
     
-    admin_id = int(callback.data.split("_")[-1])
-    admin = await db.get_admin_by_id(admin_id)
+    async with lock:
+        admin = await db.get_admin_by_id(admin_id)
     
-    if not admin:
-        await callback.answer("پنل یافت نشد", show_alert=True)
-        return
+        if not admin:
+            await callback.answer("پنل یافت نشد", show_alert=True)
+            return
     
-    # Completely delete the panel and all users for manual deactivation
-    success = await delete_admin_panel_completely(admin_id, "غیرفعالسازی دستی توسط سودو")
+        # Completely delete the panel and all users for manual deactivation
+        success = await delete_admin_panel_completely(admin_id, "غیرفعالسازی دستی توسط سودو", admin=admin)
     
-    if success:
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel-{admin.id}"
-        await callback.message.edit_text(
-            f"✅ پنل {panel_name} با موفقیت حذف شد.\n\n"
-            f"👤 کاربر: {admin.username or admin.user_id}\n"
-            f"🏷️ نام پنل: {panel_name}\n"
-            f"🔐 نام کاربری مرزبان: {admin.marzban_username}\n\n"
-            "🗑️ پنل و تمام کاربران آن به طور کامل حذف شدند.",
-            reply_markup=get_sudo_keyboard()
-        )
-    else:
-        await callback.message.edit_text(
-            "❌ خطا در حذف پنل.",
-            reply_markup=get_sudo_keyboard()
-        )
+        if success:
+            panel_name = admin.admin_name or admin.marzban_username or f"Panel-{admin.id}"
+            await callback.message.edit_text(
+                f"✅ پنل {panel_name} با موفقیت حذف شد.\n\n"
+                f"👤 کاربر: {admin.username or admin.user_id}\n"
+                f"🏷️ نام پنل: {panel_name}\n"
+                f"🔐 نام کاربری مرزبان: {admin.marzban_username}\n\n"
+                "🗑️ پنل و تمام کاربران آن به طور کامل حذف شدند.",
+                reply_markup=get_sudo_keyboard()
+            )
+        else:
+            await callback.message.edit_text(
+                "❌ خطا در حذف پنل.",
+                reply_markup=get_sudo_keyboard()
+            )
     
-    await callback.answer()
+        await callback.answer()
 
 
 @sudo_router.callback_query(F.data == "edit_panel")
 async def edit_panel_callback(callback: CallbackQuery):
     """Show panel list for editing."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
     # Get all admins for editing
     admins = await db.get_all_admins()
     
     if not admins:
         await callback.message.edit_text(
             "❌ هیچ پنلی برای ویرایش یافت نشد.",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
-            ])
+            reply_markup=_BACK_KB
         )
         await callback.answer()
         return
@@ -1094,33 +1129,35 @@ async def edit_panel_callback(callback: CallbackQuery):
     await callback.answer()
 
 
-@sudo_router.callback_query(F.data.startswith("start_edit_"))
-async def start_edit_panel(callback: CallbackQuery, state: FSMContext):
+@sudo_router.callback_query(F.data.regexp(r"^start_edit_(\d+)$").as_("id_match"))
+async def start_edit_panel(callback: CallbackQuery, id_match: re.Match, state: FSMContext):
     """Start editing a specific panel."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
-    admin_id = int(callback.data.split("_")[-1])
+    admin_id = int(id_match.group(1))
     admin = await db.get_admin_by_id(admin_id)
     
     if not admin:
         await callback.answer("پنل یافت نشد", show_alert=True)
         return
     
-    # Store admin_id in state
-    await state.update_data(admin_id=admin_id)
-    
-    # Show current limits and ask for new traffic
-    from utils.notify import bytes_to_gb, seconds_to_days
+    # Derive the display values once and keep them in state for the later steps
     current_traffic = bytes_to_gb(admin.max_total_traffic)
     current_time = seconds_to_days(admin.max_total_time)
-    
     panel_name = admin.admin_name or admin.marzban_username or f"Panel-{admin.id}"
+    admin_label = admin.username or admin.user_id
+    
+    await state.update_data(
+        admin_id=admin_id,
+        admin_user_id=admin.user_id,
+        panel_name=panel_name,
+        admin_label=admin_label,
+        marzban_username=admin.marzban_username,
+        current_traffic=current_traffic,
+        current_time=current_time
+    )
     
     await callback.message.edit_text(
         f"✏️ **ویرایش پنل {panel_name}**\n\n"
-        f"👤 کاربر: {admin.username or admin.user_id}\n"
+        f"👤 کاربر: {admin_label}\n"
         f"🔐 نام کاربری مرزبان: {admin.marzban_username}\n\n"
         f"📊 **محدودیت‌های فعلی:**\n"
         f"📡 ترافیک: {current_traffic} گیگابایت\n"
@@ -1129,9 +1166,7 @@ async def start_edit_panel(callback: CallbackQuery, state: FSMContext):
         "لطفاً مقدار ترافیک جدید را به گیگابایت وارد کنید:\n\n"
         "📋 **مثال:** `500` برای ۵۰۰ گیگابایت\n"
         "💡 **نکته:** عدد صحیح وارد کنید",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["cancel"], callback_data="back_to_main")]
-        ])
+        reply_markup=_CANCEL_KB
     )
     
     await state.set_state(EditPanelStates.waiting_for_traffic_volume)
@@ -1146,10 +1181,7 @@ async def process_edit_traffic(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_edit_traffic' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted panel editing")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "panel editing"):
         return
     
     try:
@@ -1169,16 +1201,9 @@ async def process_edit_traffic(message: Message, state: FSMContext):
             )
             return
         
-        # Save traffic to state
-        await state.update_data(traffic_gb=traffic_gb)
-        
-        # Get admin info for display
-        data = await state.get_data()
-        admin_id = data.get('admin_id')
-        admin = await db.get_admin_by_id(admin_id)
-        
-        from utils.notify import seconds_to_days
-        current_time = seconds_to_days(admin.max_total_time)
+        # Save traffic to state; current limits were stored when editing started and come back with the update
+        data = await state.update_data(traffic_gb=traffic_gb)
+        current_time = data.get('current_time')
         
         await message.answer(
             f"✅ **ترافیک جدید:** {traffic_gb} گیگابایت\n\n"
@@ -1214,10 +1239,7 @@ async def process_edit_time(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_edit_time' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted panel editing")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "panel editing"):
         return
     
     try:
@@ -1237,41 +1259,25 @@ async def process_edit_time(message: Message, state: FSMContext):
             )
             return
         
-        # Save time to state
-        await state.update_data(validity_days=validity_days)
-        
-        # Get all data for confirmation
-        data = await state.get_data()
-        admin_id = data.get('admin_id')
+        # Save time to state and get all data for confirmation
+        data = await state.update_data(validity_days=validity_days)
         traffic_gb = data.get('traffic_gb')
-        admin = await db.get_admin_by_id(admin_id)
-        
-        from utils.notify import bytes_to_gb, seconds_to_days
-        old_traffic = bytes_to_gb(admin.max_total_traffic)
-        old_time = seconds_to_days(admin.max_total_time)
-        
-        panel_name = admin.admin_name or admin.marzban_username or f"Panel-{admin.id}"
+        old_traffic = data.get('current_traffic')
+        old_time = data.get('current_time')
         
         # Show confirmation
         confirmation_text = (
             f"📋 **تأیید نهایی ویرایش پنل**\n\n"
-            f"🏷️ **پنل:** {panel_name}\n"
-            f"👤 **کاربر:** {admin.username or admin.user_id}\n"
-            f"🔐 **نام کاربری مرزبان:** {admin.marzban_username}\n\n"
+            f"🏷️ **پنل:** {data.get('panel_name')}\n"
+            f"👤 **کاربر:** {data.get('admin_label')}\n"
+            f"🔐 **نام کاربری مرزبان:** {data.get('marzban_username')}\n\n"
             f"📊 **تغییرات:**\n"
             f"📡 ترافیک: {old_traffic} GB ← {traffic_gb} GB\n"
             f"⏰ مدت زمان: {old_time} روز ← {validity_days} روز\n\n"
             "❓ آیا از انجام این تغییرات اطمینان دارید؟"
         )
         
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✅ تأیید", callback_data="confirm_edit_panel"),
-                InlineKeyboardButton(text="❌ لغو", callback_data="back_to_main")
-            ]
-        ])
-        
-        await message.answer(confirmation_text, reply_markup=keyboard)
+        await message.answer(confirmation_text, reply_markup=_CONFIRM_EDIT_PANEL_KB)
         await state.set_state(EditPanelStates.waiting_for_confirmation)
         
     except ValueError:
@@ -1292,11 +1298,6 @@ async def process_edit_time(message: Message, state: FSMContext):
 @sudo_router.callback_query(F.data == "confirm_edit_panel")
 async def confirm_edit_panel(callback: CallbackQuery, state: FSMContext):
     """Confirm panel editing."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        await state.clear()
-        return
-    
     try:
         # Get data from state
         data = await state.get_data()
@@ -1310,40 +1311,33 @@ async def confirm_edit_panel(callback: CallbackQuery, state: FSMContext):
             return
         
         # Convert to database format
-        from utils.notify import gb_to_bytes, days_to_seconds
         max_total_traffic = gb_to_bytes(traffic_gb)
         max_total_time = days_to_seconds(validity_days)
         
-        # Update in database
-        success = await db.update_admin(
-            admin_id, 
+        # Update the limits and log the change in one transaction
+        log = LogModel(
+            admin_user_id=data.get('admin_user_id'),
+            action="panel_limits_edited",
+            details=f"Panel {admin_id} limits updated: Traffic={traffic_gb}GB, Time={validity_days}days"
+        )
+        success = await db.update_admin_with_log(
+            admin_id,
+            log,
             max_total_traffic=max_total_traffic,
             max_total_time=max_total_time
         )
         
         if success:
-            admin = await db.get_admin_by_id(admin_id)
-            panel_name = admin.admin_name or admin.marzban_username or f"Panel-{admin.id}"
-            
             await callback.message.edit_text(
-                f"✅ پنل {panel_name} با موفقیت ویرایش شد!\n\n"
+                f"✅ پنل {data.get('panel_name')} با موفقیت ویرایش شد!\n\n"
                 f"📊 **محدودیت‌های جدید:**\n"
                 f"📡 ترافیک: {traffic_gb} گیگابایت\n"
                 f"⏰ مدت زمان: {validity_days} روز\n\n"
-                f"👤 کاربر: {admin.username or admin.user_id}\n"
-                f"🔐 نام کاربری مرزبان: {admin.marzban_username}",
+                f"👤 کاربر: {data.get('admin_label')}\n"
+                f"🔐 نام کاربری مرزبان: {data.get('marzban_username')}",
                 reply_markup=get_sudo_keyboard()
             )
             
-            # Log the change
-            from models.schemas import LogModel
-            log = LogModel(
-                admin_user_id=admin.user_id,
-                action="panel_limits_edited",
-                details=f"Panel {admin_id} limits updated: Traffic={traffic_gb}GB, Time={validity_days}days"
-            )
-            await db.add_log(log)
-            
         else:
             await callback.message.edit_text(
                 "❌ خطا در ویرایش پنل.",
@@ -1370,39 +1364,38 @@ async def get_admin_list_text() -> str:
     if not admins:
         return "❌ هیچ ادمینی یافت نشد."
     
-    text = "📋 لیست همه ادمین‌ها:\n\n"
+    parts = ["📋 لیست همه ادمین‌ها:\n\n"]
     
     # Group admins by user_id to show multiple panels per user
     user_panels = {}
     for admin in admins:
-        if admin.user_id not in user_panels:
-            user_panels[admin.user_id] = []
-        user_panels[admin.user_id].append(admin)
+        user_panels.setdefault(admin.user_id, []).append(admin)
     
-    counter = 1
-    for user_id, user_admins in user_panels.items():
-        text += f"{counter}. 👨‍💼 کاربر ID: {user_id}\n"
+    for counter, (user_id, user_admins) in enumerate(user_panels.items(), 1):
+        parts.append(f"{counter}. 👨‍💼 کاربر ID: {user_id}\n")
         
         for i, admin in enumerate(user_admins, 1):
             status = "✅ فعال" if admin.is_active else "❌ غیرفعال"
             panel_name = admin.admin_name or f"پنل {i}"
+            created_at = admin.created_at.strftime('%Y-%m-%d %H:%M') if admin.created_at else 'نامشخص'
             
-            text += f"   🔹 {panel_name} {status}\n"
-            text += f"      🆔 پنل ID: {admin.id}\n"
-            text += f"      👤 نام کاربری مرزبان: {admin.marzban_username or 'نامشخص'}\n"
-            text += f"      🏷️ نام تلگرام: {admin.username or 'نامشخص'}\n"
-            text += f"      👥 حداکثر کاربر: {admin.max_users}\n"
-            text += f"      📅 تاریخ ایجاد: {admin.created_at.strftime('%Y-%m-%d %H:%M') if admin.created_at else 'نامشخص'}\n"
+            parts.append(
+                f"   🔹 {panel_name} {status}\n"
+                f"      🆔 پنل ID: {admin.id}\n"
+                f"      👤 نام کاربری مرزبان: {admin.marzban_username or 'نامشخص'}\n"
+                f"      🏷️ نام تلگرام: {admin.username or 'نامشخص'}\n"
+                f"      👥 حداکثر کاربر: {admin.max_users}\n"
+                f"      📅 تاریخ ایجاد: {created_at}\n"
+            )
             
             if not admin.is_active and admin.deactivated_reason:
-                text += f"      ❌ دلیل غیرفعالی: {admin.deactivated_reason}\n"
+                parts.append(f"      ❌ دلیل غیرفعالی: {admin.deactivated_reason}\n")
             
-            text += "\n"
+            parts.append("\n")
         
-        counter += 1
-        text += "\n"
+        parts.append("\n")
     
-    return text
+    return "".join(parts)
 
 
 async def get_admin_status_text() -> str:
@@ -1412,75 +1405,84 @@ async def get_admin_status_text() -> str:
     if not admins:
         return "❌ هیچ ادمینی یافت نشد."
     
-    text = "📊 وضعیت تفصیلی ادمین‌ها:\n\n"
+    parts = ["📊 وضعیت تفصیلی ادمین‌ها:\n\n"]
     
     # Group admins by user_id to show multiple panels per user
     user_panels = {}
     for admin in admins:
-        if admin.user_id not in user_panels:
-            user_panels[admin.user_id] = []
-        user_panels[admin.user_id].append(admin)
+        user_panels.setdefault(admin.user_id, []).append(admin)
+    
+    # Fetch stats for all active panels up front, concurrently, instead of one Marzban round trip per row
+    semaphore = asyncio.Semaphore(config.API_BATCH_CONCURRENCY)
+    
+    async def fetch_stats(admin: AdminModel) -> AdminStatsModel:
+        async with semaphore:
+            admin_api = await marzban_api.create_admin_api(admin.marzban_username, admin.marzban_password)
+            return await admin_api.get_admin_stats()
+    
+    stats_admins = [a for a in admins if a.is_active and a.marzban_username and a.marzban_password]
+    results = await asyncio.gather(*(fetch_stats(a) for a in stats_admins), return_exceptions=True)
+    stats_by_id = {a.id: result for a, result in zip(stats_admins, results)}
     
     for user_id, user_admins in user_panels.items():
-        text += f"👨‍💼 کاربر ID: {user_id}\n"
+        parts.append(f"👨‍💼 کاربر ID: {user_id}\n")
         
         for i, admin in enumerate(user_admins, 1):
             status = "✅ فعال" if admin.is_active else "❌ غیرفعال"
             panel_name = admin.admin_name or f"پنل {i}"
             
-            text += f"   🔹 {panel_name} ({admin.marzban_username}) {status}\n"
+            parts.append(f"   🔹 {panel_name} ({admin.marzban_username}) {status}\n")
             
-            # Get admin stats using their own credentials
+            # Render the prefetched stats for this panel
             try:
-                if admin.is_active and admin.marzban_username and admin.marzban_password:
-                    admin_api = await marzban_api.create_admin_api(admin.marzban_username, admin.marzban_password)
-                    admin_stats = await admin_api.get_admin_stats()
+                if admin.id in stats_by_id:
+                    admin_stats = stats_by_id[admin.id]
+                    if isinstance(admin_stats, Exception):
+                        raise admin_stats
                     
                     # Calculate usage percentages
                     user_percentage = (admin_stats.total_users / admin.max_users * 100) if admin.max_users > 0 else 0
                     traffic_percentage = (admin_stats.total_traffic_used / admin.max_total_traffic * 100) if admin.max_total_traffic > 0 else 0
                     time_percentage = (admin_stats.total_time_used / admin.max_total_time * 100) if admin.max_total_time > 0 else 0
                     
-                    text += f"      👥 کاربران: {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n"
-                    text += f"      📊 ترافیک: {await format_traffic_size(admin_stats.total_traffic_used)}/{await format_traffic_size(admin.max_total_traffic)} ({traffic_percentage:.1f}%)\n"
-                    text += f"      ⏱️ زمان: {await format_time_duration(admin_stats.total_time_used)}/{await format_time_duration(admin.max_total_time)} ({time_percentage:.1f}%)\n"
+                    traffic_used = format_traffic_size(admin_stats.total_traffic_used)
+                    traffic_limit = format_traffic_size(admin.max_total_traffic)
+                    time_used = format_time_duration(admin_stats.total_time_used)
+                    time_limit = format_time_duration(admin.max_total_time)
+                    parts.append(
+                        f"      👥 کاربران: {admin_stats.total_users}/{admin.max_users} ({user_percentage:.1f}%)\n"
+                        f"      📊 ترافیک: {traffic_used}/{traffic_limit} ({traffic_percentage:.1f}%)\n"
+                        f"      ⏱️ زمان: {time_used}/{time_limit} ({time_percentage:.1f}%)\n"
+                    )
                     
                     # Show warning if approaching limits
                     if any(p >= 80 for p in [user_percentage, traffic_percentage, time_percentage]):
-                        text += f"      ⚠️ نزدیک به محدودیت!\n"
+                        parts.append(f"      ⚠️ نزدیک به محدودیت!\n")
                         
                 elif not admin.is_active:
-                    text += f"      ❌ غیرفعال"
-                    if admin.deactivated_reason:
-                        text += f" - {admin.deactivated_reason}"
-                    text += "\n"
+                    reason = f" - {admin.deactivated_reason}" if admin.deactivated_reason else ""
+                    parts.append(f"      ❌ غیرفعال{reason}\n")
                 else:
-                    text += f"      ❌ اطلاعات احراز هویت ناکامل\n"
+                    parts.append(f"      ❌ اطلاعات احراز هویت ناکامل\n")
                     
             except Exception as e:
-                text += f"      ❌ خطا در دریافت آمار: {str(e)[:50]}...\n"
+                parts.append(f"      ❌ خطا در دریافت آمار: {str(e)[:50]}...\n")
             
-            text += "\n"
+            parts.append("\n")
         
-        text += "\n"
+        parts.append("\n")
     
-    return text
+    return "".join(parts)
 
 
 @sudo_router.callback_query(F.data == "list_admins")
 async def list_admins_callback(callback: CallbackQuery):
     """Show list of all admins."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
     text = await get_admin_list_text()
     
     await callback.message.edit_text(
         text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
-        ])
+        reply_markup=_BACK_KB
     )
     await callback.answer()
 
@@ -1488,17 +1490,11 @@ async def list_admins_callback(callback: CallbackQuery):
 @sudo_router.callback_query(F.data == "admin_status")
 async def admin_status_callback(callback: CallbackQuery):
     """Show detailed status of all admins."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
     text = await get_admin_status_text()
     
     await callback.message.edit_text(
         text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
-        ])
+        reply_markup=_BACK_KB
     )
     await callback.answer()
 
@@ -1507,7 +1503,7 @@ async def admin_status_callback(callback: CallbackQuery):
 async def add_admin_command(message: Message, state: FSMContext):
     """Handle /add_admin text command."""
     if message.from_user.id not in config.SUDO_ADMINS:
-        await message.answer(config.MESSAGES["unauthorized"])
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     # Clear any existing state first
@@ -1522,9 +1518,7 @@ async def add_admin_command(message: Message, state: FSMContext):
         "🔍 **نکته:** User ID باید یک عدد صحیح باشد\n"
         "📋 **مثال:** `123456789`\n\n"
         "💡 **راهنما:** برای یافتن User ID می‌توانید از ربات‌های مخصوص یا دستور /start در ربات‌ها استفاده کنید.",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=config.BUTTONS["cancel"], callback_data="back_to_main")]
-        ])
+        reply_markup=_CANCEL_KB
     )
     
     await state.set_state(AddAdminStates.waiting_for_user_id)
@@ -1538,7 +1532,7 @@ async def add_admin_command(message: Message, state: FSMContext):
 async def show_admins_command(message: Message):
     """Handle /show_admins or /list_admins text command."""
     if message.from_user.id not in config.SUDO_ADMINS:
-        await message.answer(config.MESSAGES["unauthorized"])
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     text = await get_admin_list_text()
@@ -1549,7 +1543,7 @@ async def show_admins_command(message: Message):
 async def remove_admin_command(message: Message):
     """Handle /remove_admin text command."""
     if message.from_user.id not in config.SUDO_ADMINS:
-        await message.answer(config.MESSAGES["unauthorized"])
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     # Get only active admins for deactivation
@@ -1573,7 +1567,7 @@ async def remove_admin_command(message: Message):
 async def edit_panel_command(message: Message):
     """Handle /edit_panel text command."""
     if message.from_user.id not in config.SUDO_ADMINS:
-        await message.answer(config.MESSAGES["unauthorized"])
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     # Get all admins for editing
@@ -1596,7 +1590,7 @@ async def edit_panel_command(message: Message):
 async def admin_status_command(message: Message):
     """Handle /admin_status text command."""
     if message.from_user.id not in config.SUDO_ADMINS:
-        await message.answer(config.MESSAGES["unauthorized"])
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     text = await get_admin_status_text()
@@ -1606,17 +1600,11 @@ async def admin_status_command(message: Message):
 @sudo_router.callback_query(F.data == "activate_admin")
 async def activate_admin_callback(callback: CallbackQuery):
     """Show deactivated admin list for reactivation."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
-    
     deactivated_admins = await db.get_deactivated_admins()
     if not deactivated_admins:
         await callback.message.edit_text(
             config.MESSAGES["no_deactivated_admins"],
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
-            ])
+            reply_markup=_BACK_KB
         )
         await callback.answer()
         return
@@ -1628,104 +1616,108 @@ async def activate_admin_callback(callback: CallbackQuery):
     await callback.answer()
 
 
-@sudo_router.callback_query(F.data.startswith("confirm_activate_"))
-async def confirm_activate_admin(callback: CallbackQuery):
+@sudo_router.callback_query(F.data.regexp(r"^confirm_activate_(\d+)$").as_("id_match"))
+async def confirm_activate_admin(callback: CallbackQuery, id_match: re.Match):
     """Confirm admin reactivation with support for multiple panels per user."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
-        return
+    user_id = int(id_match.group(1))
     
-    user_id = int(callback.data.split("_")[-1])
+    # Ignore repeated clicks while the same operation is still running
+    lock = get_lock(("activate_admin", user_id))
+    if lock.locked():
+        await callback.answer(_MSG_IN_PROGRESS, show_alert=True)
+        return
     
-    # Get all deactivated admins for this user
-    deactivated_admins = await db.get_deactivated_admins()
-    user_deactivated_admins = [admin for admin in deactivated_admins if admin.user_id == user_id]
+    async with lock:
+        # Get the deactivated admins of this user only
+        user_deactivated_admins = await db.get_deactivated_admins_for_user(user_id)
     
-    if not user_deactivated_admins:
-        await callback.answer("هیچ پنل غیرفعال برای این کاربر یافت نشد", show_alert=True)
-        return
+        if not user_deactivated_admins:
+            await callback.answer("هیچ پنل غیرفعال برای این کاربر یافت نشد", show_alert=True)
+            return
     
-    successful_reactivations = 0
-    failed_reactivations = 0
-    reactivation_details = []
+        successful_reactivations = 0
+        failed_reactivations = 0
+        reactivation_details = []
+        progress = ProgressMessage(
+            callback.message,
+            "⏳ در حال فعالسازی پنل‌ها... ({done}/{total})",
+            len(user_deactivated_admins)
+        )
     
-    # Process each deactivated admin panel for this user
-    for admin in user_deactivated_admins:
-        try:
-            # Reactivate admin panel in database
-            db_success = await db.reactivate_admin(admin.id)
+        # Process each deactivated admin panel for this user
+        for done, admin in enumerate(user_deactivated_admins):
+            await progress.update(done)
+            try:
+                # Reactivate admin panel in database
+                db_success = await db.reactivate_admin(admin.id)
             
-            if db_success:
-                # Restore original password in Marzban and update database
-                password_restored = await restore_admin_password_and_update_db(admin.id, admin.original_password)
+                if db_success:
+                    # Restore original password in Marzban and update database
+                    password_restored = await restore_admin_password_and_update_db(admin.id, admin.original_password)
                 
-                # Reactivate users belonging to this admin panel
-                users_reactivated = await reactivate_admin_panel_users(admin.id)
+                    # Reactivate users belonging to this admin panel
+                    users_reactivated = await reactivate_admin_panel_users(admin.id)
                 
-                successful_reactivations += 1
-                panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-                reactivation_details.append(f"✅ {panel_name}: پنل فعال شد، {'پسورد بازیابی شد' if password_restored else 'خطا در بازیابی پسورد'}, {users_reactivated} کاربر فعال شد")
+                    successful_reactivations += 1
+                    panel_name = admin.panel_name
+                    reactivation_details.append(f"✅ {panel_name}: پنل فعال شد، {'پسورد بازیابی شد' if password_restored else 'خطا در بازیابی پسورد'}, {users_reactivated} کاربر فعال شد")
                 
-                # Log the action for this specific panel
-                log = LogModel(
-                    admin_user_id=user_id,
-                    action="admin_panel_reactivated",
-                    details=f"Panel {admin.id} ({admin.marzban_username}) reactivated by sudo admin {callback.from_user.id}. Password restored: {password_restored}, Users reactivated: {users_reactivated}"
-                )
-                await db.add_log(log)
+                    # Log the action for this specific panel
+                    log = LogModel(
+                        admin_user_id=user_id,
+                        action="admin_panel_reactivated",
+                        details=f"Panel {admin.id} ({admin.marzban_username}) reactivated by sudo admin {callback.from_user.id}. Password restored: {password_restored}, Users reactivated: {users_reactivated}"
+                    )
+                    db.queue_log(log)
                 
-            else:
-                failed_reactivations += 1
-                panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-                reactivation_details.append(f"❌ {panel_name}: خطا در فعالسازی پنل")
+                else:
+                    failed_reactivations += 1
+                    panel_name = admin.panel_name
+                    reactivation_details.append(f"❌ {panel_name}: خطا در فعالسازی پنل")
                 
-        except Exception as e:
-            failed_reactivations += 1
-            panel_name = admin.admin_name or admin.marzban_username or f"Panel {admin.id}"
-            reactivation_details.append(f"❌ {panel_name}: خطا - {str(e)}")
-            logger.error(f"Error reactivating admin panel {admin.id}: {e}")
-    
-    # Create result message
-    if successful_reactivations > 0:
-        # Notify admin about reactivation
-        try:
-            await notify_admin_reactivation(callback.bot, user_id, callback.from_user.id)
-        except Exception as e:
-            logger.error(f"Error sending reactivation notification: {e}")
-        
-        result_text = f"🎉 **نتیجه فعالسازی مجدد**\n\n"
-        result_text += f"👤 **کاربر:** {user_id}\n"
-        result_text += f"✅ **موفق:** {successful_reactivations} پنل\n"
-        result_text += f"❌ **ناموفق:** {failed_reactivations} پنل\n\n"
-        result_text += "📋 **جزئیات:**\n"
-        result_text += "\n".join(reactivation_details)
+            except Exception as e:
+                failed_reactivations += 1
+                panel_name = admin.panel_name
+                reactivation_details.append(f"❌ {panel_name}: خطا - {str(e)}")
+                logger.error(f"Error reactivating admin panel {admin.id}: {e}")
+    
+        # Create result message
+        if successful_reactivations > 0:
+            # Notify admin about reactivation in the background
+            spawn(notify_admin_reactivation(callback.bot, user_id, callback.from_user.id))
         
-        if failed_reactivations == 0:
-            result_text += "\n\n🎊 همه پنل‌ها با موفقیت فعال شدند!"
+            if failed_reactivations == 0:
+                footer = "🎊 همه پنل‌ها با موفقیت فعال شدند!"
+            else:
+                footer = f"⚠️ {failed_reactivations} پنل فعال نشد. لطفاً بررسی کنید."
+            result_text = _REACTIVATION_RESULT_TMPL.format_map({
+                "user_id": user_id,
+                "successful": successful_reactivations,
+                "failed": failed_reactivations,
+                "details": "\n".join(reactivation_details),
+                "footer": footer,
+            })
+        
+            logger.info(f"Admin user {user_id} reactivation completed by sudo admin {callback.from_user.id}: {successful_reactivations} successful, {failed_reactivations} failed")
         else:
-            result_text += f"\n\n⚠️ {failed_reactivations} پنل فعال نشد. لطفاً بررسی کنید."
-        
-        logger.info(f"Admin user {user_id} reactivation completed by sudo admin {callback.from_user.id}: {successful_reactivations} successful, {failed_reactivations} failed")
-    else:
-        result_text = f"❌ **فعالسازی ناموفق**\n\n"
-        result_text += f"👤 **کاربر:** {user_id}\n"
-        result_text += f"هیچ پنلی فعال نشد.\n\n"
-        result_text += "📋 **جزئیات:**\n"
-        result_text += "\n".join(reactivation_details)
+            result_text = _REACTIVATION_FAILED_TMPL.format_map(
+                {"user_id": user_id, "details": "\n".join(reactivation_details)}
+            )
     
-    await callback.message.edit_text(
-        result_text,
-        reply_markup=get_sudo_keyboard()
-    )
+        await callback.message.edit_text(
+            result_text,
+            reply_markup=get_sudo_keyboard()
+        )
     
-    await callback.answer("فعالسازی کامل شد!" if successful_reactivations > 0 else "فعالسازی ناموفق!")
+        await callback.answer("فعالسازی کامل شد!" if successful_reactivations > 0 else "فعالسازی ناموفق!")
+
 
 
 @sudo_router.message(Command("activate_admin"))
 async def activate_admin_command(message: Message):
     """Handle /activate_admin text command."""
     if message.from_user.id not in config.SUDO_ADMINS:
-        await message.answer(config.MESSAGES["unauthorized"])
+        await message.answer(_MSG_UNAUTHORIZED)
         return
     
     deactivated_admins = await db.get_deactivated_admins()
@@ -1747,14 +1739,11 @@ async def back_to_main(callback: CallbackQuery, state: FSMContext):
     """Return to main menu."""
     await state.clear()
     
-    if callback.from_user.id in config.SUDO_ADMINS:
-        await callback.message.edit_text(
-            config.MESSAGES["welcome_sudo"],
-            reply_markup=get_sudo_keyboard()
-        )
-    else:
-        await callback.answer("غیرمجاز", show_alert=True)
-    
+    await safe_edit_text(
+        callback.message,
+        _MSG_WELCOME_SUDO,
+        reply_markup=get_sudo_keyboard()
+    )
     await callback.answer()
 
 
@@ -1972,7 +1961,7 @@ async def deactivate_admin_and_users(admin_user_id: int, reason: str = "Limit ex
             action="admin_deactivated",
             details=f"Admin panel {admin.id} ({admin.marzban_username}) deactivated. Reason: {reason}. Users disabled: {disabled_count}."
         )
-        await db.add_log(log)
+        db.queue_log(log)
         
         return True
         
@@ -1981,10 +1970,12 @@ async def deactivate_admin_and_users(admin_user_id: int, reason: str = "Limit ex
         return False
 
 
-async def delete_admin_panel_completely(admin_id: int, reason: str = "غیرفعالسازی دستی توسط سودو") -> bool:
+async def delete_admin_panel_completely(admin_id: int, reason: str = "غیرفعالسازی دستی توسط سودو",
+                                        admin: Optional[AdminModel] = None) -> bool:
     """Completely delete admin panel and all their users from both Marzban and database (for manual deactivation)."""
     try:
-        admin = await db.get_admin_by_id(admin_id)
+        if admin is None:
+            admin = await db.get_admin_by_id(admin_id)
         if not admin:
             return False
         
@@ -2022,7 +2013,7 @@ async def delete_admin_panel_completely(admin_id: int, reason: str = "غیرفع
                 action="admin_panel_completely_deleted",
                 details=f"Admin panel {admin_id} ({admin_username}) and {user_count} users completely deleted. Reason: {reason}. Deleted from both Marzban and database."
             )
-            await db.add_log(log)
+            db.queue_log(log)
             
             logger.info(f"Admin panel {admin_id} ({admin_username}) completely deleted from both Marzban and database")
             return True
@@ -2035,10 +2026,12 @@ async def delete_admin_panel_completely(admin_id: int, reason: str = "غیرفع
         return False
 
 
-async def deactivate_admin_panel_by_id(admin_id: int, reason: str = "Limit exceeded") -> bool:
+async def deactivate_admin_panel_by_id(admin_id: int, reason: str = "Limit exceeded",
+                                       admin: Optional[AdminModel] = None) -> bool:
     """Deactivate specific admin panel by ID and all their users."""
     try:
-        admin = await db.get_admin_by_id(admin_id)
+        if admin is None:
+            admin = await db.get_admin_by_id(admin_id)
         if not admin:
             return False
         
@@ -2096,7 +2089,7 @@ async def deactivate_admin_panel_by_id(admin_id: int, reason: str = "Limit excee
             action="admin_panel_deactivated",
             details=f"Admin panel {admin.id} ({admin.marzban_username}) deactivated. Reason: {reason}. Users disabled: {disabled_count}."
         )
-        await db.add_log(log)
+        db.queue_log(log)
         
         return True
         
@@ -2120,11 +2113,13 @@ async def notify_admin_deactivation(bot, admin_user_id: int, reason: str):
             f"برای فعالسازی مجدد از دکمه 'فعالسازی ادمین' استفاده کنید."
         )
         
-        for sudo_id in config.SUDO_ADMINS:
-            try:
-                await bot.send_message(sudo_id, message)
-            except Exception as e:
-                logger.warning(f"Failed to notify sudo admin {sudo_id}: {e}")
+        results = await asyncio.gather(
+            *(bot.send_message(sudo_id, message) for sudo_id in config.SUDO_ADMINS),
+            return_exceptions=True
+        )
+        for sudo_id, result in zip(config.SUDO_ADMINS, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to notify sudo admin {sudo_id}: {result}")
                 
     except Exception as e:
         logger.error(f"Error notifying about admin deactivation: {e}")
@@ -2164,10 +2159,7 @@ async def process_existing_admin_user_id(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_existing_admin_user_id' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted existing admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "existing admin addition"):
         return
     
     try:
@@ -2218,10 +2210,7 @@ async def process_existing_admin_username(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_existing_admin_username' activated for user {user_id}, current state: {current_state}, message: {message.text}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted existing admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "existing admin addition"):
         return
     
     marzban_username = message.text.strip()
@@ -2270,10 +2259,7 @@ async def process_existing_admin_password(message: Message, state: FSMContext):
     logger.info(f"FSM handler 'process_existing_admin_password' activated for user {user_id}, current state: {current_state}")
     
     # Verify user is sudo admin
-    if user_id not in config.SUDO_ADMINS:
-        logger.warning(f"Non-sudo user {user_id} attempted existing admin addition")
-        await message.answer("⛔ شما مجاز به انجام این عمل نیستید.")
-        await state.clear()
+    if await _reject_non_sudo(message, state, "existing admin addition"):
         return
     
     # Delete the message containing password immediately for security
@@ -2307,9 +2293,6 @@ async def process_existing_admin_password(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    # Save password to state and validate credentials
-    await state.update_data(marzban_password=marzban_password)
-    
     # Send validation message
     status_message = await message.answer(
         "🔄 **در حال اعتبارسنجی...**\n\n"
@@ -2333,9 +2316,13 @@ async def process_existing_admin_password(message: Message, state: FSMContext):
         # Extract admin stats and info
         admin_stats = validation_result['admin_stats']
         
-        # Save extracted info to state
+        # Save the password and stats to state in one write, stats as flat scalars, not a pydantic model
         await state.update_data(
-            admin_stats=admin_stats,
+            marzban_password=marzban_password,
+            stats_total_users=admin_stats.total_users,
+            stats_active_users=admin_stats.active_users,
+            stats_traffic_used=admin_stats.total_traffic_used,
+            stats_time_used=admin_stats.total_time_used,
             extracted_info=validation_result.get('extracted_info', {})
         )
         
@@ -2350,12 +2337,7 @@ async def process_existing_admin_password(message: Message, state: FSMContext):
             f"⏱️ زمان استفاده: {format_time_duration(admin_stats.total_time_used)}\n\n"
             "📝 **مرحله ۴ از ۴: تأیید نهایی**\n\n"
             "آیا می‌خواهید این ادمین را با اطلاعات بالا به دیتابیس ربات اضافه کنید؟",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(text="✅ تأیید و اضافه کردن", callback_data="confirm_add_existing_admin"),
-                    InlineKeyboardButton(text="❌ لغو", callback_data="back_to_main")
-                ]
-            ])
+            reply_markup=_CONFIRM_ADD_EXISTING_KB
         )
         
         # Change state to waiting for confirmation
@@ -2374,97 +2356,101 @@ async def process_existing_admin_password(message: Message, state: FSMContext):
 @sudo_router.callback_query(F.data == "confirm_add_existing_admin")
 async def confirm_add_existing_admin(callback: CallbackQuery, state: FSMContext):
     """Confirm and add existing admin to database."""
-    if callback.from_user.id not in config.SUDO_ADMINS:
-        await callback.answer("غیرمجاز", show_alert=True)
+    # Ignore repeated clicks while the same operation is still running
+    lock = get_lock(("add_existing_admin", callback.from_user.id))
+    if lock.locked():
+        await callback.answer(_MSG_IN_PROGRESS, show_alert=True)
         return
     
-    # Get data from state
-    data = await state.get_data()
-    admin_user_id = data.get('user_id')
-    marzban_username = data.get('marzban_username')
-    marzban_password = data.get('marzban_password')
-    admin_stats = data.get('admin_stats')
-    extracted_info = data.get('extracted_info', {})
+    async with lock:
+        # Get data from state
+        data = await state.get_data()
+        admin_user_id = data.get('user_id')
+        marzban_username = data.get('marzban_username')
+        marzban_password = data.get('marzban_password')
+        admin_stats = None
+        if 'stats_total_users' in data:
+            admin_stats = AdminStatsModel.model_construct(
+                total_users=data['stats_total_users'],
+                active_users=data['stats_active_users'],
+                total_traffic_used=data['stats_traffic_used'],
+                total_time_used=data['stats_time_used']
+            )
+        extracted_info = data.get('extracted_info', {})
     
-    if not all([admin_user_id, marzban_username, marzban_password, admin_stats]):
-        logger.error(f"Missing required data in state for confirmation")
+        if not all([admin_user_id, marzban_username, marzban_password, admin_stats]):
+            logger.error(f"Missing required data in state for confirmation")
+            await callback.message.edit_text(
+                "❌ **خطای داخلی**\n\n"
+                "اطلاعات لازم در جلسه موجود نیست. لطفاً مجدداً شروع کنید."
+            )
+            await state.clear()
+            return
+    
+        # Send processing message
         await callback.message.edit_text(
-            "❌ **خطای داخلی**\n\n"
-            "اطلاعات لازم در جلسه موجود نیست. لطفاً مجدداً شروع کنید."
+            "⏳ **در حال اضافه کردن ادمین...**\n\n"
+            "لطفاً منتظر بمانید..."
         )
-        await state.clear()
-        return
     
-    # Send processing message
-    await callback.message.edit_text(
-        "⏳ **در حال اضافه کردن ادمین...**\n\n"
-        "لطفاً منتظر بمانید..."
-    )
-    
-    try:
-        logger.info(f"Confirming addition of existing admin: user_id={admin_user_id}, marzban_username={marzban_username}")
-        
-        # Add admin to database
-        success = await add_existing_admin_to_database(
-            user_id=admin_user_id,
-            marzban_username=marzban_username,
-            marzban_password=marzban_password,
-            admin_stats=admin_stats,
-            extracted_info=extracted_info
-        )
+        try:
+            logger.info(f"Confirming addition of existing admin: user_id={admin_user_id}, marzban_username={marzban_username}")
+        
+            # Add admin to database
+            success = await add_existing_admin_to_database(
+                user_id=admin_user_id,
+                marzban_username=marzban_username,
+                marzban_password=marzban_password,
+                admin_stats=admin_stats,
+                extracted_info=extracted_info
+            )
         
-        logger.info(f"Admin addition result: success={success}")
+            logger.info(f"Admin addition result: success={success}")
         
-        if success:
-            # Clear state
-            await state.clear()
+            if success:
+                # Clear state
+                await state.clear()
             
-            # Send success message
-            await callback.message.edit_text(
-                "✅ **ادمین قبلی با موفقیت اضافه شد**\n\n"
-                f"👤 User ID: `{admin_user_id}`\n"
-                f"🔐 نام کاربری: `{marzban_username}`\n"
-                f"👥 تعداد کاربران: {admin_stats.total_users}\n"
-                f"📊 ترافیک مصرفی: {format_traffic_size(admin_stats.total_traffic_used)}\n\n"
-                "🎉 ادمین اکنون می‌تواند از ربات استفاده کند.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
-                ])
-            )
+                # Send success message
+                await callback.message.edit_text(
+                    "✅ **ادمین قبلی با موفقیت اضافه شد**\n\n"
+                    f"👤 User ID: `{admin_user_id}`\n"
+                    f"🔐 نام کاربری: `{marzban_username}`\n"
+                    f"👥 تعداد کاربران: {admin_stats.total_users}\n"
+                    f"📊 ترافیک مصرفی: {format_traffic_size(admin_stats.total_traffic_used)}\n\n"
+                    "🎉 ادمین اکنون می‌تواند از ربات استفاده کند.",
+                    reply_markup=_BACK_KB
+                )
             
-            # Notify the new admin
-            try:
-                # Get bot instance from callback
-                bot = callback.bot
-                await bot.send_message(
-                    admin_user_id,
-                    "🎉 **خوش آمدید!**\n\n"
-                    "حساب شما به ربات مدیریت مرزبان اضافه شد.\n"
-                    "اکنون می‌توانید از امکانات ربات استفاده کنید.\n\n"
-                    "برای شروع /start را بزنید."
+                # Notify the new admin
+                try:
+                    # Get bot instance from callback
+                    bot = callback.bot
+                    await bot.send_message(
+                        admin_user_id,
+                        "🎉 **خوش آمدید!**\n\n"
+                        "حساب شما به ربات مدیریت مرزبان اضافه شد.\n"
+                        "اکنون می‌توانید از امکانات ربات استفاده کنید.\n\n"
+                        "برای شروع /start را بزنید."
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not notify new admin {admin_user_id}: {e}")
+            else:
+                await callback.message.edit_text(
+                    "❌ **خطا در اضافه کردن ادمین**\n\n"
+                    "مشکلی در ذخیره اطلاعات پیش آمد. لطفاً مجدداً تلاش کنید.",
+                    reply_markup=_BACK_KB
                 )
-            except Exception as e:
-                logger.warning(f"Could not notify new admin {admin_user_id}: {e}")
-        else:
+    
+        except Exception as e:
+            logger.error(f"Error adding existing admin: {e}")
             await callback.message.edit_text(
-                "❌ **خطا در اضافه کردن ادمین**\n\n"
-                "مشکلی در ذخیره اطلاعات پیش آمد. لطفاً مجدداً تلاش کنید.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
-                ])
+                "❌ **خطای سیستم**\n\n"
+                "مشکلی در سیستم پیش آمد. لطفاً مجدداً تلاش کنید.",
+                reply_markup=_BACK_KB
             )
     
-    except Exception as e:
-        logger.error(f"Error adding existing admin: {e}")
-        await callback.message.edit_text(
-            "❌ **خطای سیستم**\n\n"
-            "مشکلی در سیستم پیش آمد. لطفاً مجدداً تلاش کنید.",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text=config.BUTTONS["back"], callback_data="back_to_main")]
-            ])
-        )
-    
-    await callback.answer()
+        await callback.answer()
 
 
 # ===== HELPER FUNCTIONS FOR EXISTING ADMIN =====
@@ -2505,7 +2491,7 @@ async def validate_existing_admin_credentials(marzban_username: str, marzban_pas
         
         # Extract additional information if possible
         extracted_info = {
-            'last_validated': datetime.now().timestamp(),
+            'last_validated': time.time(),
             'token_validated': True,
             'server_url': marzban_api.base_url
         }
@@ -2562,12 +2548,12 @@ async def add_existing_admin_to_database(
         
         # Create admin model with current stats as limits
         # We'll use current traffic usage + some buffer as the limit
-        traffic_buffer = 50 * 1024 * 1024 * 1024  # 50GB buffer
-        max_traffic = max(admin_stats.total_traffic_used + traffic_buffer, 100 * 1024 * 1024 * 1024)  # At least 100GB
+        traffic_buffer = gb_to_bytes(50)  # 50GB buffer
+        max_traffic = max(admin_stats.total_traffic_used + traffic_buffer, gb_to_bytes(100))  # At least 100GB
         
         # For time limit, we'll use a generous default since we can't determine original limits
-        time_buffer = 90 * 24 * 3600  # 90 days
-        max_time = max(admin_stats.total_time_used + time_buffer, 365 * 24 * 3600)  # At least 1 year
+        time_buffer = days_to_seconds(90)  # 90 days
+        max_time = max(admin_stats.total_time_used + time_buffer, days_to_seconds(365))  # At least 1 year
         
         # Create admin record
         from models.schemas import AdminModel
@@ -2609,12 +2595,11 @@ async def add_existing_admin_to_database(
         
         # Log the successful addition
         log_entry = LogModel(
-            admin_id=admin_id,
+            admin_user_id=user_id,
             action="existing_admin_added",
-            details=f"Added existing admin {marzban_username} with {admin_stats.total_users} users and {format_traffic_size(admin_stats.total_traffic_used)} traffic usage",
-            timestamp=datetime.now().timestamp()
+            details=f"Added existing admin {marzban_username} with {admin_stats.total_users} users and {format_traffic_size(admin_stats.total_traffic_used)} traffic usage"
         )
-        await db.add_log(log_entry)
+        db.queue_log(log_entry)
         
         logger.info(f"Successfully added existing admin {user_id} to database with ID {admin_id}")
         return True
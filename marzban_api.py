@@ -1,9 +1,47 @@
 import httpx
 import asyncio
-from typing import List, Optional, Dict, Any, Union
+import functools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Dict, Any, Union
 from datetime import datetime
 import config
 from models.schemas import MarzbanUserModel, AdminStatsModel
+from utils.cache import TTLCache
+
+# User statuses that count towards an admin's usage
+_COUNTED_STATUSES = frozenset({"active", "limited"})
+# Time used per active user while Marzban does not report activation times (assumed 30 days)
+_ESTIMATED_USER_TIME = 30 * 86_400
+
+
+# One pooled client shared by every API object, so requests reuse keep-alive connections
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+@asynccontextmanager
+async def http_client():
+    """Borrow the shared HTTP client, opening it on first use or after it was closed."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=config.API_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=config.API_MAX_CONNECTIONS,
+                keepalive_expiry=config.API_KEEPALIVE_EXPIRY
+            )
+        )
+    yield _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client (used on shutdown)."""
+    if _http_client is not None:
+        await _http_client.aclose()
+
+
+class MarzbanAPIError(Exception):
+    """Raised when the Marzban API cannot be used, e.g. authentication failed."""
 
 
 def safe_extract_username(value: Union[str, Dict[str, Any], None]) -> Optional[str]:
@@ -43,7 +81,7 @@ class MarzbanAdminAPI:
     async def get_token(self) -> Optional[str]:
         """Get authentication token from Marzban using admin credentials."""
         try:
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.post(
                     f"{self.base_url}/api/admin/token",
                     data={
@@ -74,7 +112,7 @@ class MarzbanAdminAPI:
     async def get_headers(self) -> Dict[str, str]:
         """Get headers with authentication token."""
         if not await self.ensure_authenticated():
-            raise Exception(f"Failed to authenticate admin {self.username} with Marzban API")
+            raise MarzbanAPIError(f"Failed to authenticate admin {self.username} with Marzban API")
         
         return {
             "Authorization": f"Bearer {self.token}",
@@ -86,7 +124,7 @@ class MarzbanAdminAPI:
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 # Get users with admin filter to get only this admin's users
                 response = await client.get(
                     f"{self.base_url}/api/users",
@@ -94,6 +132,16 @@ class MarzbanAdminAPI:
                     params={"admin": self.username}
                 )
                 
+                if response.status_code == 401:
+                    # A reused instance may hold an expired token; log in again once
+                    self.token = None
+                    headers = await self.get_headers()
+                    response = await client.get(
+                        f"{self.base_url}/api/users",
+                        headers=headers,
+                        params={"admin": self.username}
+                    )
+                
                 if response.status_code == 200:
                     users_data = response.json()
                     users = []
@@ -129,24 +177,18 @@ class MarzbanAdminAPI:
             # Get all users belonging to this admin
             admin_users = await self.get_users()
             
-            # Filter out deleted/expired users and count only active/valid users
-            valid_users = []
-            for user in admin_users:
-                # Check if user is not expired
-                if user.expire is None or user.expire > datetime.now().timestamp():
-                    # Check if user status is not disabled/deleted
-                    if user.status in ["active", "limited"]:
-                        valid_users.append(user)
+            # Count only users that are not expired and not disabled/deleted
+            now_ts = time.time()
+            valid_users = [
+                user for user in admin_users
+                if user.status in _COUNTED_STATUSES and (user.expire is None or user.expire > now_ts)
+            ]
             
             total_users = len(valid_users)
-            active_users = len([u for u in valid_users if u.status == "active"])
+            active_users = sum(1 for user in valid_users if user.status == "active")
             
-            # Calculate current traffic from existing users
-            current_traffic_used = 0
-            for user in valid_users:
-                # Get user's current usage data (upload + download)
-                user_total_usage = user.used_traffic + (user.lifetime_used_traffic or 0)
-                current_traffic_used += user_total_usage
+            # Current traffic (upload + download) of existing users
+            current_traffic_used = sum(user.used_traffic + (user.lifetime_used_traffic or 0) for user in valid_users)
             
             # Get cumulative traffic (includes deleted users' consumption)
             from database import db
@@ -167,13 +209,9 @@ class MarzbanAdminAPI:
             # Calculate total time used based on user creation/activation times
             # Note: This would need actual time tracking from Marzban API
             # For now, we estimate based on user activity
-            total_time_used = 0
-            for user in valid_users:
-                if user.expire and user.status == "active":
-                    # Estimate time used (this is approximate)
-                    creation_time = datetime.now().timestamp() - (30 * 24 * 3600)  # Assume 30 days ago
-                    time_used = datetime.now().timestamp() - creation_time
-                    total_time_used += int(time_used)
+            total_time_used = _ESTIMATED_USER_TIME * sum(
+                1 for user in valid_users if user.expire and user.status == "active"
+            )
             
             return AdminStatsModel(
                 total_users=total_users,
@@ -202,11 +240,12 @@ class MarzbanAPI:
         self.password = config.MARZBAN_PASSWORD
         self.token = None
         self.token_expires = None
+        self._admin_apis = TTLCache(ttl=config.ADMIN_API_CACHE_TTL)
 
     async def get_token(self) -> Optional[str]:
         """Get authentication token from Marzban."""
         try:
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.post(
                     f"{self.base_url}/api/admin/token",
                     data={
@@ -237,7 +276,7 @@ class MarzbanAPI:
     async def get_headers(self) -> Dict[str, str]:
         """Get headers with authentication token."""
         if not await self.ensure_authenticated():
-            raise Exception("Failed to authenticate with Marzban API")
+            raise MarzbanAPIError("Failed to authenticate with Marzban API")
         
         return {
             "Authorization": f"Bearer {self.token}",
@@ -245,8 +284,12 @@ class MarzbanAPI:
         }
 
     async def create_admin_api(self, marzban_username: str, marzban_password: str) -> MarzbanAdminAPI:
-        """Create a MarzbanAdminAPI instance for specific admin credentials."""
-        return MarzbanAdminAPI(self.base_url, marzban_username, marzban_password)
+        """Return a MarzbanAdminAPI for the credentials, reusing a cached instance and its token."""
+        admin_api = self._admin_apis.get(marzban_username)
+        if admin_api is None or admin_api.password != marzban_password:
+            admin_api = MarzbanAdminAPI(self.base_url, marzban_username, marzban_password)
+            self._admin_apis.set(marzban_username, admin_api)
+        return admin_api
 
     async def get_admin_stats_with_credentials(self, marzban_username: str, marzban_password: str) -> AdminStatsModel:
         """Get admin stats using specific admin credentials for real-time data."""
@@ -260,7 +303,7 @@ class MarzbanAPI:
     async def get_token(self) -> Optional[str]:
         """Get authentication token from Marzban."""
         try:
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.post(
                     f"{self.base_url}/api/admin/token",
                     data={
@@ -291,22 +334,31 @@ class MarzbanAPI:
     async def get_headers(self) -> Dict[str, str]:
         """Get headers with authentication token."""
         if not await self.ensure_authenticated():
-            raise Exception("Failed to authenticate with Marzban API")
+            raise MarzbanAPIError("Failed to authenticate with Marzban API")
         
         return {
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
 
-    async def get_users(self, admin_username: Optional[str] = None) -> List[MarzbanUserModel]:
-        """Get all users or users for specific admin."""
+    async def get_users(self, admin_username: Optional[str] = None, offset: Optional[int] = None,
+                        limit: Optional[int] = None) -> List[MarzbanUserModel]:
+        """Get all users or users for specific admin, optionally a single page of them.
+
+        A failed page request raises MarzbanAPIError, since an empty page would end iter_users early.
+        """
+        paged = offset is not None or limit is not None
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 params = {}
                 if admin_username:
                     params["admin"] = admin_username
+                if offset is not None:
+                    params["offset"] = offset
+                if limit is not None:
+                    params["limit"] = limit
                     
                 response = await client.get(
                     f"{self.base_url}/api/users",
@@ -337,18 +389,48 @@ class MarzbanAPI:
                     return users
                 else:
                     print(f"Failed to get users: {response.status_code} - {response.text}")
+                    if paged:
+                        raise MarzbanAPIError(f"Failed to get users page at offset {offset}: {response.status_code}")
                     return []
                     
         except Exception as e:
             print(f"Error getting users: {e}")
+            if paged:
+                if isinstance(e, MarzbanAPIError):
+                    raise
+                raise MarzbanAPIError(f"Failed to get users page at offset {offset}: {e}") from e
             return []
 
+    async def iter_users(self, admin_username: Optional[str] = None,
+                         page_size: Optional[int] = None) -> AsyncIterator[MarzbanUserModel]:
+        """Yield users page by page instead of loading the whole panel at once, fetching the next page in the background.
+
+        Raises MarzbanAPIError if a page cannot be fetched, rather than stopping with a partial listing.
+        """
+        page_size = page_size or config.API_USERS_PAGE_SIZE
+        offset = 0
+        next_page = asyncio.create_task(self.get_users(admin_username, offset=offset, limit=page_size))
+        try:
+            while next_page is not None:
+                page = await next_page
+                if len(page) < page_size:
+                    next_page = None
+                else:
+                    offset += page_size
+                    next_page = asyncio.create_task(self.get_users(admin_username, offset=offset, limit=page_size))
+                for user in page:
+                    yield user
+        finally:
+            # The consumer stopped early; don't leave the prefetch running
+            if next_page is not None:
+                next_page.cancel()
+
     async def get_user(self, username: str) -> Optional[MarzbanUserModel]:
         """Get specific user information."""
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.get(
                     f"{self.base_url}/api/user/{username}",
                     headers=headers
@@ -383,7 +465,7 @@ class MarzbanAPI:
             
             logger.debug(f"Disabling user {username} in Marzban...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.put(
                     f"{self.base_url}/api/user/{username}",
                     headers=headers,
@@ -420,7 +502,7 @@ class MarzbanAPI:
             
             logger.debug(f"Enabling user {username} in Marzban...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.put(
                     f"{self.base_url}/api/user/{username}",
                     headers=headers,
@@ -447,30 +529,36 @@ class MarzbanAPI:
             logger.error(f"Exception while enabling user {username}: {type(e).__name__}: {e}")
             return False
 
+    async def _run_users_batch(self, action, usernames: List[str]) -> Dict[str, bool]:
+        """Run a per-user action for many users with bounded concurrency."""
+        semaphore = asyncio.Semaphore(config.API_BATCH_CONCURRENCY)
+        
+        async def run_one(username: str) -> bool:
+            async with semaphore:
+                try:
+                    return await action(username)
+                except Exception as e:
+                    print(f"Error in batch operation for user {username}: {e}")
+                    return False
+        
+        results = await asyncio.gather(*(run_one(username) for username in usernames))
+        return dict(zip(usernames, results))
+
     async def disable_users_batch(self, usernames: List[str]) -> Dict[str, bool]:
         """Disable multiple users."""
-        results = {}
-        for username in usernames:
-            results[username] = await self.disable_user(username)
-            await asyncio.sleep(0.1)  # Small delay to avoid overwhelming the API
-        return results
+        return await self._run_users_batch(self.disable_user, usernames)
 
     async def enable_users_batch(self, usernames: List[str]) -> Dict[str, bool]:
         """Enable multiple users."""
-        results = {}
-        for username in usernames:
-            results[username] = await self.enable_user(username)
-            await asyncio.sleep(0.1)  # Small delay to avoid overwhelming the API
-        return results
+        return await self._run_users_batch(self.enable_user, usernames)
 
     async def get_admin_stats(self, admin_username: str) -> AdminStatsModel:
         """Get statistics for a specific admin - only count users owned by this admin."""
         try:
-            # Get all users and filter by admin ownership
-            all_users = await self.get_users()
+            # Page through all users and filter by admin ownership
             admin_users = []
             
-            for user in all_users:
+            async for user in self.iter_users():
                 # Get detailed user info to check ownership and calculate accurate usage
                 detailed_user = await self.get_user(user.username)
                 if detailed_user:
@@ -482,24 +570,18 @@ class MarzbanAPI:
                         await self.set_user_owner(user.username, admin_username)
                         admin_users.append(detailed_user)
             
-            # Filter out deleted/expired users and count only active/valid users
-            valid_users = []
-            for user in admin_users:
-                # Check if user is not expired
-                if user.expire is None or user.expire > datetime.now().timestamp():
-                    # Check if user status is not disabled/deleted
-                    if user.status in ["active", "limited"]:
-                        valid_users.append(user)
+            # Count only users that are not expired and not disabled/deleted
+            now_ts = time.time()
+            valid_users = [
+                user for user in admin_users
+                if user.status in _COUNTED_STATUSES and (user.expire is None or user.expire > now_ts)
+            ]
             
             total_users = len(valid_users)
-            active_users = len([u for u in valid_users if u.status == "active"])
+            active_users = sum(1 for user in valid_users if user.status == "active")
             
-            # Calculate current traffic from existing users
-            current_traffic_used = 0
-            for user in valid_users:
-                # Get user's current usage data (upload + download)
-                user_total_usage = user.used_traffic + (user.lifetime_used_traffic or 0)
-                current_traffic_used += user_total_usage
+            # Current traffic (upload + download) of existing users
+            current_traffic_used = sum(user.used_traffic + (user.lifetime_used_traffic or 0) for user in valid_users)
             
             # Get cumulative traffic (includes deleted users' consumption)
             from database import db
@@ -519,13 +601,9 @@ class MarzbanAPI:
             # Calculate total time used based on user creation/activation times
             # Note: This would need actual time tracking from Marzban API
             # For now, we estimate based on user activity
-            total_time_used = 0
-            for user in valid_users:
-                if user.expire and user.status == "active":
-                    # Estimate time used (this is approximate)
-                    creation_time = datetime.now().timestamp() - (30 * 24 * 3600)  # Assume 30 days ago
-                    time_used = datetime.now().timestamp() - creation_time
-                    total_time_used += int(time_used)
+            total_time_used = _ESTIMATED_USER_TIME * sum(
+                1 for user in valid_users if user.expire and user.status == "active"
+            )
             
             return AdminStatsModel(
                 total_users=total_users,
@@ -534,6 +612,9 @@ class MarzbanAPI:
                 total_time_used=total_time_used
             )
             
+        except MarzbanAPIError:
+            # A page of users is missing; partial totals would under-report usage
+            raise
         except Exception as e:
             print(f"Error getting admin stats for {admin_username}: {e}")
             return AdminStatsModel()
@@ -543,7 +624,7 @@ class MarzbanAPI:
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.get(
                     f"{self.base_url}/api/system",
                     headers=headers
@@ -574,7 +655,7 @@ class MarzbanAPI:
             
             logger.info(f"Updating password for admin {admin_username} in Marzban panel...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.put(
                     f"{self.base_url}/api/admin/{admin_username}",
                     headers=headers,
@@ -623,7 +704,7 @@ class MarzbanAPI:
             
             logger.info(f"Creating admin {username} in Marzban panel...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.post(
                     f"{self.base_url}/api/admin",
                     headers=headers,
@@ -661,7 +742,7 @@ class MarzbanAPI:
             
             logger.debug(f"Checking if admin {username} exists in Marzban...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.get(
                     f"{self.base_url}/api/admin/{username}",
                     headers=headers
@@ -695,7 +776,7 @@ class MarzbanAPI:
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.put(
                     f"{self.base_url}/api/user/{username}",
                     headers=headers,
@@ -718,7 +799,7 @@ class MarzbanAPI:
             
             logger.debug(f"Modifying user {username} in Marzban...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.put(
                     f"{self.base_url}/api/user/{username}",
                     headers=headers,
@@ -767,7 +848,7 @@ class MarzbanAPI:
             
             logger.debug(f"Removing user {username} from Marzban...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.delete(
                     f"{self.base_url}/api/user/{username}",
                     headers=headers
@@ -832,7 +913,7 @@ class MarzbanAPI:
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 params = {"expired": "true"}
                 if admin_username:
                     params["admin"] = admin_username
@@ -872,18 +953,35 @@ class MarzbanAPI:
             print(f"Error getting expired users: {e}")
             return []
 
+    async def _preserve_users_traffic(self, users: List[MarzbanUserModel]):
+        """Add the traffic of deleted users to their admins' cumulative totals, one write per admin."""
+        traffic_by_admin: Dict[str, int] = {}
+        for user in users:
+            if user.admin:
+                traffic_by_admin[user.admin] = traffic_by_admin.get(user.admin, 0) + user.used_traffic + (user.lifetime_used_traffic or 0)
+        
+        from database import db
+        for admin_username, traffic in traffic_by_admin.items():
+            if traffic <= 0:
+                continue
+            admin_from_db = await db.get_admin_by_marzban_username(admin_username)
+            if admin_from_db:
+                await db.initialize_cumulative_traffic(admin_from_db.id)
+                await db.add_to_cumulative_traffic(admin_from_db.id, traffic)
+
     async def delete_expired_users(self, admin_username: Optional[str] = None) -> bool:
         """Delete all expired users."""
         try:
             expired_users = await self.get_expired_users(admin_username)
+            if not expired_users:
+                return True
             
-            results = []
-            for user in expired_users:
-                result = await self.remove_user(user.username)
-                results.append(result)
-                await asyncio.sleep(0.1)  # Small delay to avoid overwhelming the API
-            
-            return all(results)
+            # The listing already carries each user's traffic, so skip the per-user lookup and
+            # count only the users whose delete succeeded, one write per admin
+            remove_user = functools.partial(self.remove_user, preserve_traffic=False)
+            results = await self._run_users_batch(remove_user, [user.username for user in expired_users])
+            await self._preserve_users_traffic([user for user in expired_users if results[user.username]])
+            return all(results.values())
                 
         except Exception as e:
             print(f"Error deleting expired users: {e}")
@@ -894,7 +992,7 @@ class MarzbanAPI:
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.post(
                     f"{self.base_url}/api/user/{username}/reset",
                     headers=headers
@@ -911,12 +1009,7 @@ class MarzbanAPI:
         try:
             users = await self.get_users(admin_username)
             
-            results = {}
-            for user in users:
-                results[user.username] = await self.reset_user_data_usage(user.username)
-                await asyncio.sleep(0.1)  # Small delay to avoid overwhelming the API
-            
-            return results
+            return await self._run_users_batch(self.reset_user_data_usage, [user.username for user in users])
                 
         except Exception as e:
             print(f"Error resetting users data usage: {e}")
@@ -927,7 +1020,7 @@ class MarzbanAPI:
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.get(
                     f"{self.base_url}/api/admin",
                     headers=headers
@@ -948,7 +1041,7 @@ class MarzbanAPI:
         try:
             headers = await self.get_headers()
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.get(
                     f"{self.base_url}/api/admins",
                     headers=headers
@@ -974,7 +1067,7 @@ class MarzbanAPI:
             
             logger.info(f"Deleting admin {admin_username} from Marzban panel...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.delete(
                     f"{self.base_url}/api/admin/{admin_username}",
                     headers=headers
@@ -1036,24 +1129,12 @@ class MarzbanAPI:
                     await db.update_cumulative_traffic(admin_from_db.id, total_traffic_to_preserve)
                     logger.info(f"Updated cumulative traffic for admin {admin_username} to {total_traffic_to_preserve} bytes")
             
-            # Delete all users belonging to this admin
-            deleted_users_count = 0
-            failed_users = []
-            
-            for user in admin_users:
-                try:
-                    success = await self.remove_user(user.username)
-                    if success:
-                        deleted_users_count += 1
-                        logger.debug(f"User {user.username} deleted successfully")
-                    else:
-                        failed_users.append(user.username)
-                        logger.warning(f"Failed to delete user {user.username}")
-                    await asyncio.sleep(0.1)  # Rate limiting
-                except Exception as e:
-                    failed_users.append(user.username)
-                    logger.error(f"Exception while deleting user {user.username}: {type(e).__name__}: {e}")
-                    continue
+            # Delete all users belonging to this admin, a bounded number at a time
+            results = await self._run_users_batch(self.remove_user, [user.username for user in admin_users])
+            failed_users = [username for username, success in results.items() if not success]
+            deleted_users_count = len(results) - len(failed_users)
+            if failed_users:
+                logger.warning(f"Failed to delete users: {', '.join(failed_users)}")
             
             logger.info(f"User deletion summary for admin {admin_username}: {deleted_users_count} deleted, {len(failed_users)} failed")
             
@@ -1081,7 +1162,7 @@ class MarzbanAPI:
             
             logger.info(f"Updating admin {admin_username} in Marzban panel...")
             
-            async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
+            async with http_client() as client:
                 response = await client.put(
                     f"{self.base_url}/api/admin/{admin_username}",
                     headers=headers,
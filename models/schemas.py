@@ -23,6 +23,11 @@ class AdminModel(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
+    @property
+    def panel_name(self) -> str:
+        """Display name of the panel: admin name, then Marzban username, then its ID."""
+        return self.admin_name or self.marzban_username or f"Panel {self.id}"
+
 
 class UsageReportModel(BaseModel):
     id: Optional[int] = None
@@ -1,6 +1,6 @@
 import asyncio
-import json
 import logging
+import orjson
 from datetime import datetime
 from typing import List, Dict
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -106,7 +106,7 @@ class MonitoringScheduler:
                 current_users=len(admin_users),
                 current_total_time=admin_stats.total_time_used,
                 current_total_traffic=admin_stats.total_traffic_used,
-                users_data=json.dumps(users_data, ensure_ascii=False)
+                users_data=orjson.dumps(users_data).decode()
             )
 
             await db.add_usage_report(report)
@@ -159,21 +159,21 @@ class MonitoringScheduler:
                 
             if limits_data.get("traffic_percentage", 0) >= 1.0:
                 from utils.notify import format_traffic_size
-                current_traffic = await format_traffic_size(limits_data['current_traffic'])
-                max_traffic = await format_traffic_size(limits_data['max_traffic'])
+                current_traffic = format_traffic_size(limits_data['current_traffic'])
+                max_traffic = format_traffic_size(limits_data['max_traffic'])
                 exceeded_limits.append(f"ترافیک ({current_traffic}/{max_traffic})")
                 
             if limits_data.get("time_percentage", 0) >= 1.0:
                 from utils.notify import format_time_duration
-                current_time = await format_time_duration(limits_data['current_time'])
-                max_time = await format_time_duration(limits_data['max_time'])
+                current_time = format_time_duration(limits_data['current_time'])
+                max_time = format_time_duration(limits_data['max_time'])
                 exceeded_limits.append(f"زمان ({current_time}/{max_time})")
             
             reason = "تجاوز از محدودیت: " + ", ".join(exceeded_limits)
 
             # Try to deactivate admin panel and all their users first
             try:
-                success = await deactivate_admin_panel_by_id(result.admin_id, reason)
+                success = await deactivate_admin_panel_by_id(result.admin_id, reason, admin=admin)
                 
                 if success:
                     # Notify sudo admins about deactivation
@@ -186,7 +186,7 @@ class MonitoringScheduler:
                         details=f"Admin panel {result.admin_id} and users deactivated due to limit exceeded. {reason}",
                         timestamp=datetime.now()
                     )
-                    await db.add_log(log)
+                    db.queue_log(log)
                     
                     print(f"Admin panel {result.admin_id} (user {result.admin_user_id}) and their users deactivated due to limit exceeded: {reason}")
                     return
@@ -219,7 +219,7 @@ class MonitoringScheduler:
                     details=f"Limits exceeded. Disabled {len(disabled_users)} users: {', '.join(disabled_users)}. {reason}",
                     timestamp=datetime.now()
                 )
-                await db.add_log(log)
+                db.queue_log(log)
                 
                 print(f"Disabled {len(disabled_users)} users for admin {result.admin_user_id} due to limit exceeded")
 
@@ -309,7 +309,7 @@ class MonitoringScheduler:
                     details=f"Automatically cleaned up {total_cleaned} expired users",
                     timestamp=datetime.now()
                 )
-                await db.add_log(log)
+                db.queue_log(log)
             
             print(f"Expired users cleanup completed. Removed {total_cleaned} users at {datetime.now()}")
             
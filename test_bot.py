@@ -137,17 +137,17 @@ async def test_utilities():
         from utils.notify import format_traffic_size, format_time_duration
         
         # Test traffic formatting
-        traffic_1gb = await format_traffic_size(1073741824)
+        traffic_1gb = format_traffic_size(1073741824)
         print(f"✅ Traffic format (1GB): {traffic_1gb}")
         
-        traffic_500mb = await format_traffic_size(524288000)
+        traffic_500mb = format_traffic_size(524288000)
         print(f"✅ Traffic format (500MB): {traffic_500mb}")
         
         # Test time formatting
-        time_1day = await format_time_duration(86400)
+        time_1day = format_time_duration(86400)
         print(f"✅ Time format (1 day): {time_1day}")
         
-        time_2hours = await format_time_duration(7200)
+        time_2hours = format_time_duration(7200)
         print(f"✅ Time format (2 hours): {time_2hours}")
         
         return True
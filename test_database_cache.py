@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Test for the database layer's shared connection and admin caches.
+Validates that cached admin lookups never outlive a write, that cumulative traffic
+only increases, that a failed write does not break the shared connection, and that
+failed authorization lookups are not cached.
+"""
+
+import asyncio
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from database import Database
+from models.schemas import AdminModel, LogModel
+from utils import authcache
+
+TEST_DB_PATH = "/tmp/test_database_cache.db"
+TEST_USER_ID = 555000111
+
+# Failed statements in these tests are expected; keep their error lines out of the working tree
+config.DB_ERROR_LOG_PATH = "/tmp/test_database_cache_errors.log"
+
+
+def make_admin(marzban_username: str = "cache_admin") -> AdminModel:
+    """Build a test admin panel for TEST_USER_ID."""
+    return AdminModel(
+        user_id=TEST_USER_ID,
+        admin_name="Cache Test",
+        marzban_username=marzban_username,
+        marzban_password="cache_password",
+        max_users=10,
+        max_total_time=2592000,
+        max_total_traffic=10737418240,
+        validity_days=30
+    )
+
+
+async def open_test_db() -> Database:
+    """Create a fresh test database."""
+    for path in (TEST_DB_PATH, TEST_DB_PATH + "-wal", TEST_DB_PATH + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    db = Database(TEST_DB_PATH)
+    await db.init_db()
+    return db
+
+
+async def read_all(db: Database, admin_id: int):
+    """Read the admin through every cached lookup."""
+    by_user = await db.get_admin(TEST_USER_ID)
+    by_id = await db.get_admin_by_id(admin_id)
+    all_admins = [admin for admin in await db.get_all_admins() if admin.id == admin_id]
+    return by_user, by_id, (all_admins[0] if all_admins else None)
+
+
+async def test_cached_miss_cleared_on_add():
+    """A cached 'no such admin' result is dropped once that admin is added."""
+    print("🧪 Testing cached misses")
+    print("=" * 50)
+
+    db = await open_test_db()
+    try:
+        assert await db.get_admin(TEST_USER_ID) is None, "Admin should not exist yet"
+        assert await db.get_all_admins() == [], "No admins should exist yet"
+
+        admin_id = await db.add_admin(make_admin())
+        assert admin_id > 0, "Admin should be added"
+
+        by_user, by_id, listed = await read_all(db, admin_id)
+        assert by_user is not None and by_user.id == admin_id, "Cached miss should be cleared by add_admin"
+        assert by_id is not None, "get_admin_by_id should find the new admin"
+        assert listed is not None, "get_all_admins should list the new admin"
+        print("✅ Cached miss cleared when the admin is added")
+    finally:
+        await db.close()
+    return True
+
+
+async def test_cache_cleared_after_each_write():
+    """Every write to the admins table is visible through every cached lookup."""
+    print("\n🧪 Testing cache invalidation after admin writes")
+    print("=" * 50)
+
+    db = await open_test_db()
+    try:
+        admin_id = await db.add_admin(make_admin())
+        log = LogModel(admin_user_id=TEST_USER_ID, action="cache_test", details="update with log")
+
+        writes = [
+            ("update_admin", lambda: db.update_admin(admin_id, max_users=20), lambda a: a.max_users == 20),
+            ("update_admin_with_log", lambda: db.update_admin_with_log(admin_id, log, max_users=21), lambda a: a.max_users == 21),
+            ("update_admin_by_user_id", lambda: db.update_admin_by_user_id(TEST_USER_ID, max_users=22), lambda a: a.max_users == 22),
+            ("execute_query", lambda: db.execute_query("UPDATE admins SET max_users = ? WHERE id = ?", (23, admin_id)), lambda a: a.max_users == 23),
+            ("deactivate_admin", lambda: db.deactivate_admin(admin_id, "test"), lambda a: not a.is_active),
+            ("reactivate_admin", lambda: db.reactivate_admin(admin_id), lambda a: a.is_active),
+            ("deactivate_admin_by_user_id", lambda: db.deactivate_admin_by_user_id(TEST_USER_ID, "test"), lambda a: not a.is_active),
+            ("reactivate_admin_by_user_id", lambda: db.reactivate_admin_by_user_id(TEST_USER_ID), lambda a: a.is_active),
+        ]
+
+        for name, write, check in writes:
+            # Fill every cache, then write
+            await read_all(db, admin_id)
+            assert await write(), f"{name} should succeed"
+            for admin in await read_all(db, admin_id):
+                assert admin is not None and check(admin), f"Stale cached admin after {name}"
+            print(f"✅ {name} clears the admin caches")
+
+        await read_all(db, admin_id)
+        assert await db.remove_admin_by_id(admin_id), "remove_admin_by_id should succeed"
+        assert await read_all(db, admin_id) == (None, None, None), "Stale cached admin after remove_admin_by_id"
+        print("✅ remove_admin_by_id clears the admin caches")
+
+        admin_id = await db.add_admin(make_admin("cache_admin_2"))
+        await read_all(db, admin_id)
+        assert await db.remove_admin(TEST_USER_ID), "remove_admin should succeed"
+        assert await read_all(db, admin_id) == (None, None, None), "Stale cached admin after remove_admin"
+        print("✅ remove_admin clears the admin caches")
+    finally:
+        await db.close()
+    return True
+
+
+async def test_cumulative_traffic_only_increases():
+    """update_cumulative_traffic reports False unless the stored total grows."""
+    print("\n🧪 Testing cumulative traffic updates")
+    print("=" * 50)
+
+    db = await open_test_db()
+    try:
+        admin_id = await db.add_admin(make_admin())
+
+        assert await db.update_cumulative_traffic(admin_id, 1000) == True, "Higher traffic should update"
+        assert await db.update_cumulative_traffic(admin_id, 1000) == False, "Equal traffic should not update"
+        assert await db.update_cumulative_traffic(admin_id, 400) == False, "Lower traffic should not update"
+        assert await db.update_cumulative_traffic(admin_id, 0) == False, "Zero traffic should not update"
+        assert await db.get_cumulative_traffic(admin_id) == 1000, "Stored total should stay at the maximum"
+
+        assert await db.update_cumulative_traffic(admin_id, 1500) == True, "Higher traffic should update"
+        assert await db.get_cumulative_traffic(admin_id) == 1500, "Stored total should follow the maximum"
+        print("✅ Cumulative traffic only increases and reports unchanged rows as False")
+    finally:
+        await db.close()
+    return True
+
+
+async def test_failed_write_leaves_connection_usable():
+    """A block that fails mid-transaction is rolled back and the shared connection keeps working."""
+    print("\n🧪 Testing failed writes on the shared connection")
+    print("=" * 50)
+
+    db = await open_test_db()
+    try:
+        admin_id = await db.add_admin(make_admin())
+        connection = db._conn
+        logs_before = len(await db.get_logs())
+
+        try:
+            async with db._connect() as conn:
+                await conn.execute(
+                    "INSERT INTO logs (admin_user_id, action, details) VALUES (?, ?, ?)",
+                    (TEST_USER_ID, "uncommitted", "should be rolled back")
+                )
+                raise RuntimeError("simulated failure")
+        except RuntimeError:
+            pass
+
+        assert db._conn is connection, "The shared connection should be kept"
+        assert not connection.in_transaction, "The failed block should be rolled back"
+        assert len(await db.get_logs()) == logs_before, "Uncommitted insert should be discarded"
+        print("✅ Failed block rolled back")
+
+        assert await db.execute_query("INSERT INTO no_such_table VALUES (?)", (1,)) == False, "Bad statement should fail"
+        assert await db.update_admin(admin_id, max_users=30), "Writes should work after a failed statement"
+        assert (await db.get_admin_by_id(admin_id)).max_users == 30, "Write after a failure should be stored"
+        assert await db.add_log(LogModel(admin_user_id=TEST_USER_ID, action="after_failure")), "Log insert should work"
+        assert len(await db.get_logs()) == logs_before + 1, "Log written after a failure should be stored"
+        print("✅ Shared connection usable after failed writes")
+    finally:
+        await db.close()
+    return True
+
+
+async def test_failed_auth_lookup_not_cached():
+    """A failed panel lookup is not cached, so the next call asks the database again."""
+    print("\n🧪 Testing failed authorization lookups")
+    print("=" * 50)
+
+    admin = make_admin()
+    authcache.invalidate(TEST_USER_ID)
+    try:
+        with patch('database.db.get_active_admins_for_user', new=AsyncMock(side_effect=[None, [admin]])) as mock_lookup:
+            assert await authcache.get_active_admins_cached(TEST_USER_ID) == [], "Failed lookup should return no panels"
+            assert await authcache.get_active_admins_cached(TEST_USER_ID) == [admin], "Next call should retry the database"
+            assert await authcache.get_active_admins_cached(TEST_USER_ID) == [admin], "Successful lookup should be cached"
+            assert mock_lookup.await_count == 2, "Only the successful lookup should be cached"
+        print("✅ Failed lookup retried, successful lookup cached")
+    finally:
+        authcache.invalidate(TEST_USER_ID)
+    return True
+
+
+async def main():
+    """Run all database cache tests."""
+    print("🧪 DATABASE CACHE AND CONNECTION TESTS")
+    print("=" * 50)
+
+    try:
+        results = [
+            await test_cached_miss_cleared_on_add(),
+            await test_cache_cleared_after_each_write(),
+            await test_cumulative_traffic_only_increases(),
+            await test_failed_write_leaves_connection_usable(),
+            await test_failed_auth_lookup_not_cached(),
+        ]
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        return False
+
+    print("\n" + "=" * 50)
+    if all(results):
+        print("🎉 ALL DATABASE CACHE TESTS PASSED!")
+        return True
+    print("❌ Some database cache tests failed")
+    return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    sys.exit(0 if success else 1)
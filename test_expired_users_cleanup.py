@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test for expired user cleanup.
+Validates that deleted users' traffic is added to cumulative totals only after their delete succeeds.
+"""
+
+import asyncio
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from marzban_api import MarzbanAPI
+from models.schemas import AdminModel, MarzbanUserModel
+
+
+TEST_ADMIN = AdminModel(
+    id=7,
+    user_id=123456789,
+    marzban_username="owner_admin",
+    max_users=10,
+    max_total_time=2592000,
+    max_total_traffic=107374182400
+)
+
+EXPIRED_USERS = [
+    MarzbanUserModel(username="user1", status="expired", used_traffic=100, lifetime_used_traffic=50, admin="owner_admin"),
+    MarzbanUserModel(username="user2", status="expired", used_traffic=30, lifetime_used_traffic=0, admin="owner_admin"),
+    MarzbanUserModel(username="user3", status="expired", used_traffic=500, lifetime_used_traffic=0, admin="owner_admin"),
+]
+
+
+def patch_cumulative_traffic():
+    """Patch the database calls used to record cumulative traffic."""
+    return (
+        patch('database.db.get_admin_by_marzban_username', new=AsyncMock(return_value=TEST_ADMIN)),
+        patch('database.db.initialize_cumulative_traffic', new=AsyncMock(return_value=True)),
+        patch('database.db.add_to_cumulative_traffic', new=AsyncMock(return_value=True)),
+    )
+
+
+async def test_all_deletes_succeed():
+    """Traffic of every deleted user is added in one write for their admin."""
+    print("🧪 Testing expired cleanup when every delete succeeds")
+    print("=" * 50)
+
+    api = MarzbanAPI()
+    get_admin, init_traffic, add_traffic = patch_cumulative_traffic()
+
+    with patch.object(api, 'get_expired_users', new=AsyncMock(return_value=EXPIRED_USERS)), \
+         patch.object(api, 'remove_user', new=AsyncMock(return_value=True)) as mock_remove, \
+         get_admin, init_traffic, add_traffic as mock_add:
+        result = await api.delete_expired_users()
+
+        assert result == True, "Should return True when every delete succeeds"
+        assert mock_remove.await_count == 3, "Every expired user should be deleted"
+        for call in mock_remove.await_args_list:
+            assert call.kwargs == {"preserve_traffic": False}, "Traffic must not be preserved before the delete"
+        mock_add.assert_awaited_once_with(7, 680)
+
+    print("✅ Traffic of all deleted users added once")
+    return True
+
+
+async def test_failed_deletes_not_counted():
+    """Users whose delete fails or raises are not added to the cumulative traffic."""
+    print("\n🧪 Testing expired cleanup when some deletes fail")
+    print("=" * 50)
+
+    api = MarzbanAPI()
+    get_admin, init_traffic, add_traffic = patch_cumulative_traffic()
+
+    async def remove_user(username, preserve_traffic=True):
+        if username == "user2":
+            return False
+        if username == "user3":
+            raise Exception("Connection refused")
+        return True
+
+    with patch.object(api, 'get_expired_users', new=AsyncMock(return_value=EXPIRED_USERS)), \
+         patch.object(api, 'remove_user', new=remove_user), \
+         get_admin, init_traffic, add_traffic as mock_add:
+        result = await api.delete_expired_users()
+
+        assert result == False, "Should return False when a delete fails"
+        mock_add.assert_awaited_once_with(7, 150)
+
+    print("✅ Only successfully deleted users counted")
+
+    # When nothing is deleted, nothing is counted, so a later retry does not count twice
+    api = MarzbanAPI()
+    get_admin, init_traffic, add_traffic = patch_cumulative_traffic()
+
+    with patch.object(api, 'get_expired_users', new=AsyncMock(return_value=EXPIRED_USERS)), \
+         patch.object(api, 'remove_user', new=AsyncMock(return_value=False)), \
+         get_admin, init_traffic, add_traffic as mock_add:
+        result = await api.delete_expired_users()
+
+        assert result == False, "Should return False when every delete fails"
+        mock_add.assert_not_awaited()
+
+    print("✅ Nothing counted when every delete fails")
+    return True
+
+
+async def main():
+    """Run all expired user cleanup tests."""
+    try:
+        results = [
+            await test_all_deletes_succeed(),
+            await test_failed_deletes_not_counted(),
+        ]
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        return False
+
+    print("\n" + "=" * 50)
+    if all(results):
+        print("🎉 ALL EXPIRED USER CLEANUP TESTS PASSED!")
+        return True
+    print("❌ Some expired user cleanup tests failed")
+    return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    sys.exit(0 if success else 1)
@@ -134,11 +134,11 @@ async def test_validation_improvements():
     
     try:
         # Test create_admin with mocked failure
-        with patch('httpx.AsyncClient') as mock_client:
+        with patch('httpx.AsyncClient', return_value=AsyncMock()) as mock_client:
             mock_response = MagicMock()
             mock_response.status_code = 409
             mock_response.text = '{"error": "Username already exists"}'
-            mock_client.return_value.__aenter__.return_value.post.return_value = mock_response
+            mock_client.return_value.post.return_value = mock_response
             
             with patch.object(api, 'get_headers', return_value={"Authorization": "Bearer test"}):
                 result = await api.create_admin("existing_admin", "password", 12345)
@@ -150,11 +150,11 @@ async def test_validation_improvements():
                 return False
         
         # Test admin_exists with mocked responses
-        with patch('httpx.AsyncClient') as mock_client:
+        with patch('httpx.AsyncClient', return_value=AsyncMock()) as mock_client:
             mock_response = MagicMock()
             mock_response.status_code = 404
             mock_response.text = '{"error": "Not found"}'
-            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
+            mock_client.return_value.get.return_value = mock_response
             
             with patch.object(api, 'get_headers', return_value={"Authorization": "Bearer test"}):
                 result = await api.admin_exists("nonexistent_admin")
@@ -166,11 +166,11 @@ async def test_validation_improvements():
                 return False
         
         # Test delete_admin with mocked success
-        with patch('httpx.AsyncClient') as mock_client:
+        with patch('httpx.AsyncClient', return_value=AsyncMock()) as mock_client:
             mock_response = MagicMock()
             mock_response.status_code = 204  # No Content - common for DELETE
             mock_response.text = ''
-            mock_client.return_value.__aenter__.return_value.delete.return_value = mock_response
+            mock_client.return_value.delete.return_value = mock_response
             
             with patch.object(api, 'get_headers', return_value={"Authorization": "Bearer test"}):
                 result = await api.delete_admin("test_admin")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test for paging through Marzban users.
+Validates that a failed page request raises instead of silently ending the listing,
+so admin stats are never computed from a partial set of users.
+"""
+
+import asyncio
+import sys
+import os
+from unittest.mock import AsyncMock, Mock, patch
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from marzban_api import MarzbanAPI, MarzbanAPIError
+from models.schemas import MarzbanUserModel
+
+
+def users_page(start: int, count: int) -> Mock:
+    """Build a successful /api/users response holding `count` users."""
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = {
+        "users": [
+            {"username": f"user{i}", "status": "active", "used_traffic": 100, "admin": "owner_admin"}
+            for i in range(start, start + count)
+        ]
+    }
+    return response
+
+
+def failed_response() -> Mock:
+    """Build a failed /api/users response."""
+    response = Mock()
+    response.status_code = 500
+    response.text = "Internal Server Error"
+    return response
+
+
+async def test_all_pages_listed():
+    """Every page is yielded until a short page ends the listing."""
+    print("🧪 Testing paged user listing")
+    print("=" * 50)
+
+    api = MarzbanAPI()
+    with patch.object(api, 'get_headers', new=AsyncMock(return_value={})), \
+         patch('httpx.AsyncClient', return_value=AsyncMock()) as mock_client:
+        mock_client.return_value.get.side_effect = [users_page(0, 2), users_page(2, 2), users_page(4, 1)]
+
+        usernames = [user.username async for user in api.iter_users(page_size=2)]
+
+        assert usernames == [f"user{i}" for i in range(5)], "All users should be listed in order"
+        assert mock_client.return_value.get.await_count == 3, "Listing should stop after the short page"
+
+    print("✅ All pages listed")
+    return True
+
+
+async def test_failed_page_raises():
+    """A failed page raises MarzbanAPIError instead of looking like the last page."""
+    print("\n🧪 Testing failed page requests")
+    print("=" * 50)
+
+    for name, second_page in (("error status", failed_response()),
+                              ("connection error", Exception("Connection refused"))):
+        api = MarzbanAPI()
+        with patch.object(api, 'get_headers', new=AsyncMock(return_value={})), \
+             patch('httpx.AsyncClient', return_value=AsyncMock()) as mock_client:
+            mock_client.return_value.get.side_effect = [users_page(0, 2), second_page]
+
+            listed = []
+            try:
+                async for user in api.iter_users(page_size=2):
+                    listed.append(user.username)
+                assert False, f"iter_users should raise on {name}"
+            except MarzbanAPIError:
+                pass
+
+            assert listed == ["user0", "user1"], "Users before the failed page should still be yielded"
+        print(f"✅ Failed page raises on {name}")
+
+    # The unpaged listing keeps returning an empty list on failure
+    api = MarzbanAPI()
+    with patch.object(api, 'get_headers', new=AsyncMock(return_value={})), \
+         patch('httpx.AsyncClient', return_value=AsyncMock()) as mock_client:
+        mock_client.return_value.get.return_value = failed_response()
+        assert await api.get_users() == [], "Unpaged get_users should return an empty list on failure"
+
+    print("✅ Unpaged listing unchanged")
+    return True
+
+
+async def test_admin_stats_fail_on_missing_page():
+    """get_admin_stats raises rather than reporting totals from a partial listing."""
+    print("\n🧪 Testing admin stats with a missing page")
+    print("=" * 50)
+
+    api = MarzbanAPI()
+
+    async def iter_users(admin_username=None, page_size=None):
+        yield MarzbanUserModel(username="user0", status="active", used_traffic=100, admin="owner_admin")
+        raise MarzbanAPIError("Failed to get users page at offset 1: 500")
+
+    with patch.object(api, 'iter_users', new=iter_users), \
+         patch.object(api, 'get_user', new=AsyncMock(return_value=None)):
+        try:
+            await api.get_admin_stats("owner_admin")
+            assert False, "get_admin_stats should raise when a page is missing"
+        except MarzbanAPIError:
+            pass
+
+    print("✅ Admin stats fail instead of returning partial totals")
+    return True
+
+
+async def main():
+    """Run all paged user listing tests."""
+    try:
+        results = [
+            await test_all_pages_listed(),
+            await test_failed_page_raises(),
+            await test_admin_stats_fail_on_missing_page(),
+        ]
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        return False
+
+    print("\n" + "=" * 50)
+    if all(results):
+        print("🎉 ALL PAGED USER LISTING TESTS PASSED!")
+        return True
+    print("❌ Some paged user listing tests failed")
+    return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    sys.exit(0 if success else 1)
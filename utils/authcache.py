@@ -0,0 +1,45 @@
+from typing import List, Optional
+import config
+from models.schemas import AdminModel
+from utils.cache import TTLCache
+
+
+_MISSING = object()
+_admins_cache = TTLCache(ttl=config.AUTH_CACHE_TTL, maxsize=config.AUTH_CACHE_SIZE)
+
+
+async def get_active_admins_cached(user_id: int) -> List[AdminModel]:
+    """Get the active admin panels of a user, served from the in-process cache when fresh."""
+    admins = _admins_cache.get(user_id, _MISSING)
+    if admins is _MISSING:
+        from database import db
+        admins = await db.get_active_admins_for_user(user_id)
+        if admins is None:
+            # Lookup failed; don't cache it so the next call retries the database
+            return []
+        _admins_cache.set(user_id, admins)
+    return list(admins)
+
+
+async def is_authorized_cached(user_id: int) -> bool:
+    """Cached equivalent of db.is_admin_authorized."""
+    if user_id in config.SUDO_ADMINS:
+        return True
+
+    return bool(await get_active_admins_cached(user_id))
+
+
+async def get_user_role(user_id: int) -> Optional[str]:
+    """Resolve a user to "sudo", "admin" or None (unauthorized) with at most one cached panel lookup."""
+    if user_id in config.SUDO_ADMINS:
+        return "sudo"
+
+    return "admin" if await get_active_admins_cached(user_id) else None
+
+
+def invalidate(user_id: Optional[int] = None):
+    """Forget cached panels of one user, or of everyone when user_id is None."""
+    if user_id is None:
+        _admins_cache.clear()
+    else:
+        _admins_cache.pop(user_id)
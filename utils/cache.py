@@ -0,0 +1,61 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store value under key, evicting the least recently used entry when full."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (expired or not), or default."""
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        """Drop every cached entry."""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+async def coalesce(cache: TTLCache, key: Hashable, factory: Callable[[], Awaitable]) -> Any:
+    """Run factory() at most once per key while its task is cached; concurrent callers share the result."""
+    task = cache.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        cache.set(key, task)
+    try:
+        # Shield so one cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(task)
+    except Exception:
+        if cache.get(key) is task:
+            cache.pop(key)
+        raise
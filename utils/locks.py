@@ -0,0 +1,16 @@
+import asyncio
+import weakref
+from typing import Hashable
+
+
+# key -> lock; entries disappear once no handler holds the lock any more
+_locks: "weakref.WeakValueDictionary[Hashable, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def get_lock(key: Hashable) -> asyncio.Lock:
+    """Return the lock shared by every caller using the same key."""
+    lock = _locks.get(key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _locks[key] = lock
+    return lock
@@ -0,0 +1,14 @@
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+
+async def safe_edit_text(message: Message, text: str, reply_markup: InlineKeyboardMarkup = None):
+    """Edit a bot message, touching only the keyboard when the text is unchanged."""
+    try:
+        if message.text == text:
+            await message.edit_reply_markup(reply_markup=reply_markup)
+        else:
+            await message.edit_text(text, reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
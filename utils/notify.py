@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from typing import List, Optional
 from aiogram import Bot
 from aiogram.types import Message
@@ -6,24 +8,105 @@ from database import db
 from models.schemas import LogModel
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
 
-async def notify_sudo_admins(bot: Bot, message: str, exclude_user_id: Optional[int] = None):
-    """Send notification to all sudo admins."""
-    for sudo_id in config.SUDO_ADMINS:
-        if exclude_user_id and sudo_id == exclude_user_id:
-            continue
+_GB = 1 << 30
+_DAY = 86_400
+_TRAFFIC_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+# Sudo-facing notification templates, filled with str.format_map
+_LIMIT_EXCEEDED_SUDO_TMPL = (
+    "🚨 محدودیت ادمین تجاوز شد!\n\n"
+    "👤 ادمین: {admin_user_id}\n"
+    "🚫 کاربران غیرفعال شده: {count}"
+)
+_USERS_REACTIVATED_SUDO_TMPL = (
+    "🔄 کاربران توسط سودو فعال شدند\n\n"
+    "👤 ادمین: {admin_user_id}\n"
+    "✅ کاربران فعال شده: {count}"
+)
+_ADMIN_ADDED_SUDO_TMPL = (
+    "➕ ادمین جدید اضافه شد:\n\n"
+    "👤 ID: {user_id}\n"
+    "📝 نام کاربری: {username}\n"
+    "👥 حداکثر کاربر: {max_users}\n"
+    "⏱️ حداکثر زمان: {max_total_time} ثانیه\n"
+    "📊 حداکثر ترافیک: {max_total_traffic} بایت"
+)
+_ADMIN_REMOVED_SUDO_TMPL = (
+    "🗑️ ادمین حذف شد:\n\n"
+    "👤 ID: {user_id}"
+)
+_ADMIN_REACTIVATED_SUDO_TMPL = (
+    "🔄 ادمین مجدداً فعال شد:\n\n"
+    "👤 ID: {user_id}\n"
+    "🔧 توسط سودو: {by_sudo_id}"
+)
+_ADMIN_REACTIVATED_MSG = (
+    "🎉 **حساب شما مجدداً فعال شد!**\n\n"
+    "✅ همه پنل‌های شما دوباره فعال شدند\n"
+    "🔑 پسورد اصلی بازگردانی شد\n"
+    "👥 کاربران پنل فعال شدند\n\n"
+    "🎊 می‌توانید مجدداً از ربات استفاده کنید!"
+)
+
+# Outgoing notifications are queued and sent by a fixed pool of workers; both are created lazily in the running loop
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+
+async def _notification_worker():
+    """Send queued notifications one at a time."""
+    while True:
+        bot, chat_id, text = await _queue.get()
         try:
-            await bot.send_message(chat_id=sudo_id, text=message)
+            await bot.send_message(chat_id=chat_id, text=text)
         except Exception as e:
-            print(f"Failed to notify sudo admin {sudo_id}: {e}")
+            logger.warning(f"Failed to notify {chat_id}: {e}")
+        finally:
+            _queue.task_done()
+
+
+async def _enqueue(bot: Bot, chat_id: int, text: str):
+    """Queue a message for the notification workers, starting them on first use."""
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=config.NOTIFY_QUEUE_SIZE)
+    if not _workers or all(worker.done() for worker in _workers):
+        _workers[:] = [asyncio.create_task(_notification_worker()) for _ in range(config.NOTIFY_CONCURRENCY)]
+    await _queue.put((bot, chat_id, text))
+
+
+async def wait_notifications(timeout: float = 10):
+    """Wait for queued notifications to be sent, then stop the workers (used on shutdown)."""
+    if _queue is not None:
+        try:
+            await asyncio.wait_for(_queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+    for worker in _workers:
+        worker.cancel()
+    _workers.clear()
+
+
+async def notify_sudo_admins(bot: Bot, message: str, exclude_user_id: Optional[int] = None):
+    """Queue a notification for all sudo admins."""
+    for sudo_id in config.SUDO_ADMINS:
+        if not (exclude_user_id and sudo_id == exclude_user_id):
+            await _enqueue(bot, sudo_id, message)
 
 
 async def notify_admin(bot: Bot, user_id: int, message: str):
-    """Send notification to specific admin."""
-    try:
-        await bot.send_message(chat_id=user_id, text=message)
-    except Exception as e:
-        print(f"Failed to notify admin {user_id}: {e}")
+    """Queue a notification for a specific admin."""
+    await _enqueue(bot, user_id, message)
+
+
+def _with_user_list(message: str, title: str, users: List[str], limit: int = 10) -> str:
+    """Append a titled list of at most ``limit`` usernames to message, joined in one pass."""
+    parts = [message, f"\n\n{title} ({len(users)}):\n", "\n".join(f"• {user}" for user in users[:limit])]
+    if len(users) > limit:
+        parts.append(f"\n... و {len(users) - limit} کاربر دیگر")
+    return "".join(parts)
 
 
 async def notify_limit_warning(bot: Bot, admin_user_id: int, limit_type: str, percentage: float):
@@ -40,25 +123,22 @@ async def notify_limit_warning(bot: Bot, admin_user_id: int, limit_type: str, pe
         details=f"Warning sent for {limit_type} at {percentage:.1%}",
         timestamp=datetime.now()
     )
-    await db.add_log(log)
+    db.queue_log(log)
 
 
 async def notify_limit_exceeded(bot: Bot, admin_user_id: int, affected_users: List[str]):
     """Send limit exceeded notification."""
     message = config.MESSAGES["limit_exceeded"]
     if affected_users:
-        message += f"\n\n🚫 کاربران غیرفعال شده ({len(affected_users)}):\n"
-        message += "\n".join([f"• {user}" for user in affected_users[:10]])
-        if len(affected_users) > 10:
-            message += f"\n... و {len(affected_users) - 10} کاربر دیگر"
+        message = _with_user_list(message, "🚫 کاربران غیرفعال شده", affected_users)
     
     # Notify the admin
     await notify_admin(bot, admin_user_id, message)
     
     # Notify sudo admins
-    sudo_message = f"🚨 محدودیت ادمین تجاوز شد!\n\n"
-    sudo_message += f"👤 ادمین: {admin_user_id}\n"
-    sudo_message += f"🚫 کاربران غیرفعال شده: {len(affected_users)}"
+    sudo_message = _LIMIT_EXCEEDED_SUDO_TMPL.format_map(
+        {"admin_user_id": admin_user_id, "count": len(affected_users)}
+    )
     
     await notify_sudo_admins(bot, sudo_message)
     
@@ -69,25 +149,21 @@ async def notify_limit_exceeded(bot: Bot, admin_user_id: int, affected_users: Li
         details=f"Users disabled: {', '.join(affected_users)}",
         timestamp=datetime.now()
     )
-    await db.add_log(log)
+    db.queue_log(log)
 
 
 async def notify_users_reactivated(bot: Bot, admin_user_id: int, reactivated_users: List[str], by_sudo: bool = False):
     """Send notification when users are reactivated."""
-    message = config.MESSAGES["users_reactivated"]
-    message += f"\n\n✅ کاربران فعال شده ({len(reactivated_users)}):\n"
-    message += "\n".join([f"• {user}" for user in reactivated_users[:10]])
-    if len(reactivated_users) > 10:
-        message += f"\n... و {len(reactivated_users) - 10} کاربر دیگر"
+    message = _with_user_list(config.MESSAGES["users_reactivated"], "✅ کاربران فعال شده", reactivated_users)
     
     # Notify the admin
     await notify_admin(bot, admin_user_id, message)
     
     # If reactivated by sudo, notify sudo admins
     if by_sudo:
-        sudo_message = f"🔄 کاربران توسط سودو فعال شدند\n\n"
-        sudo_message += f"👤 ادمین: {admin_user_id}\n"
-        sudo_message += f"✅ کاربران فعال شده: {len(reactivated_users)}"
+        sudo_message = _USERS_REACTIVATED_SUDO_TMPL.format_map(
+            {"admin_user_id": admin_user_id, "count": len(reactivated_users)}
+        )
         
         await notify_sudo_admins(bot, sudo_message, exclude_user_id=admin_user_id)
     
@@ -98,7 +174,7 @@ async def notify_users_reactivated(bot: Bot, admin_user_id: int, reactivated_use
         details=f"Users reactivated by {'sudo' if by_sudo else 'admin'}: {', '.join(reactivated_users)}",
         timestamp=datetime.now()
     )
-    await db.add_log(log)
+    db.queue_log(log)
 
 
 async def notify_admin_added(bot: Bot, new_admin_user_id: int, admin_info: dict, by_sudo_id: int):
@@ -108,12 +184,13 @@ async def notify_admin_added(bot: Bot, new_admin_user_id: int, admin_info: dict,
     await notify_admin(bot, new_admin_user_id, welcome_message)
     
     # Notify sudo admins
-    sudo_message = f"➕ ادمین جدید اضافه شد:\n\n"
-    sudo_message += f"👤 ID: {new_admin_user_id}\n"
-    sudo_message += f"📝 نام کاربری: {admin_info.get('username', 'نامشخص')}\n"
-    sudo_message += f"👥 حداکثر کاربر: {admin_info.get('max_users', 0)}\n"
-    sudo_message += f"⏱️ حداکثر زمان: {admin_info.get('max_total_time', 0)} ثانیه\n"
-    sudo_message += f"📊 حداکثر ترافیک: {admin_info.get('max_total_traffic', 0)} بایت"
+    sudo_message = _ADMIN_ADDED_SUDO_TMPL.format_map({
+        "user_id": new_admin_user_id,
+        "username": admin_info.get('username', 'نامشخص'),
+        "max_users": admin_info.get('max_users', 0),
+        "max_total_time": admin_info.get('max_total_time', 0),
+        "max_total_traffic": admin_info.get('max_total_traffic', 0),
+    })
     
     await notify_sudo_admins(bot, sudo_message, exclude_user_id=by_sudo_id)
     
@@ -124,14 +201,13 @@ async def notify_admin_added(bot: Bot, new_admin_user_id: int, admin_info: dict,
         details=f"Added by sudo {by_sudo_id}",
         timestamp=datetime.now()
     )
-    await db.add_log(log)
+    db.queue_log(log)
 
 
 async def notify_admin_removed(bot: Bot, removed_admin_user_id: int, by_sudo_id: int):
     """Send notification when admin is removed."""
     # Notify sudo admins
-    sudo_message = f"🗑️ ادمین حذف شد:\n\n"
-    sudo_message += f"👤 ID: {removed_admin_user_id}"
+    sudo_message = _ADMIN_REMOVED_SUDO_TMPL.format_map({"user_id": removed_admin_user_id})
     
     await notify_sudo_admins(bot, sudo_message, exclude_user_id=by_sudo_id)
     
@@ -142,25 +218,18 @@ async def notify_admin_removed(bot: Bot, removed_admin_user_id: int, by_sudo_id:
         details=f"Removed by sudo {by_sudo_id}",
         timestamp=datetime.now()
     )
-    await db.add_log(log)
+    db.queue_log(log)
 
 
 async def notify_admin_reactivation(bot: Bot, reactivated_admin_user_id: int, by_sudo_id: int):
     """Send notification when admin is reactivated."""
     # Notify the reactivated admin
-    reactivation_message = (
-        "🎉 **حساب شما مجدداً فعال شد!**\n\n"
-        "✅ همه پنل‌های شما دوباره فعال شدند\n"
-        "🔑 پسورد اصلی بازگردانی شد\n"
-        "👥 کاربران پنل فعال شدند\n\n"
-        "🎊 می‌توانید مجدداً از ربات استفاده کنید!"
-    )
-    await notify_admin(bot, reactivated_admin_user_id, reactivation_message)
+    await notify_admin(bot, reactivated_admin_user_id, _ADMIN_REACTIVATED_MSG)
     
     # Notify sudo admins
-    sudo_message = f"🔄 ادمین مجدداً فعال شد:\n\n"
-    sudo_message += f"👤 ID: {reactivated_admin_user_id}\n"
-    sudo_message += f"🔧 توسط سودو: {by_sudo_id}"
+    sudo_message = _ADMIN_REACTIVATED_SUDO_TMPL.format_map(
+        {"user_id": reactivated_admin_user_id, "by_sudo_id": by_sudo_id}
+    )
     
     await notify_sudo_admins(bot, sudo_message, exclude_user_id=by_sudo_id)
     
@@ -171,32 +240,31 @@ async def notify_admin_reactivation(bot: Bot, reactivated_admin_user_id: int, by
         details=f"Reactivated by sudo {by_sudo_id}",
         timestamp=datetime.now()
     )
-    await db.add_log(log)
+    db.queue_log(log)
 
 
-async def format_traffic_size(bytes_size: int) -> str:
+def format_traffic_size(bytes_size: int) -> str:
     """Format bytes to human readable format."""
     if bytes_size == 0:
         return "0 B"
     
-    units = ["B", "KB", "MB", "GB", "TB"]
     size = float(bytes_size)
     unit_index = 0
     
-    while size >= 1024 and unit_index < len(units) - 1:
+    while size >= 1024 and unit_index < len(_TRAFFIC_UNITS) - 1:
         size /= 1024
         unit_index += 1
     
-    return f"{size:.2f} {units[unit_index]}"
+    return f"{size:.2f} {_TRAFFIC_UNITS[unit_index]}"
 
 
-async def format_time_duration(seconds: int) -> str:
+def format_time_duration(seconds: int) -> str:
     """Format seconds to human readable duration."""
     if seconds == 0:
         return "0 ثانیه"
     
-    days = seconds // 86400
-    hours = (seconds % 86400) // 3600
+    days = seconds // _DAY
+    hours = (seconds % _DAY) // 3600
     minutes = (seconds % 3600) // 60
     secs = seconds % 60
     
@@ -213,21 +281,27 @@ async def format_time_duration(seconds: int) -> str:
     return " و ".join(parts) if parts else "0 ثانیه"
 
 
+def format_expire_date(timestamp: int) -> str:
+    """Format a unix timestamp as YYYY-MM-DD without going through strftime."""
+    date = datetime.fromtimestamp(timestamp)
+    return f"{date.year:04d}-{date.month:02d}-{date.day:02d}"
+
+
 def gb_to_bytes(gb: float) -> int:
     """Convert gigabytes to bytes."""
-    return int(gb * 1024 * 1024 * 1024)
+    return int(gb * _GB)
 
 
 def days_to_seconds(days: int) -> int:
     """Convert days to seconds."""
-    return days * 24 * 60 * 60
+    return days * _DAY
 
 
 def bytes_to_gb(bytes_size: int) -> float:
     """Convert bytes to gigabytes."""
-    return bytes_size / (1024 * 1024 * 1024)
+    return bytes_size / _GB
 
 
 def seconds_to_days(seconds: int) -> int:
     """Convert seconds to days."""
-    return seconds // (24 * 60 * 60)
\ No newline at end of file
+    return seconds // _DAY
\ No newline at end of file
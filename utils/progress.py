@@ -0,0 +1,29 @@
+import time
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+
+import config
+
+
+class ProgressMessage:
+    """Show `done/total` progress in a bot message, editing it at most once per interval."""
+
+    def __init__(self, message: Message, template: str, total: int, interval: float = None):
+        self.message = message
+        self.template = template
+        self.total = total
+        self.interval = config.PROGRESS_EDIT_INTERVAL if interval is None else interval
+        self._last_edit = 0.0
+
+    async def update(self, done: int):
+        """Report `done` finished items; skipped if the previous edit was too recent."""
+        now = time.monotonic()
+        if now - self._last_edit < self.interval:
+            return
+        self._last_edit = now
+        try:
+            await self.message.edit_text(self.template.format_map({"done": done, "total": self.total}))
+        except TelegramBadRequest:
+            # Progress is cosmetic; a failed edit must not abort the operation
+            pass
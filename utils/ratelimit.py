@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+import config
+
+
+# (key, user_id) -> [window_end, hits]
+_windows: Dict[Tuple[str, int], List] = {}
+
+
+def _prune(now: float):
+    """Drop expired windows; if the table is still full, start over."""
+    for slot in [slot for slot, entry in _windows.items() if entry[0] <= now]:
+        del _windows[slot]
+    if len(_windows) >= config.RATE_LIMIT_MAX_KEYS:
+        _windows.clear()
+
+
+def check_rate(user_id: int, key: str, limit: int = None, window: float = None) -> bool:
+    """Count a hit for user_id on key and return False once limit is exceeded within window seconds."""
+    limit = config.RATE_LIMIT_CALLS if limit is None else limit
+    window = config.RATE_LIMIT_WINDOW if window is None else window
+    now = time.monotonic()
+    slot = (key, user_id)
+
+    entry = _windows.get(slot)
+    if entry is None or entry[0] <= now:
+        if len(_windows) >= config.RATE_LIMIT_MAX_KEYS:
+            _prune(now)
+        _windows[slot] = [now + window, 1]
+        return True
+
+    entry[1] += 1
+    return entry[1] <= limit
+
+
+class CallbackThrottleMiddleware(BaseMiddleware):
+    """Callback middleware that drops a user's repeated button presses within `interval` seconds."""
+
+    def __init__(self, interval: float = None):
+        self.interval = config.CALLBACK_THROTTLE if interval is None else interval
+        self._last: Dict[int, float] = {}
+
+    async def __call__(self, handler, event, data):
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now - self._last.get(user.id, 0) < self.interval:
+            return await event.answer()
+
+        if len(self._last) >= config.RATE_LIMIT_MAX_KEYS:
+            cutoff = now - self.interval
+            self._last = {uid: ts for uid, ts in self._last.items() if ts > cutoff}
+        self._last[user.id] = now
+        return await handler(event, data)
+
+
+class TokenBucket:
+    """Token bucket shared by coroutines: acquire() waits until a token is available."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        """Take one token, sleeping until the bucket has refilled enough."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class BotApiRateLimiter(BaseRequestMiddleware):
+    """Bot session middleware that throttles outgoing API calls bot-wide and per chat, and retries on flood control."""
+
+    def __init__(self, rate: float = None, capacity: int = None):
+        self.bucket = TokenBucket(
+            config.TELEGRAM_RATE_LIMIT if rate is None else rate,
+            config.TELEGRAM_RATE_BURST if capacity is None else capacity
+        )
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        """Return the bucket of one chat, starting over once too many chats are tracked."""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= config.RATE_LIMIT_MAX_KEYS:
+                self._chat_buckets.clear()
+            bucket = TokenBucket(config.TELEGRAM_CHAT_RATE_LIMIT, config.TELEGRAM_CHAT_RATE_BURST)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        for attempt in range(config.TELEGRAM_RETRY_AFTER_ATTEMPTS + 1):
+            if chat_id is not None:
+                await self._chat_bucket(chat_id).acquire()
+            await self.bucket.acquire()
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == config.TELEGRAM_RETRY_AFTER_ATTEMPTS:
+                    raise
+                await asyncio.sleep(e.retry_after)
@@ -0,0 +1,30 @@
+import asyncio
+import logging
+from typing import Coroutine, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Strong references to running background tasks so they are not garbage collected mid-flight
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def spawn(coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+    """Run a coroutine in the background without awaiting it."""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+def _on_task_done(task: asyncio.Task):
+    """Drop the finished task and log its failure, if any."""
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed: {task.exception()}")
+
+
+async def wait_background_tasks(timeout: float = 10):
+    """Wait for pending background tasks to finish (used on shutdown)."""
+    if not _background_tasks:
+        return
+    await asyncio.wait(list(_background_tasks), timeout=timeout)